@@ -0,0 +1,83 @@
+import os
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import utility as u
+from synthetic_data import make_aviation_data, make_b43_inventory
+
+def staged_accident_features(plane_accidents_raw):
+
+    """
+    Parameters:
+    - plane_accidents_raw (pandas.DataFrame): The raw dataframe of plane accidents data.
+
+    Returns:
+    - pandas.DataFrame: 'plane_accidents_4F', built by chaining the copying stage functions as the notebook does.
+    """
+
+    plane_accidents = u.clean_data_PA(plane_accidents_raw, cache_dir=None)
+    plane_accidents_1F = u.engineer_make_model_feature_PAPI(plane_accidents)
+    plane_accidents_2F = u.engineer_accident_features_PA(plane_accidents_1F)
+    plane_accidents_3F = u.engineer_damage_feature_PA(plane_accidents_2F)
+    return u.engineer_danger_score_PA(plane_accidents_3F)
+
+def staged_inventory_features(plane_inventory_raw):
+
+    """
+    Parameters:
+    - plane_inventory_raw (pandas.DataFrame): The raw dataframe of plane inventory data.
+
+    Returns:
+    - pandas.DataFrame: 'plane_inventory_2F', built by chaining the copying stage functions as the notebook does.
+    """
+
+    plane_inventory = u.clean_data_PI(plane_inventory_raw, cache_dir=None)
+    plane_inventory_1F = u.engineer_make_model_feature_PAPI(plane_inventory)
+    return u.engineer_plane_size_feature_PI(plane_inventory_1F)
+
+def measure(function, *args):
+
+    """
+    Parameters:
+    - function (function): The function to measure.
+    - args: The positional arguments passed to the function.
+
+    Returns:
+    - tuple: The result, the wall time in seconds and the peak traced memory in bytes.
+
+    Logic:
+    This function traces memory allocations (numpy and pandas buffers included) while the function runs and reports the 
+    highest amount allocated at any point, relative to what was allocated before the call.
+    """
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function(*args)
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, peak
+
+if __name__ == '__main__':
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    plane_accidents_raw = make_aviation_data(rows=rows)
+    plane_inventory_raw = make_b43_inventory(rows=rows)
+    raw_accidents_mb = plane_accidents_raw.memory_usage(deep=True).sum() / 1024**2
+    print(f'rows: {rows:,}  raw accidents: {raw_accidents_mb:.0f} MiB')
+
+    for name, staged, fused, raw in [
+        ('accidents', staged_accident_features, lambda raw: u.build_accident_features_PA(raw, cache_dir=None), plane_accidents_raw),
+        ('inventory', staged_inventory_features, lambda raw: u.build_inventory_features_PI(raw, cache_dir=None), plane_inventory_raw),
+    ]:
+        raw_before = raw.copy()
+        expected, staged_seconds, staged_peak = measure(staged, raw)
+        result, fused_seconds, fused_peak = measure(fused, raw)
+        pd.testing.assert_frame_equal(expected, result)
+        pd.testing.assert_frame_equal(raw_before, raw)
+        print(f'{name}: staged peak {staged_peak / 1024**2:.0f} MiB in {staged_seconds:.2f}s, '
+              f'fused peak {fused_peak / 1024**2:.0f} MiB in {fused_seconds:.2f}s '
+              f'({staged_peak / fused_peak:.1f}x less memory)')
@@ -0,0 +1,335 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+benchmarks_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(benchmarks_dir))
+import utility as u
+from synthetic_data import make_aviation_data, make_b43_inventory
+
+results_dir = os.path.join(benchmarks_dir, 'results')
+sweep_weights = np.column_stack([np.linspace(0, 1, 1000), 1 - np.linspace(0, 1, 1000)])
+
+def prepare_inputs(scale, seed, work_dir):
+
+    """
+    Parameters:
+    - scale (float): The size of the synthetic data relative to the real files.
+    - seed (int): The seed of the synthetic data.
+    - work_dir (str): A scratch directory for the CSV files and caches used by the file-based functions.
+
+    Returns:
+    - dict: The raw, cleaned and engineered dataframes, summaries and file paths that the benchmark cases take as input.
+
+    Logic:
+    This function builds every intermediate input once, outside of the timed code, so each case only measures its own function.
+    """
+
+    inputs = {'work_dir': work_dir}
+    inputs['accidents_raw'] = make_aviation_data(scale, seed)
+    inputs['inventory_raw'] = make_b43_inventory(scale, seed)
+    inputs['accidents_path'] = os.path.join(work_dir, 'AviationData.csv')
+    inputs['inventory_path'] = os.path.join(work_dir, 'T_F41SCHEDULE_B43.csv')
+    inputs['accidents_raw'].to_csv(inputs['accidents_path'], index=False, encoding='latin-1')
+    inputs['inventory_raw'].to_csv(inputs['inventory_path'], index=False)
+    inputs['new_accidents_path'] = os.path.join(work_dir, 'AviationData_new.csv')
+    inputs['accidents_raw'].tail(len(inputs['accidents_raw']) // 100).to_csv(
+        inputs['new_accidents_path'], index=False, encoding='latin-1'
+    )
+
+    inputs['accidents'] = u.clean_data_PA(inputs['accidents_raw'], cache_dir=None)
+    inputs['accidents_1F'] = u.engineer_make_model_feature_PAPI(inputs['accidents'])
+    inputs['accidents_2F'] = u.engineer_accident_features_PA(inputs['accidents_1F'])
+    inputs['accidents_3F'] = u.engineer_damage_feature_PA(inputs['accidents_2F'])
+    inputs['accidents_4F'] = u.engineer_danger_score_PA(inputs['accidents_3F'])
+    inputs['inventory'] = u.clean_data_PI(inputs['inventory_raw'], cache_dir=None)
+    inputs['inventory_1F'] = u.engineer_make_model_feature_PAPI(inputs['inventory'])
+    inputs['inventory_2F'] = u.engineer_plane_size_feature_PI(inputs['inventory_1F'])
+    inputs['inventory_serial_2F'] = u.build_inventory_features_PI(
+        inputs['inventory_raw'], cache_dir=None, keep_serial_number=True
+    )
+    inputs['top_planes'] = u.get_top_n_planes_by_sizes(inputs['inventory_2F'])
+    inputs['big_df'] = u.make_big_df(inputs['inventory_2F'])
+    inputs['aggregated'] = u.aggregate_accidents_by_make_model(inputs['accidents_4F'])
+    inputs['accident_summary'] = u.summarize_accidents_PA(inputs['accidents_raw'], cache_dir=None)
+    inputs['inventory_summary'] = u.summarize_inventory_PI(inputs['inventory_raw'], cache_dir=None)
+    inputs['summaries_dir'] = os.path.join(work_dir, 'summaries')
+    u.update_summaries(inputs['summaries_dir'], inputs['accidents_path'], inputs['inventory_path'], cache_dir=None)
+    inputs['final_df'] = u.ult_df(inputs['accidents_4F'], inputs['inventory_2F'])
+    inputs['query_index_path'] = u.build_query_index(inputs['final_df'], os.path.join(work_dir, 'final_data_for_tableau.sqlite'))
+    inputs['query_connection'] = u.open_query_index(inputs['query_index_path'])
+    inputs['query_make_model'] = inputs['final_df']['make_model'].iloc[0]
+    inputs['query_threshold'] = inputs['final_df']['mean_danger_score'].median()
+    return inputs
+
+def incremental_case(inputs):
+
+    """
+    Parameters:
+    - inputs (dict): The inputs returned by 'prepare_inputs'.
+
+    Returns:
+    - tuple: A reset function and the function to measure.
+
+    Logic:
+    'incremental_ult_df' saves the summaries it updates, so running it twice on the same directory would fold the new
+    accidents in twice and time a larger state each run. The reset function copies the summaries saved by 'prepare_inputs'
+    to a fresh directory, and 'measure' calls it, untimed, before every run.
+    """
+
+    summaries_dir = os.path.join(inputs['work_dir'], 'incremental_summaries')
+
+    def reset():
+        shutil.rmtree(summaries_dir, ignore_errors=True)
+        shutil.copytree(inputs['summaries_dir'], summaries_dir)
+
+    return reset, lambda: u.incremental_ult_df(summaries_dir, inputs['new_accidents_path'], cache_dir=None)
+
+def full_pipeline(accidents_raw, inventory_raw):
+
+    """
+    Parameters:
+    - accidents_raw (pandas.DataFrame): The raw plane accidents data.
+    - inventory_raw (pandas.DataFrame): The raw plane inventory data.
+
+    Returns:
+    - pandas.DataFrame: The final dataframe, computed with the same chain of calls as the main analysis notebook.
+    """
+
+    plane_accidents = u.clean_data_PA(accidents_raw, cache_dir=None)
+    plane_inventory = u.clean_data_PI(inventory_raw, cache_dir=None)
+    plane_accidents_1F = u.engineer_make_model_feature_PAPI(plane_accidents)
+    plane_accidents_2F = u.engineer_accident_features_PA(plane_accidents_1F)
+    plane_accidents_3F = u.engineer_damage_feature_PA(plane_accidents_2F)
+    plane_accidents_4F = u.engineer_danger_score_PA(plane_accidents_3F)
+    plane_inventory_1F = u.engineer_make_model_feature_PAPI(plane_inventory)
+    plane_inventory_2F = u.engineer_plane_size_feature_PI(plane_inventory_1F)
+    return u.ult_df(plane_accidents_4F, plane_inventory_2F)
+
+benchmark_cases = [
+    # cleaning
+    ('cleaning.clean_manufacturer_PA', lambda i: lambda: [u.clean_manufacturer_PA(name) for name in i['accidents_raw']['Make']]),
+    ('cleaning.clean_manufacturer_PI', lambda i: lambda: [u.clean_manufacturer_PI(name) for name in i['inventory_raw']['MANUFACTURER']]),
+    ('cleaning.normalize_manufacturers', lambda i: lambda: u.normalize_manufacturers(
+        i['accidents_raw']['Make'], u.normalize_manufacturer_PA, rules=[], cache_name='benchmark', cache_dir=None
+    )),
+    ('cleaning.clean_model_PAPI', lambda i: lambda: u.clean_model_PAPI(i['inventory_raw']['MODEL'])),
+    ('cleaning.parse_dates_PA', lambda i: lambda: u.parse_dates_PA(i['accidents_raw']['Event.Date'])),
+    ('cleaning.clean_data_PA', lambda i: lambda: u.clean_data_PA(i['accidents_raw'], cache_dir=None)),
+    ('cleaning.clean_data_PI', lambda i: lambda: u.clean_data_PI(i['inventory_raw'], cache_dir=None)),
+    # features
+    ('features.engineer_make_model_feature_PAPI', lambda i: lambda: u.engineer_make_model_feature_PAPI(i['accidents'])),
+    ('features.get_injury_feature_PA', lambda i: lambda: u.get_injury_feature_PA(i['accidents_1F'])),
+    ('features.get_injury_feature_numeric_PA', lambda i: lambda: u.get_injury_feature_numeric_PA(i['accidents_2F']['human_injury'])),
+    ('features.engineer_accident_features_PA', lambda i: lambda: u.engineer_accident_features_PA(i['accidents_1F'])),
+    ('features.engineer_damage_feature_PA', lambda i: lambda: u.engineer_damage_feature_PA(i['accidents_2F'])),
+    ('features.engineer_danger_score_PA', lambda i: lambda: u.engineer_danger_score_PA(i['accidents_3F'])),
+    ('features.engineer_plane_size_feature_PI', lambda i: lambda: u.engineer_plane_size_feature_PI(i['inventory_1F'])),
+    # scores_and_metrics
+    ('scores_and_metrics.get_top_n_planes_by_sizes', lambda i: lambda: u.get_top_n_planes_by_sizes(i['inventory_2F'])),
+    ('scores_and_metrics.make_df', lambda i: lambda: u.make_df(i['top_planes'][0])),
+    ('scores_and_metrics.make_big_df', lambda i: lambda: u.make_big_df(i['inventory_2F'])),
+    ('scores_and_metrics.aggregate_accidents_by_make_model', lambda i: lambda: u.aggregate_accidents_by_make_model(i['accidents_4F'])),
+    ('scores_and_metrics.add_accident_aggregates', lambda i: lambda: u.add_accident_aggregates(i['big_df'], i['aggregated'])),
+    ('scores_and_metrics.ult_df', lambda i: lambda: u.ult_df(i['accidents_4F'], i['inventory_2F'])),
+    ('scores_and_metrics.ult_weight_sweep', lambda i: lambda: u.ult_weight_sweep(i['accidents_3F'], i['inventory_2F'], sweep_weights)),
+    # rates
+    ('rates.yearly_accident_rates', lambda i: lambda: u.yearly_accident_rates(i['accidents_4F'], i['inventory_2F'])),
+    ('rates.ult_rates_df', lambda i: lambda: u.ult_rates_df(i['accidents_4F'], i['inventory_2F'])),
+    # bootstrap
+    ('bootstrap.ult_intervals_df', lambda i: lambda: u.ult_intervals_df(i['accidents_4F'], i['inventory_2F'])),
+    # distinct
+    ('distinct.count_distinct_aircraft_PI exact', lambda i: lambda: u.count_distinct_aircraft_PI(i['inventory_serial_2F'], 'exact')),
+    ('distinct.count_distinct_aircraft_PI hll', lambda i: lambda: u.count_distinct_aircraft_PI(i['inventory_serial_2F'], 'hll')),
+    ('streaming.summarize_distinct_file_PI hll', lambda i: lambda: u.summarize_distinct_file_PI(
+        i['inventory_path'], 'hll', cache_dir=None
+    )),
+    # matching
+    ('matching.match_makes_PA', lambda i: lambda: u.match_makes_PA(i['accidents_1F'], i['inventory'], cache_dir=None)),
+    # query
+    ('query.build_query_index', lambda i: lambda: u.build_query_index(
+        i['final_df'], os.path.join(i['work_dir'], 'query_benchmark.sqlite')
+    )),
+    ('query.lookup_make_model', lambda i: lambda: u.lookup_make_model(i['query_connection'], i['query_make_model'])),
+    ('query.top_safest', lambda i: lambda: u.top_safest(i['query_connection'])),
+    ('query.above_danger_threshold', lambda i: lambda: u.above_danger_threshold(i['query_connection'], i['query_threshold'])),
+    ('query.command_line score', lambda i: lambda: subprocess.run(
+        [sys.executable, '-m', 'utility', 'score', i['query_make_model'], '--index', i['query_index_path']],
+        cwd=os.path.dirname(benchmarks_dir), check=True, capture_output=True
+    )),
+    # streaming and incremental
+    ('streaming.summarize_accidents_PA', lambda i: lambda: u.summarize_accidents_PA(i['accidents_raw'], cache_dir=None)),
+    ('streaming.summarize_inventory_PI', lambda i: lambda: u.summarize_inventory_PI(i['inventory_raw'], cache_dir=None)),
+    ('streaming.ult_df_from_summaries', lambda i: lambda: u.ult_df_from_summaries(i['accident_summary'], i['inventory_summary'])),
+    ('streaming.stream_ult_df', lambda i: lambda: u.stream_ult_df(i['accidents_path'], i['inventory_path'], cache_dir=None)),
+    ('incremental.incremental_ult_df', incremental_case),
+    # pipeline
+    ('pipeline.build_accident_features_PA', lambda i: lambda: u.build_accident_features_PA(i['accidents_raw'], cache_dir=None)),
+    ('pipeline.build_inventory_features_PI', lambda i: lambda: u.build_inventory_features_PI(i['inventory_raw'], cache_dir=None)),
+    ('pipeline.cached_features_PA', lambda i: lambda: u.cached_features_PA(
+        i['accidents_path'], cache_dir=os.path.join(i['work_dir'], 'cache')
+    )),
+    ('pipeline.full', lambda i: lambda: full_pipeline(i['accidents_raw'], i['inventory_raw'])),
+]
+
+def measure(run, repeat, reset=None):
+
+    """
+    Parameters:
+    - run (function): The zero-argument function to measure.
+    - repeat (int): The number of timed runs.
+    - reset (function): A zero-argument function called before every run, outside of the timing, for functions that change
+      their inputs. Default value is None (no reset).
+
+    Returns:
+    - dict: The best and median wall time and the CPU time of the best run in seconds, and the peak traced memory in MiB.
+
+    Logic:
+    This function times the untraced runs first, since tracing allocations slows the code down, and then runs the function
+    once more under tracemalloc to record the highest amount of memory allocated during the call.
+    """
+
+    reset = reset or (lambda: None)
+    wall_times, cpu_times = [], []
+    for _ in range(repeat):
+        reset()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        run()
+        wall_times.append(time.perf_counter() - wall_start)
+        cpu_times.append(time.process_time() - cpu_start)
+
+    reset()
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best = int(np.argmin(wall_times))
+    return {
+        'best_seconds': wall_times[best],
+        'median_seconds': float(np.median(wall_times)),
+        'cpu_seconds': cpu_times[best],
+        'peak_mib': peak / 1024**2,
+    }
+
+def git_commit():
+
+    """
+    Returns:
+    - str: The commit hash of the checked-out tree, with '-dirty' appended when it has uncommitted changes, or None outside git.
+    """
+
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=benchmarks_dir, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ['git', 'status', '--porcelain', '--untracked-files=no'], cwd=benchmarks_dir, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return f'{commit}-dirty' if dirty else commit
+
+def run_benchmarks(scale=1.0, seed=0, repeat=3, only=None):
+
+    """
+    Parameters:
+    - scale (float): The size of the synthetic data relative to the real files. Default value is 1.
+    - seed (int): The seed of the synthetic data. Default value is 0.
+    - repeat (int): The number of timed runs per case. Default value is 3.
+    - only (str): Only run the cases whose name contains this text. Default value is None (every case).
+
+    Returns:
+    - dict: The run metadata and the measurements of every case, ready to be saved as JSON.
+    """
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'scale': scale,
+        'seed': seed,
+        'repeat': repeat,
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'results': {},
+    }
+    with tempfile.TemporaryDirectory() as work_dir:
+        inputs = prepare_inputs(scale, seed, work_dir)
+        report['rows'] = {'accidents': len(inputs['accidents_raw']), 'inventory': len(inputs['inventory_raw'])}
+        for name, setup in benchmark_cases:
+            if only is not None and only not in name:
+                continue
+            case = setup(inputs)
+            reset, run = case if isinstance(case, tuple) else (None, case)
+            report['results'][name] = measure(run, repeat, reset)
+            result = report['results'][name]
+            print(f"{name:<55} {result['best_seconds']:9.4f}s {result['peak_mib']:9.1f} MiB", flush=True)
+        inputs['query_connection'].close()
+    return report
+
+def compare_reports(baseline, current, threshold=.2):
+
+    """
+    Parameters:
+    - baseline (dict): A report saved by an earlier run.
+    - current (dict): The report of this run.
+    - threshold (float): The relative slowdown or memory growth counted as a regression. Default value is 0.2 (20%).
+
+    Returns:
+    - list: The names of the cases that regressed.
+
+    Logic:
+    This function prints, for every case present in both reports, the ratio of the current to the baseline best time and peak memory.
+    Reports made at different scales or seeds are not comparable and are rejected.
+    """
+
+    if (baseline['scale'], baseline['seed']) != (current['scale'], current['seed']):
+        raise ValueError('Benchmark reports must use the same scale and seed to be compared.')
+
+    regressions = []
+    print(f"\ncompared with {baseline.get('commit')}:")
+    for name, result in current['results'].items():
+        if name not in baseline['results']:
+            continue
+        time_ratio = result['best_seconds'] / baseline['results'][name]['best_seconds']
+        memory_ratio = result['peak_mib'] / max(baseline['results'][name]['peak_mib'], 1e-9)
+        regressed = time_ratio > 1 + threshold or memory_ratio > 1 + threshold
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<55} time x{time_ratio:5.2f}  memory x{memory_ratio:5.2f}{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time and memory-profile the utility functions on synthetic data.')
+    parser.add_argument('--scale', type=float, default=1.0, help='size relative to the real files, e.g. 1 to 100')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--only', help='only run cases whose name contains this text')
+    parser.add_argument('--output', help='report path; defaults to benchmarks/results/<commit>_<scale>x.json')
+    parser.add_argument('--compare', help='an earlier report to compare against')
+    parser.add_argument('--threshold', type=float, default=.2)
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.scale, args.seed, args.repeat, args.only)
+    output = args.output or os.path.join(results_dir, f"{(report['commit'] or 'nocommit')[:12]}_{args.scale:g}x.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, indent=2)
+    print(f'\nreport written to {output}')
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as file:
+            regressions = compare_reports(json.load(file), report, args.threshold)
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,267 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+aviation_data_rows = 88_889
+b43_inventory_rows = 132_000
+
+canonical_makes_PA = [
+    'Cessna', 'Piper', 'Beech', 'Boeing', 'Bell', 'Mooney', 'Grumman', 'Bellanca', 'Robinson', 'Hughes',
+    'Schweizer', 'Air Tractor', 'Aeronca', 'Maule', 'Champion', 'Stinson', 'Cirrus', 'Luscombe', 'Taylorcraft', 'Ercoupe',
+    'De Havilland', 'Airbus', 'Embraer', 'Bombardier', 'Mcdonnell Douglas', 'Douglas', 'Lockheed', 'Sikorsky', 'Eurocopter', 'Learjet',
+    'Gulfstream', 'Dassault', 'Fokker', 'Saab', 'Canadair', 'Raytheon', 'Socata', 'Diamond', 'Extra', 'Pilatus',
+]
+
+canonical_makes_PI = [
+    ('BOEING', ['737', '757', '767', '777', '787', '747', '717'], (101, 524)),
+    ('AIRBUS INDUSTRIE', ['319', '320', '321', '330', '350'], (101, 380)),
+    ('MCDONNELL DOUGLAS', ['82', '83', '88', '90', '11'], (101, 300)),
+    ('EMBRAER', ['145', '170', '175', '190', '135'], (37, 114)),
+    ('BOMBARDIER', ['200', '700', '900', '100', '400'], (50, 90)),
+    ('CANADAIR', ['600', '700', '900'], (50, 90)),
+    ('GULFSTREAM AEROSPACE', ['4', '5', '3'], (3, 19)),
+    ('BEECH', ['1900', '99', '200'], (3, 19)),
+    ('SAAB AIRCRAFT', ['340', '2000'], (19, 50)),
+    ('LEARJET', ['35', '45', '60'], (3, 10)),
+    ('FOKKER', ['100', '70'], (70, 110)),
+    ('DOUGLAS', ['9', '10'], (90, 300)),
+]
+
+airliner_models_PA = {
+    'Boeing': ['737', '757', '767', '777', '787', '747', '717'],
+    'Airbus': ['319', '320', '321', '330', '350'],
+    'Mcdonnell Douglas': ['82', '83', '88', '90', '11'],
+    'Embraer': ['145', '170', '175', '190', '135'],
+    'Bombardier': ['200', '700', '900', '100', '400'],
+    'Canadair': ['600', '700', '900'],
+    'Gulfstream': ['4', '5', '3'],
+    'Beech': ['1900', '99', '200'],
+    'Saab': ['340', '2000'],
+    'Learjet': ['35', '45', '60'],
+    'Fokker': ['100', '70'],
+    'Douglas': ['9', '10'],
+}
+
+make_suffixes = ['', '', '', ' Aircraft', ' Aircraft Corp', ' Inc', ', Inc.', ' Co.', ' Corporation', ' Aviation', ' Company', ' Ltd']
+model_prefixes = ['', '', 'A', 'B', 'C', 'DC-', 'MD-', 'PA-', 'EMB-', 'CL-', 'G-']
+model_separators = ['-', '/', ' ', '']
+
+def zipf_weights(size, exponent=1.1):
+
+    """
+    Parameters:
+    - size (int): The number of weights.
+    - exponent (float): The skew of the distribution. Default value is 1.1.
+
+    Returns:
+    - numpy.ndarray: Probabilities that decrease with rank, so a few values dominate as they do in the real data.
+    """
+
+    weights = 1 / np.arange(1, size + 1)**exponent
+    return weights / weights.sum()
+
+def mess_up_names(rng, names):
+
+    """
+    Parameters:
+    - rng (numpy.random.Generator): The random generator.
+    - names (numpy.ndarray): Clean manufacturer names.
+
+    Returns:
+    - list: The names with random casing, company suffixes, joint-venture separators and padding, as found in the raw files.
+    """
+
+    casings = rng.integers(0, 4, len(names))
+    suffixes = rng.choice(make_suffixes, len(names))
+    partners = rng.choice(canonical_makes_PA, len(names))
+    joint = rng.random(len(names)) < .05
+    separators = rng.choice(['/', '-', ' and ', ' & '], len(names))
+    padded = rng.random(len(names)) < .05
+
+    messy_names = []
+    for name, casing, suffix, partner, is_joint, separator, is_padded in zip(
+        names, casings, suffixes, partners, joint, separators, padded
+    ):
+        name = f'{name}{separator}{partner}' if is_joint else name
+        name = [name, name.upper(), name.lower(), name.title()][casing] + suffix
+        messy_names.append(f' {name}  ' if is_padded else name)
+    return messy_names
+
+def mess_up_models(rng, numbers):
+
+    """
+    Parameters:
+    - rng (numpy.random.Generator): The random generator.
+    - numbers (numpy.ndarray): Model numbers, as strings.
+
+    Returns:
+    - list: Model codes built around the numbers with letter prefixes, separators and variant suffixes, e.g. 'PA-28-161', 'B737/824'.
+    """
+
+    prefixes = rng.choice(model_prefixes, len(numbers))
+    separators = rng.choice(model_separators, len(numbers))
+    variants = rng.integers(0, 1000, len(numbers))
+    has_variant = rng.random(len(numbers)) < .7
+    return [
+        f'{prefix}{number}{separator}{variant}' if with_variant else f'{prefix}{number}'
+        for prefix, number, separator, variant, with_variant in zip(prefixes, numbers, separators, variants, has_variant)
+    ]
+
+def filler(rng, choices, rows, missing=0.0):
+
+    """
+    Parameters:
+    - rng (numpy.random.Generator): The random generator.
+    - choices (list): The values to draw from.
+    - rows (int): The number of values.
+    - missing (float): The share of missing values. Default value is 0.
+
+    Returns:
+    - numpy.ndarray: An object array of values drawn from 'choices', with NaN for the missing ones.
+    """
+
+    values = rng.choice(np.array(choices, dtype=object), rows)
+    values[rng.random(rows) < missing] = np.nan
+    return values
+
+def make_aviation_data(scale=1.0, seed=0, rows=None):
+
+    """
+    Parameters:
+    - scale (float): The size relative to the real 'AviationData.csv' (88,889 rows). Default value is 1.
+    - seed (int): The seed of the random generator. Default value is 0.
+    - rows (int): The exact number of rows, overriding 'scale'. Default value is None.
+
+    Returns:
+    - pandas.DataFrame: A raw accidents dataframe with every column of the NTSB 'AviationData.csv'.
+
+    Logic:
+    This function first builds a pool of distinct (make, model) pairs with messy manufacturer strings and model codes,
+    whose size grows with the square root of the scale as the number of distinct names does in longer histories.
+    Airliner makes use the model numbers of the synthetic inventory, so that accidents join to inventory planes.
+    Each row then draws a pair from the pool with a skewed distribution, and the dates, damage, injuries and
+    amateur-built flag with roughly the proportions of the real file. The same seed always gives the same data.
+    """
+
+    rows = int(aviation_data_rows * scale) if rows is None else rows
+    rng = np.random.default_rng(seed)
+
+    pool_size = int(20_000 * max(scale, .01)**.5)
+    canonical = rng.choice(canonical_makes_PA, pool_size, p=zipf_weights(len(canonical_makes_PA)))
+    makes = np.array(mess_up_names(rng, canonical), dtype=object)
+    numbers = rng.integers(1, 1000, pool_size).astype(str).astype(object)
+    for index, make in enumerate(canonical):
+        if make in airliner_models_PA:
+            numbers[index] = rng.choice(airliner_models_PA[make])
+    models = np.array(mess_up_models(rng, numbers), dtype=object)
+    pair = rng.choice(pool_size, rows, p=zipf_weights(pool_size, .9))
+
+    days = rng.integers(0, 365 * 41, rows)
+    event_dates = (np.datetime64('1982-01-01') + days).astype(str)
+    injuries = lambda mean: np.where(rng.random(rows) < .13, np.nan, rng.poisson(mean, rows))
+    states = ['AK', 'AZ', 'CA', 'CO', 'FL', 'GA', 'IL', 'MI', 'NY', 'OR', 'TX', 'WA']
+
+    return pd.DataFrame({
+        'Event.Id': [f'20001218X{i:05d}' for i in range(rows)],
+        'Investigation.Type': filler(rng, ['Accident', 'Accident', 'Accident', 'Incident'], rows),
+        'Accident.Number': [f'SEA{i % 100:02d}LA{i:06d}' for i in range(rows)],
+        'Event.Date': event_dates,
+        'Location': [f'CITY{i % 997}, {state}' for i, state in enumerate(filler(rng, states, rows))],
+        'Country': filler(rng, ['United States'] * 20 + ['Canada', 'Mexico', 'Bahamas'], rows, .01),
+        'Latitude': filler(rng, ['', '361922N', '334500N', '470300N'], rows, .6),
+        'Longitude': filler(rng, ['', '0973259W', '1174500W', '1223000W'], rows, .6),
+        'Airport.Code': filler(rng, ['NONE', 'LAX', 'DEN', 'ANC', 'PHX', 'ORD'], rows, .4),
+        'Airport.Name': filler(rng, ['Private', 'Municipal', 'International', 'N/A'], rows, .4),
+        'Injury.Severity': filler(rng, ['Non-Fatal', 'Fatal(1)', 'Fatal(2)', 'Incident', 'Minor', 'Serious'], rows, .01),
+        'Aircraft.damage': filler(rng, ['Substantial'] * 18 + ['Destroyed'] * 5 + ['Minor', 'Unknown'], rows, .04),
+        'Aircraft.Category': filler(rng, ['Airplane', 'Helicopter', 'Glider', 'Balloon'], rows, .6),
+        'Registration.Number': [f'N{i % 99_999:05d}' for i in range(rows)],
+        'Make': makes[pair],
+        'Model': models[pair],
+        'Amateur.Built': filler(rng, ['No'] * 9 + ['Yes'], rows, .001),
+        'Number.of.Engines': filler(rng, [1.0, 1.0, 1.0, 2.0, 0.0], rows, .07),
+        'Engine.Type': filler(rng, ['Reciprocating', 'Turbo Shaft', 'Turbo Prop', 'Turbo Fan', 'Unknown'], rows, .08),
+        'FAR.Description': filler(rng, ['091', 'Part 91: General Aviation', '137', '135', '121'], rows, .64),
+        'Schedule': filler(rng, ['UNK', 'NSCH', 'SCHD'], rows, .86),
+        'Purpose.of.flight': filler(rng, ['Personal', 'Instructional', 'Unknown', 'Aerial Application', 'Business'], rows, .07),
+        'Air.carrier': filler(rng, ['Pilot', 'American Airlines', 'Delta Air Lines', 'United Airlines'], rows, .81),
+        'Total.Fatal.Injuries': injuries(.6),
+        'Total.Serious.Injuries': injuries(.25),
+        'Total.Minor.Injuries': injuries(.35),
+        'Total.Uninjured': injuries(5),
+        'Weather.Condition': filler(rng, ['VMC', 'VMC', 'VMC', 'IMC', 'UNK'], rows, .05),
+        'Broad.phase.of.flight': filler(rng, ['Landing', 'Takeoff', 'Cruise', 'Maneuvering', 'Approach'], rows, .3),
+        'Report.Status': filler(rng, ['Probable Cause', 'Factual', 'Preliminary'], rows, .07),
+        'Publication.Date': filler(rng, ['25-09-2020', '16-04-1980', '12-05-2005'], rows, .15),
+    })
+
+def make_b43_inventory(scale=1.0, seed=0, rows=None):
+
+    """
+    Parameters:
+    - scale (float): The size relative to the real 'T_F41SCHEDULE_B43.csv' (about 132,000 rows). Default value is 1.
+    - seed (int): The seed of the random generator. Default value is 0.
+    - rows (int): The exact number of rows, overriding 'scale'. Default value is None.
+
+    Returns:
+    - pandas.DataFrame: A raw inventory dataframe with every column of the BTS Schedule B-43 file.
+
+    Logic:
+    This function builds a fleet of aircraft, each with a serial number, a messy manufacturer string, a model code and a number
+    of seats typical of its manufacturer. Every row is one aircraft reported in one inventory year, so the same serial number
+    appears in several years as it does in the real file.
+    """
+
+    rows = int(b43_inventory_rows * scale) if rows is None else rows
+    rng = np.random.default_rng(seed)
+
+    fleet_size = max(rows // 7, 1)
+    make_index = rng.choice(len(canonical_makes_PI), fleet_size, p=zipf_weights(len(canonical_makes_PI), .8))
+    canonical = np.array([canonical_makes_PI[index][0] for index in make_index], dtype=object)
+    numbers = np.array([rng.choice(canonical_makes_PI[index][1]) for index in make_index])
+    seat_ranges = np.array([canonical_makes_PI[index][2] for index in make_index])
+    fleet = pd.DataFrame({
+        'SERIAL_NUMBER': [f'{i:05d}' for i in rng.permutation(fleet_size * 3)[:fleet_size]],
+        'MANUFACTURER': mess_up_names(rng, canonical),
+        'MODEL': mess_up_models(rng, numbers),
+        'NUMBER_OF_SEATS': rng.integers(seat_ranges[:, 0], seat_ranges[:, 1] + 1),
+        'MANUFACTURE_YEAR': rng.integers(1970, 2022, fleet_size),
+    })
+
+    aircraft = rng.integers(0, fleet_size, rows)
+    inventory = fleet.iloc[aircraft].reset_index(drop=True)
+    carriers = ['AA', 'DL', 'UA', 'WN', 'AS', 'B6', 'NK', 'F9', 'HA', 'G4']
+    carrier = filler(rng, carriers, rows)
+    inventory.insert(0, 'YEAR', rng.integers(2006, 2023, rows))
+    inventory.insert(1, 'CARRIER', carrier)
+    inventory.insert(2, 'CARRIER_NAME', [f'{code} Airlines Inc.' for code in carrier])
+    inventory['UNIQUE_CARRIER_NAME'] = inventory['CARRIER_NAME']
+    inventory['TAIL_NUMBER'] = [f'N{i % 99_999:05d}' for i in aircraft]
+    inventory['AIRCRAFT_STATUS'] = filler(rng, ['O', 'O', 'O', 'L', 'B'], rows)
+    inventory['OPERATING_STATUS'] = filler(rng, ['Y', 'Y', 'Y', 'N'], rows)
+    inventory['AIRCRAFT_TYPE'] = filler(rng, ['694', '698', '622', '655'], rows, .02)
+    inventory['CAPACITY_IN_POUNDS'] = rng.integers(0, 100_000, rows)
+    inventory['ACQUISITION_DATE'] = (np.datetime64('1990-01-01') + rng.integers(0, 365 * 30, rows)).astype(str)
+    inventory['AIRLINE_ID'] = rng.integers(19_000, 21_000, rows)
+    inventory['UNIQUE_CARRIER'] = carrier
+    return inventory
+
+def write_raw_csvs(directory, scale=1.0, seed=0):
+
+    """
+    Parameters:
+    - directory (str): The directory to write the files to.
+    - scale (float): The size relative to the real files. Default value is 1.
+    - seed (int): The seed of the random generator. Default value is 0.
+
+    Returns:
+    - tuple: The paths of the synthetic 'AviationData.csv' and 'T_F41SCHEDULE_B43.csv'.
+    """
+
+    os.makedirs(directory, exist_ok=True)
+    accidents_path = os.path.join(directory, 'AviationData.csv')
+    inventory_path = os.path.join(directory, 'T_F41SCHEDULE_B43.csv')
+    make_aviation_data(scale, seed).to_csv(accidents_path, index=False, encoding='latin-1')
+    make_b43_inventory(scale, seed).to_csv(inventory_path, index=False)
+    return accidents_path, inventory_path
@@ -0,0 +1,6 @@
+import os
+import sys
+
+repository_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repository_dir)
+sys.path.insert(0, os.path.join(repository_dir, 'benchmarks'))
@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+
+import utility as u
+
+def scored_accidents():
+    rng = np.random.default_rng(0)
+    well_sampled = rng.uniform(2, 4, size=40)
+    danger_scores = np.concatenate([[.5], [0., 0.], well_sampled])
+    return pd.DataFrame({
+        'make_model': ['solo'] + ['twins'] * 2 + ['steady'] * len(well_sampled),
+        'danger_score': danger_scores,
+        'human_injury_numeric': danger_scores,
+        'aircraft_damage_numeric': danger_scores,
+    })
+
+def test_few_accidents_do_not_outrank_a_well_sampled_model():
+    final_df = pd.DataFrame({'make_model': ['solo', 'twins', 'steady'], 'size': ['small'] * 3})
+    intervals = u.bootstrap_score_intervals(scored_accidents(), resamples=200)
+
+    assert intervals.loc[['solo', 'twins'], 'mean_danger_score_upper'].isna().all()
+    assert intervals.loc['steady', 'mean_danger_score_lower'] < intervals.loc['steady', 'mean_danger_score_upper']
+
+    ranked = u.add_score_intervals(final_df, intervals, rank_by_upper=True)
+    assert ranked['make_model'].iloc[0] == 'steady'
+    assert ranked.loc[ranked['make_model'] == 'steady', 'danger_score_upper_rank'].item() == 1
+    assert ranked.loc[ranked['make_model'] != 'steady', 'danger_score_upper_rank'].isna().all()
+
+def test_intervals_are_seeded():
+    first = u.bootstrap_score_intervals(scored_accidents(), resamples=200, seed=1, min_scored_accidents=1)
+    second = u.bootstrap_score_intervals(scored_accidents(), resamples=200, seed=1, min_scored_accidents=1)
+    pd.testing.assert_frame_equal(first, second)
+    assert first.loc['solo', 'mean_danger_score_lower'] == first.loc['solo', 'mean_danger_score_upper'] == .5
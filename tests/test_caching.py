@@ -0,0 +1,93 @@
+import os
+import time
+
+import pandas as pd
+import pytest
+
+import utility as u
+
+calls = []
+
+def read_numbers(path):
+    calls.append('read_numbers')
+    return pd.read_csv(path)
+
+def double_numbers(df):
+    calls.append('double_numbers')
+    return df.assign(number=df['number'] * 2)
+
+def shift_numbers(df, shift=0):
+    calls.append('shift_numbers')
+    return df.assign(number=df['number'] + shift)
+
+def run(raw_path, cache_dir, shift=0, max_cache_bytes=u.default_max_cache_bytes):
+    calls.clear()
+    stages = [(double_numbers, {}), (shift_numbers, {'shift': shift})]
+    result = u.run_cached_stages(raw_path, read_numbers, stages, cache_dir, max_cache_bytes)
+    return result, list(calls)
+
+@pytest.fixture
+def raw_path(tmp_path):
+    path = str(tmp_path / 'numbers.csv')
+    pd.DataFrame({'number': range(100)}).to_csv(path, index=False)
+    return path
+
+def stage_files(cache_dir):
+    return sorted(os.listdir(os.path.join(cache_dir, 'stages')))
+
+def test_cache_hits_and_invalidation(raw_path, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+
+    cold, cold_calls = run(raw_path, cache_dir, shift=1)
+    assert cold_calls == ['read_numbers', 'double_numbers', 'shift_numbers']
+    assert list(cold['number'][:3]) == [1, 3, 5]
+
+    warm, warm_calls = run(raw_path, cache_dir, shift=1)
+    assert warm_calls == []
+    pd.testing.assert_frame_equal(warm, cold)
+
+    # a new parameter of the last stage only reruns that stage, from the cached output of the first
+    shifted, shifted_calls = run(raw_path, cache_dir, shift=10)
+    assert shifted_calls == ['shift_numbers']
+    assert list(shifted['number'][:3]) == [10, 12, 14]
+
+    # a new input file reruns every stage
+    pd.DataFrame({'number': range(5, 105)}).to_csv(raw_path, index=False)
+    changed, changed_calls = run(raw_path, cache_dir, shift=1)
+    assert changed_calls == ['read_numbers', 'double_numbers', 'shift_numbers']
+    assert list(changed['number'][:3]) == [11, 13, 15]
+
+def test_least_recently_used_stages_are_evicted(tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    df = pd.DataFrame({'number': range(1_000)})
+    for position, key in enumerate(['a', 'b', 'c']):
+        u.save_stage(df, key, 'stage', cache_dir)
+        last_access = time.time() - 100 + position
+        os.utime(u.stage_path(key, 'stage', cache_dir), (last_access, last_access))
+    stage_bytes = os.path.getsize(u.stage_path('a', 'stage', cache_dir))
+
+    # reading 'a' makes it the most recently used, so 'b' is the first to go
+    pd.testing.assert_frame_equal(u.load_stage('a', 'stage', cache_dir), df)
+    evicted = u.evict_stages(cache_dir, max_cache_bytes=2 * stage_bytes)
+    assert evicted == [u.stage_path('b', 'stage', cache_dir)]
+    assert u.load_stage('b', 'stage', cache_dir) is None
+    assert u.load_stage('c', 'stage', cache_dir) is not None
+
+def test_a_stage_larger_than_the_budget_is_evicted_once_saved(raw_path, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    u.save_stage(pd.DataFrame({'number': range(1_000)}), 'large', 'stage', cache_dir, max_cache_bytes=1)
+    assert stage_files(cache_dir) == []
+    assert u.load_stage('large', 'stage', cache_dir) is None
+
+    uncached, _ = run(raw_path, str(tmp_path / 'uncached'), shift=1)
+    result, calls_made = run(raw_path, cache_dir, shift=1, max_cache_bytes=1)
+    assert stage_files(cache_dir) == []
+    pd.testing.assert_frame_equal(result, uncached)
+    assert run(raw_path, cache_dir, shift=1, max_cache_bytes=1)[1] == calls_made
+
+def test_unreadable_stage_is_a_miss(tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    u.save_stage(pd.DataFrame({'number': [1]}), 'broken', 'stage', cache_dir)
+    with open(u.stage_path('broken', 'stage', cache_dir), 'wb') as file:
+        file.write(b'not a stage')
+    assert u.load_stage('broken', 'stage', cache_dir) is None
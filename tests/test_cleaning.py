@@ -0,0 +1,99 @@
+import os
+import warnings
+
+import pandas as pd
+import pytest
+
+import utility as u
+from synthetic_data import make_aviation_data, make_b43_inventory
+
+replacements = {'BOEING CO': 'boeing', 'CESSNA AIRCRAFT': 'cessna'}
+calls = []
+
+def replace_manufacturer(name):
+    calls.append(name)
+    return replacements.get(name, name.lower()) if isinstance(name, str) else name
+
+def other_replace_manufacturer(name):
+    return replacements.get(name, name.upper()) if isinstance(name, str) else name
+
+def test_rules_fingerprint_changes_with_rules_and_code():
+    fingerprint = u.rules_fingerprint(replacements, functions=[replace_manufacturer])
+    assert fingerprint == u.rules_fingerprint(dict(reversed(replacements.items())), functions=[replace_manufacturer])
+    assert fingerprint != u.rules_fingerprint({**replacements, 'PIPER': 'piper'}, functions=[replace_manufacturer])
+    assert fingerprint != u.rules_fingerprint(replacements, functions=[other_replace_manufacturer])
+
+def test_lookup_table_is_reused_and_rebuilt_when_the_rules_change(tmp_path):
+    manufacturers = pd.Series(['BOEING CO', 'Piper', 'BOEING CO', None, 'CESSNA AIRCRAFT', 'Piper'], index=range(10, 16))
+    cache_dir = str(tmp_path)
+
+    def normalize(rules):
+        calls.clear()
+        result = u.normalize_manufacturers(manufacturers, replace_manufacturer, rules, 'test_manufacturers', cache_dir=cache_dir)
+        return result, sorted(name for name in calls if isinstance(name, str))
+
+    cold, cold_calls = normalize(replacements)
+    assert cold_calls == ['BOEING CO', 'CESSNA AIRCRAFT', 'Piper']
+    assert len(os.listdir(cache_dir)) == 1
+
+    warm, warm_calls = normalize(replacements)
+    assert warm_calls == []
+    pd.testing.assert_series_equal(warm, cold)
+    assert list(cold.astype(object).fillna('missing')) == ['boeing', 'piper', 'boeing', 'missing', 'cessna', 'piper']
+    assert list(cold.index) == list(manufacturers.index)
+
+    _, changed_calls = normalize({**replacements, 'PIPER': 'piper'})
+    assert changed_calls == ['BOEING CO', 'CESSNA AIRCRAFT', 'Piper']
+    assert len(os.listdir(cache_dir)) == 2
+
+@pytest.mark.parametrize('make_raw, clean', [
+    (make_aviation_data, u.clean_data_PA),
+    (make_b43_inventory, u.clean_data_PI),
+], ids=['accidents', 'inventory'])
+def test_warm_lookup_tables_give_the_cold_output(make_raw, clean, tmp_path):
+    raw = make_raw(rows=5_000, seed=4)
+    cache_dir = str(tmp_path)
+
+    uncached = clean(raw, cache_dir=None)
+    cold = clean(raw, cache_dir=cache_dir)
+    warm = clean(raw, cache_dir=cache_dir)
+
+    assert len(os.listdir(cache_dir)) == 1
+    pd.testing.assert_frame_equal(cold, uncached)
+    pd.testing.assert_frame_equal(warm, cold)
+
+def test_parse_dates_falls_back_and_warns_about_unparseable_dates():
+    dates = pd.Series(['2001-05-03', '05/04/2002', 'March 5, 2003', None, 'not a date', '2001-05-03', 'not a date', '2004-13-45'])
+
+    with pytest.warns(UserWarning, match=r'3 event dates could not be parsed .*not a date.*2004-13-45'):
+        parsed = u.parse_dates_PA(dates)
+
+    expected = pd.to_datetime(['2001-05-03', '2002-05-04', '2003-03-05', None, None, '2001-05-03', None, None])
+    pd.testing.assert_series_equal(parsed, pd.Series(expected))
+
+def test_parse_dates_does_not_warn_on_well_formed_dates():
+    dates = pd.Series(['2001-05-03', None, '1999-12-31'])
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', UserWarning)
+        parsed = u.parse_dates_PA(dates)
+    assert list(parsed.dt.year.dropna()) == [2001, 1999]
+    assert parsed.isna().tolist() == [False, True, False]
+
+@pytest.mark.parametrize('keep_date', [False, True])
+def test_clean_data_keeps_the_parsed_date(keep_date):
+    raw = make_aviation_data(rows=200, seed=5)
+    raw['Amateur.Built'] = 'No'
+    raw.loc[0, 'Event.Date'] = '07/04/1990'
+    raw.loc[1, 'Event.Date'] = 'unknown'
+
+    with pytest.warns(UserWarning, match='1 event dates could not be parsed'):
+        plane_accidents = u.clean_data_PA(raw, cache_dir=None, keep_date=keep_date)
+
+    assert plane_accidents.loc[0, 'year'] == 1990
+    assert pd.isna(plane_accidents.loc[1, 'year'])
+    if keep_date:
+        assert list(plane_accidents.columns[:2]) == ['year', 'date']
+        assert plane_accidents.loc[0, 'date'] == pd.Timestamp('1990-07-04')
+        pd.testing.assert_series_equal(plane_accidents['date'].dt.year, plane_accidents['year'], check_names=False)
+    else:
+        assert 'date' not in plane_accidents
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import utility as u
+
+@pytest.fixture
+def plane_inventory():
+    rng = np.random.default_rng(0)
+    group_sizes = {('boeing 737', 'large'): 20_000, ('airbus a320', 'large'): 5_000, ('cessna 172', 'small'): 300,
+                   ('beech 99', 'small'): 3}
+    frames = []
+    for (make_model, plane_size), distinct_aircraft in group_sizes.items():
+        serial_numbers = rng.integers(0, distinct_aircraft, size=distinct_aircraft * 3)
+        serial_numbers[:distinct_aircraft] = np.arange(distinct_aircraft)
+        frames.append(pd.DataFrame({
+            'make_model': make_model,
+            'plane_size': plane_size,
+            'serial_number': [f'{make_model[:2]}{serial:06d}' for serial in serial_numbers],
+        }))
+    plane_inventory = pd.concat(frames, ignore_index=True).sample(frac=1, random_state=0).reset_index(drop=True)
+    plane_inventory.loc[::97, 'serial_number'] = None
+    return plane_inventory
+
+def test_exact_counts_equal_nunique(plane_inventory):
+    known_serial_numbers = plane_inventory.dropna(subset=['serial_number'])
+    expected = known_serial_numbers.groupby(['make_model', 'plane_size'], sort=False)['serial_number'].nunique()
+    result = u.count_distinct_aircraft_PI(plane_inventory, 'exact')
+    pd.testing.assert_series_equal(result, expected.rename('number_of_planes'))
+
+def test_hll_counts_are_within_the_error_bound(plane_inventory):
+    known_serial_numbers = plane_inventory.dropna(subset=['serial_number'])
+    expected = known_serial_numbers.groupby(['make_model', 'plane_size'], sort=False)['serial_number'].nunique()
+    result = u.count_distinct_aircraft_PI(plane_inventory, 'hll', precision=12)
+
+    # the standard error is 1.04 / sqrt(2**12), about 1.6%; allow three of them
+    relative_errors = (result - expected).abs() / expected
+    assert relative_errors.max() < 3 * 1.04 / np.sqrt(2**12)
+    assert result[('beech 99', 'small')] == 3
+
+@pytest.mark.parametrize('mode', u.distinct_modes)
+def test_merged_chunk_summaries_equal_the_whole_summary(plane_inventory, mode):
+    whole = u.distinct_aircraft_summary(plane_inventory, mode)
+    merged = u.merge_distinct_aircraft_summaries(
+        [u.distinct_aircraft_summary(chunk, mode) for chunk in u.split_rows(plane_inventory, 5)], mode
+    )
+
+    if mode == 'exact':
+        sort_columns = ['make_model', 'plane_size', 'serial_hash']
+        whole = whole.sort_values(sort_columns, ignore_index=True)
+        merged = merged.sort_values(sort_columns, ignore_index=True)
+    pd.testing.assert_frame_equal(merged, whole)
+    pd.testing.assert_series_equal(u.distinct_aircraft_counts(merged, mode), u.distinct_aircraft_counts(whole, mode))
+
+def test_unknown_mode_raises(plane_inventory):
+    with pytest.raises(ValueError, match='unknown distinct aircraft mode'):
+        u.count_distinct_aircraft_PI(plane_inventory, 'approximate')
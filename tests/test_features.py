@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import utility as u
+
+def reference_injury_feature_PA(plane_accidents):
+
+    """
+    The row-by-row 'get_injury_feature_PA' that the vectorized version replaced.
+    """
+
+    fatal_category = (plane_accidents['total_fatal_injuries'] > 0).apply(lambda x: 'Fatal' if x else np.nan)
+    serious_category = (plane_accidents['total_serious_injuries'] > 0).apply(lambda x: 'Serious' if x else np.nan)
+    minor_category = (plane_accidents['total_minor_injuries'] > 0).apply(lambda x: 'Minor' if x else np.nan)
+    categorized_injuries = pd.concat([fatal_category, serious_category, minor_category], axis=1)
+    return categorized_injuries.apply(lambda row: next((injury for injury in row if pd.notna(injury)), np.nan), axis=1).fillna('Unknown')
+
+def reference_injury_feature_numeric_PA(injury_feature):
+
+    """
+    The row-by-row 'get_injury_feature_numeric_PA' that the vectorized version replaced.
+    """
+
+    return injury_feature.apply(
+        lambda x: 0 if x=='Unknown' else 1 if x=='Minor' else 2 if x=='Serious' else 3 if x=='Fatal' else np.nan
+    )
+
+def reference_damage_feature_numeric_PA(aircraft_damage):
+
+    """
+    The row-by-row damage scoring of 'engineer_damage_feature_PA' that the vectorized version replaced.
+    """
+
+    raw_dmg_score = aircraft_damage.apply(
+        lambda x: 0 if x == 'Unknown' else 1 if x == 'Minor' else 2 if x=='Substantial' else 3 if x=='Destroyed' else np.nan
+    )
+    return 10*((raw_dmg_score - raw_dmg_score.min()) / (raw_dmg_score.max() - raw_dmg_score.min()))
+
+def reference_plane_size_PI(number_of_seats):
+
+    """
+    The row-by-row 'plane_size' mapping that the seat bins replaced.
+    """
+
+    return number_of_seats.apply(
+        lambda x: 'small' if 3 <= x <= 20 else ('medium' if 21 <= x <= 100 else ('large' if 101 <= x <= 524 else ''))
+    )
+
+def injury_counts(rng, rows):
+    counts = rng.choice([0, 0, 0, 1, 2, 5], size=rows).astype(float)
+    counts[rng.random(rows) < .2] = np.nan
+    return counts
+
+@pytest.fixture
+def plane_accidents():
+    rng = np.random.default_rng(0)
+    rows = 5_000
+    return pd.DataFrame({
+        'total_fatal_injuries': injury_counts(rng, rows),
+        'total_serious_injuries': injury_counts(rng, rows),
+        'total_minor_injuries': injury_counts(rng, rows),
+        'aircraft_damage': rng.choice(
+            np.array(['Unknown', 'Minor', 'Substantial', 'Destroyed', 'Unk', 'destroyed', None], dtype=object), size=rows
+        ),
+    })
+
+@pytest.mark.parametrize('categorical', [False, True])
+def test_accident_features_match_row_by_row_scoring(plane_accidents, categorical):
+    if categorical:
+        plane_accidents['aircraft_damage'] = plane_accidents['aircraft_damage'].astype('category')
+
+    expected_injury = reference_injury_feature_PA(plane_accidents)
+    expected_injury_numeric = reference_injury_feature_numeric_PA(expected_injury).astype(float)
+    expected_injury_numeric = 10*(
+        (expected_injury_numeric - expected_injury_numeric.min()) / (expected_injury_numeric.max() - expected_injury_numeric.min())
+    )
+    expected_damage_numeric = reference_damage_feature_numeric_PA(plane_accidents['aircraft_damage'].astype(object))
+
+    result = u.engineer_damage_feature_PA(u.engineer_accident_features_PA(plane_accidents))
+
+    pd.testing.assert_series_equal(result['human_injury'].astype(object), expected_injury, check_names=False)
+    pd.testing.assert_series_equal(result['human_injury_numeric'], expected_injury_numeric, check_names=False)
+    pd.testing.assert_series_equal(result['aircraft_damage_numeric'], expected_damage_numeric, check_names=False)
+
+def test_injury_feature_numeric_matches_row_by_row_scoring():
+    injury_feature = pd.Series(['Fatal', 'Serious', 'Minor', 'Unknown', 'fatal', None, np.nan, 'x'], dtype=object)
+    expected = reference_injury_feature_numeric_PA(injury_feature).astype(float)
+    pd.testing.assert_series_equal(u.get_injury_feature_numeric_PA(injury_feature), expected)
+    pd.testing.assert_series_equal(u.get_injury_feature_numeric_PA(injury_feature.astype('category')), expected)
+
+def test_plane_size_matches_row_by_row_mapping():
+    number_of_seats = [-1, 0, 2, 3, 10, 20, 20.5, 21, 100, 101, 524, 525, 1000, np.nan]
+    plane_inventory = pd.DataFrame({'number_of_seats': number_of_seats}, index=np.arange(100, 100 + len(number_of_seats)))
+    expected = reference_plane_size_PI(plane_inventory['number_of_seats'])
+
+    result = u.engineer_plane_size_feature_PI(plane_inventory)
+
+    pd.testing.assert_series_equal(result['plane_size'].astype(object), expected, check_names=False)
+    assert list(result['plane_size'].cat.categories) == ['', 'small', 'medium', 'large']
+    assert 'plane_size' not in plane_inventory
+
+@pytest.mark.parametrize('size_bins', [
+    {},
+    {'a': (0, 50), 'b': (10, 20)},
+    {'a': (0, 10), 'b': (10, 20)},
+    {'a': (20, 10)},
+])
+def test_invalid_size_bins_raise(size_bins):
+    with pytest.raises(ValueError):
+        u.engineer_plane_size_feature_PI(pd.DataFrame({'number_of_seats': [30.]}), size_bins)
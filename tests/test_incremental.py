@@ -0,0 +1,73 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import utility as u
+from synthetic_data import write_raw_csvs
+
+@pytest.fixture
+def raw_files(tmp_path):
+    accidents_path, inventory_path = write_raw_csvs(str(tmp_path / 'raw'), scale=.01, seed=0)
+    return u.read_raw_PA(accidents_path), u.read_raw_PI(inventory_path)
+
+def test_incremental_ult_df_matches_ult_df(raw_files, tmp_path):
+    plane_accidents_raw, plane_inventory_raw = raw_files
+    cache_dir = str(tmp_path / 'cache')
+    summaries_dir = str(tmp_path / 'summaries')
+
+    accident_batches = np.array_split(plane_accidents_raw, 4)
+    inventory_years = [year_rows for _, year_rows in plane_inventory_raw.groupby('YEAR', sort=True)]
+    for batch in range(max(len(accident_batches), len(inventory_years))):
+        new_accidents_path = new_inventory_path = None
+        if batch < len(accident_batches):
+            new_accidents_path = str(tmp_path / f'accidents_{batch}.csv')
+            accident_batches[batch].to_csv(new_accidents_path, index=False, encoding='latin-1')
+        if batch < len(inventory_years):
+            new_inventory_path = str(tmp_path / f'inventory_{batch}.csv')
+            inventory_years[batch].to_csv(new_inventory_path, index=False)
+        final_results = u.incremental_ult_df(
+            summaries_dir, new_accidents_path, new_inventory_path, chunksize=300, cache_dir=cache_dir
+        )
+
+    assert not final_results.empty
+    folded_inventory = pd.concat(inventory_years, ignore_index=True)
+    plane_accidents_4F = u.build_accident_features_PA(plane_accidents_raw, cache_dir=cache_dir)
+    plane_inventory_2F = u.build_inventory_features_PI(folded_inventory, cache_dir=cache_dir)
+    pd.testing.assert_frame_equal(final_results, u.ult_df(plane_accidents_4F, plane_inventory_2F), check_exact=False, rtol=1e-12)
+
+def test_summaries_do_not_depend_on_stage_format(raw_files, tmp_path):
+    plane_accidents_raw, plane_inventory_raw = raw_files
+    accidents_path = str(tmp_path / 'accidents.csv')
+    inventory_path = str(tmp_path / 'inventory.csv')
+    plane_accidents_raw.to_csv(accidents_path, index=False, encoding='latin-1')
+    plane_inventory_raw.to_csv(inventory_path, index=False)
+    summaries_dir = str(tmp_path / 'summaries')
+
+    accident_summary, inventory_summary = u.update_summaries(
+        summaries_dir, accidents_path, inventory_path, cache_dir=str(tmp_path / 'cache')
+    )
+    assert sorted(os.listdir(summaries_dir)) == [f'accident_summary.{u.summary_format}', f'inventory_summary.{u.summary_format}']
+    saved_accident_summary, saved_inventory_summary = u.load_summaries(summaries_dir)
+    pd.testing.assert_frame_equal(saved_accident_summary, accident_summary)
+    pd.testing.assert_series_equal(saved_inventory_summary, inventory_summary)
+
+def test_missing_summaries_in_a_used_directory_raise(tmp_path):
+    summaries_dir = tmp_path / 'summaries'
+    summaries_dir.mkdir()
+    (summaries_dir / 'accident_summary.parquet').write_bytes(b'')
+
+    with pytest.raises(FileNotFoundError, match='accident_summary.parquet'):
+        u.load_summaries(str(summaries_dir))
+    assert u.load_summaries(str(tmp_path / 'new_summaries')) == (None, None)
+
+def test_first_update_without_accidents_raises_before_saving(raw_files, tmp_path):
+    _, plane_inventory_raw = raw_files
+    inventory_path = str(tmp_path / 'inventory.csv')
+    plane_inventory_raw.to_csv(inventory_path, index=False)
+    summaries_dir = tmp_path / 'summaries'
+
+    with pytest.raises(ValueError, match='no accidents summary'):
+        u.incremental_ult_df(str(summaries_dir), new_inventory_path=inventory_path, cache_dir=str(tmp_path / 'cache'))
+    assert not summaries_dir.exists() or not os.listdir(summaries_dir)
@@ -0,0 +1,55 @@
+import numpy as np
+
+import utility as u
+
+def naive_best_matches(queries, candidates, threshold=.7, n=3):
+
+    """
+    Compares every query with every candidate, as 'best_matches' did before the inverted index.
+    """
+
+    candidates = list(dict.fromkeys(candidates))
+    matches = {}
+    for query in dict.fromkeys(queries):
+        key = u.matching_key(query)
+        exact = next((candidate for candidate in candidates if key and u.matching_key(candidate) == key), None)
+        if exact is not None:
+            matches[query] = [exact, 1.0]
+            continue
+        query_ngrams = u.name_ngrams(query, n)
+        best, best_similarity = None, 0.0
+        for candidate in candidates:
+            candidate_ngrams = u.name_ngrams(candidate, n)
+            if not query_ngrams or not candidate_ngrams:
+                continue
+            similarity = 2 * len(query_ngrams & candidate_ngrams) / (len(query_ngrams) + len(candidate_ngrams))
+            if similarity > best_similarity:
+                best, best_similarity = candidate, similarity
+        matches[query] = [best, best_similarity] if best is not None and best_similarity >= threshold else [None, 0.0]
+    return matches
+
+def perturbed_names(rng, names, count):
+    letters = np.array(list('abcdefghijklmnopqrstuvwxyz /.'))
+    perturbed = []
+    for _ in range(count):
+        name = list(rng.choice(names))
+        for _ in range(rng.integers(0, 4)):
+            position = rng.integers(0, len(name) + 1)
+            if rng.random() < .5 and position < len(name):
+                del name[position]
+            else:
+                name.insert(position, rng.choice(letters))
+        perturbed.append(''.join(name))
+    return perturbed
+
+def test_best_matches_equals_naive_dice():
+    rng = np.random.default_rng(0)
+    makes = ['boeing', 'cessna', 'piper', 'mcdonnell douglas', 'airbus', 'embraer', 'bombardier', 'gulfstream aerospace',
+             'beech', 'learjet', 'de havilland', 'saab', 'fokker', 'canadair', 'bellanca']
+    candidates = perturbed_names(rng, makes, 60) + ['', 'ab']
+    queries = perturbed_names(rng, makes, 200) + ['', 'x', 'BOEING', 'zzzz qqqq', np.nan]
+
+    for threshold in [0., .5, .7]:
+        matches = u.best_matches(queries, candidates, threshold)
+        assert matches == naive_best_matches(queries, candidates, threshold)
+        assert 0 < sum(match is not None for match, _ in matches.values()) < len(matches)
@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import utility as u
+from synthetic_data import make_aviation_data, make_b43_inventory
+
+def shuffled_index(df):
+    return df.set_axis(np.random.default_rng(0).permutation(len(df)) * 3 + 1000)
+
+@pytest.mark.parametrize('rows', [2_000, 1], ids=['partitions', 'empty partition'])
+@pytest.mark.parametrize('make_raw, build', [
+    (make_aviation_data, u.build_accident_features_PA),
+    (make_b43_inventory, u.build_inventory_features_PI),
+], ids=['accidents', 'inventory'])
+def test_parallel_builders_match_serial_builders(make_raw, build, rows):
+    raw = shuffled_index(make_raw(rows=rows, seed=0))
+    assert len(u.split_rows(raw, 2)[0]) == (rows // 2)
+
+    expected = build(raw, cache_dir=None)
+    result = build(raw, cache_dir=None, workers=2, min_parallel_rows=0)
+
+    pd.testing.assert_frame_equal(result, expected)
+
+def test_map_partitions_keeps_partition_order():
+    df = shuffled_index(pd.DataFrame({'value': np.arange(10)}))
+    partitions = u.map_partitions(pd.DataFrame.copy, df, workers=3, min_rows=0)
+    assert [len(partition) for partition in partitions] == [3, 3, 4]
+    pd.testing.assert_frame_equal(pd.concat(partitions), df)
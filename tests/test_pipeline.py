@@ -0,0 +1,23 @@
+import pandas as pd
+import pytest
+
+import utility as u
+from benchmark_feature_memory import staged_accident_features, staged_inventory_features, measure
+from synthetic_data import make_aviation_data, make_b43_inventory
+
+rows = 20_000
+
+@pytest.mark.parametrize('make_raw, staged, fused', [
+    (make_aviation_data, staged_accident_features, lambda raw: u.build_accident_features_PA(raw, cache_dir=None)),
+    (make_b43_inventory, staged_inventory_features, lambda raw: u.build_inventory_features_PI(raw, cache_dir=None)),
+], ids=['accidents', 'inventory'])
+def test_fused_builders_match_staged_chain_with_less_memory(make_raw, staged, fused):
+    raw = make_raw(rows=rows, seed=0)
+    raw_before = raw.copy()
+
+    expected, _, staged_peak = measure(staged, raw)
+    result, _, fused_peak = measure(fused, raw)
+
+    pd.testing.assert_frame_equal(result, expected)
+    pd.testing.assert_frame_equal(raw, raw_before)
+    assert fused_peak < staged_peak
@@ -0,0 +1,97 @@
+import json
+import os
+import subprocess
+import sys
+
+import pandas as pd
+import pytest
+
+import utility as u
+
+repository_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture
+def final_df():
+    return pd.DataFrame({
+        'make_model': ['boeing 737', 'airbus a320', 'embraer 190', 'cessna 172', 'piper pa-28', 'beech 99'],
+        'size': ['large', 'large', 'medium', 'small', 'small', 'small'],
+        'number_of_planes': [900, 800, 300, 50, 40, 30],
+        'recorded_accidents_for_plane_model': [12., 8., 3., 40., 35., None],
+        'mean_human_injury_score': [1.5, 2., .5, 3., 4., None],
+        'mean_aircraft_damage_score': [3., 2.5, 1., 5., 6., None],
+        'mean_danger_score': [2.6, 2.4, .9, 4.5, 5.5, None],
+        'recorded_accidents_per_plane_in_inventory': [.013, .01, .01, .8, .875, None],
+    })
+
+@pytest.fixture
+def index_path(final_df, tmp_path):
+    return u.build_query_index(final_df, str(tmp_path / 'index' / 'final.sqlite'))
+
+def test_queries(index_path):
+    connection = u.open_query_index(index_path)
+    try:
+        rows = u.lookup_make_model(connection, '  Boeing 737 ')
+        assert [(row['make_model'], row['number_of_planes'], row['mean_danger_score']) for row in rows] == [('boeing 737', 900, 2.6)]
+        assert u.lookup_make_model(connection, 'concorde') == []
+
+        assert [row['make_model'] for row in u.top_safest(connection, n=1)] == ['airbus a320', 'embraer 190', 'cessna 172']
+        assert [row['make_model'] for row in u.top_safest(connection, n=5, size='small')] == ['cessna 172', 'piper pa-28']
+
+        assert [row['make_model'] for row in u.above_danger_threshold(connection, 2.5)] == ['piper pa-28', 'cessna 172', 'boeing 737']
+        assert [row['make_model'] for row in u.above_danger_threshold(connection, 2.5, size='large')] == ['boeing 737']
+    finally:
+        connection.close()
+
+def test_index_from_csv_matches_index_from_dataframe(final_df, index_path, tmp_path):
+    csv_path = str(tmp_path / 'final.csv')
+    final_df.to_csv(csv_path)
+    csv_index_path = u.build_query_index(csv_path, str(tmp_path / 'from_csv.sqlite'))
+
+    for path in [index_path, csv_index_path]:
+        connection = u.open_query_index(path)
+        try:
+            rows = u.top_safest(connection, n=10)
+        finally:
+            connection.close()
+        assert [row['make_model'] for row in rows] == ['airbus a320', 'boeing 737', 'embraer 190', 'cessna 172', 'piper pa-28']
+
+def test_command_line(final_df, tmp_path, capsys):
+    csv_path = str(tmp_path / 'final.csv')
+    final_df.to_csv(csv_path)
+    index_path = str(tmp_path / 'final.sqlite')
+
+    assert u.query_main(['build', '--from-csv', csv_path, '--index', index_path]) == 0
+    assert os.path.exists(index_path)
+    capsys.readouterr()
+
+    assert u.query_main(['--index', index_path, '--format', 'json', 'score', 'cessna 172']) == 0
+    assert [row['make_model'] for row in json.loads(capsys.readouterr().out)] == ['cessna 172']
+
+    assert u.query_main(['top', '-n', '1', '--size', 'large', '--index', index_path, '--format', 'json']) == 0
+    assert [row['make_model'] for row in json.loads(capsys.readouterr().out)] == ['airbus a320']
+
+    assert u.query_main(['above', '5', '--index', index_path]) == 0
+    assert 'piper pa-28' in capsys.readouterr().out
+
+    assert u.query_main(['score', 'concorde', '--index', index_path]) == 1
+    assert 'no matching planes' in capsys.readouterr().out
+
+    assert u.query_main(['score', 'cessna 172', '--index', str(tmp_path / 'missing.sqlite')]) == 1
+    assert 'no query index' in capsys.readouterr().err
+
+def test_default_index_path_does_not_depend_on_the_working_directory():
+    assert u.default_query_index_path == os.path.join(repository_dir, 'data', 'final_data_for_tableau.sqlite')
+
+def test_queries_do_not_import_pandas(index_path, tmp_path):
+    script = (
+        'import sys\n'
+        'import utility\n'
+        'from utility.utils.query import query_main\n'
+        f'status = query_main(["score", "boeing 737", "--index", {index_path!r}])\n'
+        'print("pandas" in sys.modules, status)\n'
+    )
+    result = subprocess.run(
+        [sys.executable, '-c', script], cwd=str(tmp_path), capture_output=True, text=True, check=True,
+        env={**os.environ, 'PYTHONPATH': repository_dir}
+    )
+    assert result.stdout.splitlines()[-1] == 'False 0'
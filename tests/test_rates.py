@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import utility as u
+
+def naive_yearly_accident_rates(plane_accidents, plane_inventory, window):
+
+    """
+    Counts the exposure and the accidents of every model and year with one filter each, as a per-model loop would.
+    """
+
+    inventory = plane_inventory.dropna(subset=['make_model', 'year'])
+    first_year, last_year = int(inventory['year'].min()), int(inventory['year'].max())
+    # accidents outside the years of the inventory have no exposure to divide by
+    plane_accidents = plane_accidents[plane_accidents['year'].between(first_year, last_year)]
+    rows = []
+    for make_model in pd.unique(inventory['make_model']):
+        model_inventory = inventory[inventory['make_model'] == make_model]
+        model_accidents = plane_accidents[plane_accidents['make_model'] == make_model]
+        for year in range(first_year, last_year + 1):
+            in_window = lambda years: (years > year - window) & (years <= year)
+            rolling_aircraft_years = int(in_window(model_inventory['year']).sum())
+            if not rolling_aircraft_years:
+                continue
+            aircraft_years = int((model_inventory['year'] == year).sum())
+            recorded_accidents = int((model_accidents['year'] == year).sum())
+            rolling_accidents = int(in_window(model_accidents['year']).sum())
+            rows.append({
+                'make_model': make_model,
+                'year': year,
+                'aircraft_years': aircraft_years,
+                'recorded_accidents': recorded_accidents,
+                'accident_rate': recorded_accidents / aircraft_years if aircraft_years else np.nan,
+                'rolling_aircraft_years': rolling_aircraft_years,
+                'rolling_accidents': rolling_accidents,
+                'rolling_accident_rate': rolling_accidents / rolling_aircraft_years,
+            })
+    return pd.DataFrame(rows).set_index(['make_model', 'year'])
+
+@pytest.fixture
+def accidents_and_inventory():
+    rng = np.random.default_rng(0)
+    make_models = ['boeing 737', 'airbus a320', 'cessna 172', 'beech 99', 'piper pa-28']
+    inventory_years = rng.integers(2006, 2023, size=3_000).astype(float)
+    inventory_models = rng.choice(make_models[:4], size=3_000)
+    # a model that leaves the inventory, so its rolling window runs out
+    inventory_years[inventory_models == 'beech 99'] = rng.choice([2006., 2007.], size=(inventory_models == 'beech 99').sum())
+    plane_inventory = pd.DataFrame({'make_model': inventory_models, 'year': inventory_years})
+    plane_accidents = pd.DataFrame({
+        'make_model': rng.choice(make_models, size=1_000),
+        'year': rng.integers(1990, 2025, size=1_000).astype(float),
+    })
+    plane_accidents.loc[::50, 'year'] = np.nan
+    return plane_accidents, plane_inventory
+
+@pytest.mark.parametrize('window', [1, 3, 5])
+def test_rolling_rates_match_a_naive_loop(accidents_and_inventory, window):
+    plane_accidents, plane_inventory = accidents_and_inventory
+    expected = naive_yearly_accident_rates(plane_accidents, plane_inventory, window)
+    result = u.yearly_accident_rates(plane_accidents, plane_inventory, window)
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False, check_index_type=False)
+
+def test_recent_rates(accidents_and_inventory):
+    plane_accidents, plane_inventory = accidents_and_inventory
+    rates = u.yearly_accident_rates(plane_accidents, plane_inventory, window=3)
+
+    recent = u.recent_accident_rates(rates)
+    assert list(recent.index) == ['boeing 737', 'airbus a320', 'cessna 172']
+    pd.testing.assert_frame_equal(recent, u.recent_accident_rates(rates, 2022))
+    assert 'beech 99' in u.recent_accident_rates(rates, 2009).index
+
+    for year in [2005, 2023]:
+        with pytest.raises(ValueError, match=f'no accident rates for {year}'):
+            u.recent_accident_rates(rates, year)
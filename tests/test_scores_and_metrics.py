@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import utility as u
+from synthetic_data import make_aviation_data, make_b43_inventory
+
+@pytest.fixture(scope='module')
+def features():
+    plane_accidents = u.clean_data_PA(make_aviation_data(rows=20_000, seed=3), cache_dir=None)
+    plane_accidents_3F = u.engineer_damage_feature_PA(u.engineer_accident_features_PA(u.engineer_make_model_feature_PAPI(plane_accidents)))
+    plane_inventory_2F = u.build_inventory_features_PI(make_b43_inventory(rows=20_000, seed=3), cache_dir=None)
+    return plane_accidents_3F, plane_inventory_2F
+
+@pytest.mark.parametrize('aircraft_dmg_w, human_injury_w', [(.75, .25), (.3, .7), (1., 0.)])
+def test_one_point_sweep_matches_ult_df(features, aircraft_dmg_w, human_injury_w):
+    plane_accidents_3F, plane_inventory_2F = features
+    final_df = u.ult_df(u.engineer_danger_score_PA(plane_accidents_3F, aircraft_dmg_w, human_injury_w), plane_inventory_2F)
+
+    sweep = u.ult_weight_sweep(
+        plane_accidents_3F, plane_inventory_2F, [(aircraft_dmg_w, human_injury_w)], reference_weights=(aircraft_dmg_w, human_injury_w)
+    )
+
+    assert list(sweep['make_model']) == list(final_df['make_model'])
+    assert list(sweep['size']) == list(final_df['size'])
+    np.testing.assert_allclose(sweep['mean_danger_score'], final_df['mean_danger_score'], rtol=1e-12)
+    expected_rank = final_df.groupby('size', sort=False)['mean_danger_score'].rank(method='min')
+    np.testing.assert_array_equal(sweep['rank'], expected_rank)
+    np.testing.assert_array_equal(sweep['rank_change'].dropna(), 0)
@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+
+import utility as u
+from synthetic_data import write_raw_csvs
+
+def test_stream_ult_df_matches_ult_df(tmp_path):
+    accidents_path, inventory_path = write_raw_csvs(str(tmp_path / 'raw'), scale=.01, seed=1)
+    cache_dir = str(tmp_path / 'cache')
+
+    final_results = u.stream_ult_df(accidents_path, inventory_path, chunksize=250, cache_dir=cache_dir)
+
+    plane_accidents_4F = u.build_accident_features_PA(u.read_raw_PA(accidents_path), cache_dir=cache_dir)
+    plane_inventory_2F = u.build_inventory_features_PI(u.read_raw_PI(inventory_path), cache_dir=cache_dir)
+    pd.testing.assert_frame_equal(final_results, u.ult_df(plane_accidents_4F, plane_inventory_2F), check_exact=False, rtol=1e-12)
+
+def test_merging_chunk_summaries_matches_whole_summary(tmp_path):
+    accidents_path, inventory_path = write_raw_csvs(str(tmp_path / 'raw'), scale=.01, seed=2)
+    plane_accidents_raw, plane_inventory_raw = u.read_raw_PA(accidents_path), u.read_raw_PI(inventory_path)
+
+    accident_chunks = (u.summarize_accidents_PA(chunk, cache_dir=None) for chunk in np.array_split(plane_accidents_raw, 7))
+    inventory_chunks = (u.summarize_inventory_PI(chunk, cache_dir=None) for chunk in np.array_split(plane_inventory_raw, 7))
+
+    pd.testing.assert_frame_equal(
+        u.merge_accident_summaries(accident_chunks), u.summarize_accidents_PA(plane_accidents_raw, cache_dir=None),
+        check_exact=False, rtol=1e-12
+    )
+    pd.testing.assert_series_equal(
+        u.merge_inventory_summaries(inventory_chunks), u.summarize_inventory_PI(plane_inventory_raw, cache_dir=None)
+    )
@@ -1,4 +1,39 @@
-from .utils.cleaning import *
-from .utils.features import *
-from .utils.scores_and_metrics import *
+import importlib
 
+# The submodules are imported on first use, so that 'import utility' and the query command line do not load pandas and numpy.
+# Names resolve like the star imports of these modules in this order did: a name defined by a later module wins.
+submodules = [
+    'caching',
+    'instrumentation',
+    'cleaning',
+    'features',
+    'distinct',
+    'scores_and_metrics',
+    'rates',
+    'bootstrap',
+    'streaming',
+    'parallel',
+    'pipeline',
+    'incremental',
+    'matching',
+    'query',
+]
+
+def __getattr__(name):
+    if name == '__all__':
+        names = {}
+        for submodule in submodules:
+            module = importlib.import_module(f'.utils.{submodule}', __name__)
+            names.update((attribute, None) for attribute in vars(module) if not attribute.startswith('_'))
+        return list(names)
+    if name.startswith('__'):
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    for submodule in reversed(submodules):
+        module = importlib.import_module(f'.utils.{submodule}', __name__)
+        if name in vars(module):
+            globals()[name] = vars(module)[name]
+            return globals()[name]
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+def __dir__():
+    return sorted(set(globals()) | set(__getattr__('__all__')))
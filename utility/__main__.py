@@ -0,0 +1,3 @@
+from .utils.query import query_main
+
+raise SystemExit(query_main())
@@ -0,0 +1,174 @@
+import numpy as np
+import pandas as pd
+
+from .instrumentation import instrumented
+from .scores_and_metrics import ult_df, rank_within_groups, score_column_names
+
+bootstrap_max_draws = 4_000_000
+default_min_scored_accidents = 5
+
+def grouped_bootstrap_means(values, group_codes, group_count, resamples=1000, rng=None):
+
+    """
+    Parameters:
+    - values (numpy.ndarray): The values to resample, without NaN.
+    - group_codes (numpy.ndarray): The group of each value, from 0 to 'group_count' - 1.
+    - group_count (int): The number of groups.
+    - resamples (int): The number of bootstrap resamples. Default value is 1,000.
+    - rng (numpy.random.Generator): The random generator. Default value is None, which uses an unseeded generator.
+
+    Returns:
+    - numpy.ndarray: The mean of every resample of every group, one row per resample and one column per group.
+      Groups without values get NaN.
+
+    Logic:
+    The values are sorted by group, so each group is a contiguous segment. A resample of every group at once is one row of
+    uniform draws, scaled to positions inside the segment of each value's group, and the resampled sums of all groups are
+    read with a single reduceat over the segments. Resamples are drawn in batches of at most 'bootstrap_max_draws' draws
+    to bound memory. The draws are taken from the generator in the same order whatever the batch size, so a seed
+    always gives the same means.
+    """
+
+    rng = np.random.default_rng() if rng is None else rng
+    order = np.argsort(group_codes, kind='stable')
+    values, group_codes = values[order], group_codes[order]
+    sizes = np.bincount(group_codes, minlength=group_count)
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    is_present = sizes > 0
+    row_starts, row_sizes = starts[group_codes], sizes[group_codes]
+
+    means = np.full((resamples, group_count), np.nan)
+    if not len(values):
+        return means
+    batch_size = max(1, bootstrap_max_draws // len(values))
+    for batch_start in range(0, resamples, batch_size):
+        batch = min(batch_size, resamples - batch_start)
+        positions = row_starts + (rng.random((batch, len(values))) * row_sizes).astype(np.int64)
+        sums = np.add.reduceat(values[positions], starts[is_present], axis=1)
+        means[batch_start:batch_start + batch, is_present] = sums / sizes[is_present]
+    return means
+
+@instrumented
+def bootstrap_score_intervals(
+        plane_accidents_4F,
+        make_models=None,
+        metrics=('danger_score', 'human_injury_numeric', 'aircraft_damage_numeric'),
+        resamples=1000,
+        confidence=.95,
+        seed=0,
+        min_scored_accidents=default_min_scored_accidents
+    ):
+
+    """
+    Parameters:
+    - plane_accidents_4F (pandas.DataFrame): The dataframe of plane accidents data with engineered accident, damage, and danger features.
+    - make_models (iterable): The 'make_model' values to keep. Default value is None, which keeps every 'make_model'.
+    - metrics (tuple): The score columns to bootstrap. Default value is ('danger_score', 'human_injury_numeric', 'aircraft_damage_numeric').
+    - resamples (int): The number of bootstrap resamples. Default value is 1,000.
+    - confidence (float): The confidence level of the intervals. Default value is 0.95.
+    - seed (int): The seed of the random generator, so the same data gives the same intervals. Default value is 0.
+    - min_scored_accidents (int): The number of scored accidents a model needs to get bounds for a metric. Default value is 5.
+
+    Returns:
+    - pandas.DataFrame: A dataframe indexed by 'make_model' with a lower and an upper bound for the mean of each metric, named
+      like the 'ult_df' columns, e.g. 'mean_danger_score_lower' and 'mean_danger_score_upper'.
+
+    Logic:
+    The mean score of a model with a handful of accidents is very uncertain. This function gives percentile bootstrap intervals:
+    the accidents of every model are resampled with replacement 'resamples' times with 'grouped_bootstrap_means', and the
+    bounds are the (1 - confidence) / 2 and (1 + confidence) / 2 quantiles of the resampled means. As for the means, missing
+    scores are left out. Resampling a handful of accidents cannot show how uncertain their mean is: one accident, or a few with
+    the same score, always give an interval of width 0. Models with fewer than 'min_scored_accidents' scored accidents for a
+    metric therefore get NaN bounds for it rather than bounds that look precise.
+    """
+
+    rng = np.random.default_rng(seed)
+    accidents = plane_accidents_4F[['make_model', *metrics]]
+    if make_models is not None:
+        accidents = accidents[accidents['make_model'].isin(make_models)]
+    model_codes, models = pd.factorize(accidents['make_model'].astype(object))
+    quantiles = [(1 - confidence) / 2, (1 + confidence) / 2]
+
+    intervals = pd.DataFrame(index=pd.Index(models, name='make_model'))
+    for metric in metrics:
+        values = accidents[metric].to_numpy(dtype=float)
+        is_known = ~np.isnan(values) & (model_codes >= 0)
+        means = grouped_bootstrap_means(values[is_known], model_codes[is_known], len(models), resamples, rng)
+        is_scored = np.bincount(model_codes[is_known], minlength=len(models)) >= max(min_scored_accidents, 1)
+        bounds = np.full((2, len(models)), np.nan)
+        if resamples and is_scored.any():
+            bounds[:, is_scored] = np.quantile(means[:, is_scored], quantiles, axis=0)
+        column = f'mean_{score_column_names[metric]}'
+        intervals[f'{column}_lower'] = bounds[0]
+        intervals[f'{column}_upper'] = bounds[1]
+    return intervals
+
+@instrumented
+def add_score_intervals(final_df, intervals, rank_by_upper=False):
+
+    """
+    Parameters:
+    - final_df (pandas.DataFrame): The final dataframe returned by 'ult_df'.
+    - intervals (pandas.DataFrame): The bounds returned by 'bootstrap_score_intervals'.
+    - rank_by_upper (bool): Whether to rank the planes of each size by the upper bound of their mean danger score. Default value is False.
+
+    Returns:
+    - pandas.DataFrame: A copy of the final dataframe with the bound columns. With 'rank_by_upper', it also has a
+      'danger_score_upper_rank' column, 1 being the lowest upper bound, and the planes of each size are sorted by it.
+
+    Logic:
+    Ranking by the upper bound ranks a model by how dangerous it could plausibly be, so a model whose low mean only rests on
+    a few accidents does not come out ahead of a model with a long record. Planes with too few scored accidents to get bounds
+    have NaN bounds and come last in their size.
+    """
+
+    final_df = final_df.copy()
+    for column in intervals.columns:
+        final_df[column] = final_df['make_model'].map(intervals[column])
+    if not rank_by_upper:
+        return final_df
+
+    final_df['danger_score_upper_rank'] = rank_within_groups(
+        final_df[['mean_danger_score_upper']].to_numpy(dtype=float), final_df['size'].to_numpy()
+    )[:, 0]
+    size_positions = pd.Series(pd.factorize(final_df['size'])[0], index=final_df.index)
+    order = np.lexsort((final_df['danger_score_upper_rank'].fillna(np.inf).to_numpy(), size_positions.to_numpy()))
+    return final_df.iloc[order].reset_index(drop=True)
+
+@instrumented
+def ult_intervals_df(
+        plane_accidents_4F,
+        plane_inventory_2F,
+        n=10,
+        resamples=1000,
+        confidence=.95,
+        seed=0,
+        rank_by_upper=False,
+        min_scored_accidents=default_min_scored_accidents
+    ):
+
+    """
+    Parameters:
+    - plane_accidents_4F (pandas.DataFrame): The dataframe of plane accidents data with engineered accident, damage, and danger features.
+    - plane_inventory_2F (pandas.DataFrame): The dataframe which contains 'make_model' and 'plane_size' columns.
+    - n (int): The number of top planes by size to include. Default value is 10.
+    - resamples (int): The number of bootstrap resamples. Default value is 1,000.
+    - confidence (float): The confidence level of the intervals. Default value is 0.95.
+    - seed (int): The seed of the random generator. Default value is 0.
+    - rank_by_upper (bool): Whether to rank and sort the planes of each size by the upper bound of their mean danger score.
+      Default value is False.
+    - min_scored_accidents (int): The number of scored accidents a model needs to get bounds. Default value is 5.
+
+    Returns:
+    - pandas.DataFrame: The final dataframe of 'ult_df' with the bounds of 'bootstrap_score_intervals'.
+
+    Logic:
+    Only the models of the final dataframe are resampled.
+    """
+
+    final_df = ult_df(plane_accidents_4F, plane_inventory_2F, n)
+    intervals = bootstrap_score_intervals(
+        plane_accidents_4F, make_models=final_df['make_model'].unique(), resamples=resamples, confidence=confidence, seed=seed,
+        min_scored_accidents=min_scored_accidents
+    )
+    return add_score_intervals(final_df, intervals, rank_by_upper)
@@ -0,0 +1,226 @@
+import glob
+import hashlib
+import importlib.util
+import inspect
+import json
+import os
+import pickle
+
+import pandas as pd
+
+default_cache_dir = os.environ.get(
+    'AVIATION_CACHE_DIR',
+    os.path.join(os.path.expanduser('~'), '.cache', 'aviation_recommendations')
+)
+
+default_max_cache_bytes = 2 * 1024**3
+
+stage_format = 'parquet' if any(
+    importlib.util.find_spec(engine) is not None for engine in ('pyarrow', 'fastparquet')
+) else 'pickle'
+
+def rules_fingerprint(rules, functions=()):
+
+    """
+    Parameters:
+    - rules (object): JSON-serializable rules (lists, dicts, strings, numbers) that drive a cleaning or scoring step.
+    - functions (iterable): The functions or modules that apply the rules. Default value is an empty tuple.
+
+    Returns:
+    - str: A short hexadecimal fingerprint of the rules and functions.
+
+    Logic:
+    This function hashes the rules together with the source code of the functions (or modules) that apply them, so that any change to 
+    either produces a new fingerprint. When the source code is not available, the compiled bytecode is hashed instead.
+    The fingerprint is used to name cache files, which invalidates them whenever the rules change.
+    """
+
+    digest = hashlib.sha256(json.dumps(rules, sort_keys=True, default=str).encode())
+    for function in functions:
+        try:
+            digest.update(inspect.getsource(function).encode())
+        except (OSError, TypeError):
+            code = getattr(function, '__code__', None)
+            digest.update(code.co_code if code is not None else repr(function).encode())
+    return digest.hexdigest()[:16]
+
+def load_json_table(path):
+
+    """
+    Parameters:
+    - path (str): The path of the JSON lookup table.
+
+    Returns:
+    - dict: The lookup table, or an empty dictionary if the file does not exist or cannot be read.
+
+    Logic:
+    This function reads a lookup table that was saved with 'save_json_table'. A missing or corrupted file is treated as an empty table 
+    so that a bad cache never stops a run.
+    """
+
+    try:
+        with open(path, encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+def save_json_table(table, path):
+
+    """
+    Parameters:
+    - table (dict): The lookup table to save.
+    - path (str): The path of the JSON lookup table.
+
+    Returns:
+    - None
+
+    Logic:
+    This function writes the lookup table to a temporary file next to 'path' and then moves it into place, so that readers never 
+    see a partially written table. The parent directory is created if it does not exist.
+    """
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temporary_path = f'{path}.{os.getpid()}.tmp'
+    with open(temporary_path, 'w', encoding='utf-8') as file:
+        json.dump(table, file, sort_keys=True)
+    os.replace(temporary_path, path)
+
+def file_fingerprint(path, block_size=1024**2):
+
+    """
+    Parameters:
+    - path (str): The path of the file to fingerprint.
+    - block_size (int): The number of bytes read at a time. Default value is 1 MiB.
+
+    Returns:
+    - str: A hexadecimal fingerprint of the file contents.
+
+    Logic:
+    This function hashes the contents of the file block by block, so two files with the same contents get the same fingerprint 
+    wherever they are stored, and any edit to the file produces a new one.
+    """
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def stage_key(input_key, stage, params):
+
+    """
+    Parameters:
+    - input_key (str): The key of the stage input: a file fingerprint for the first stage, the previous stage key otherwise.
+    - stage (function): The stage function.
+    - params (dict): The JSON-serializable parameters the stage is called with.
+
+    Returns:
+    - str: The content address of the stage output.
+
+    Logic:
+    This function combines the input key with a fingerprint of the stage parameters and of the source of the stage function 
+    and of the module that defines it, so that a change to the input, the parameters or the code gives a new key.
+    """
+
+    fingerprint = rules_fingerprint(params, functions=[stage, inspect.getmodule(stage)])
+    return hashlib.sha256(f'{input_key}:{stage.__name__}:{fingerprint}'.encode()).hexdigest()[:32]
+
+def stage_path(key, stage_name, cache_dir=default_cache_dir):
+
+    """
+    Parameters:
+    - key (str): The stage key returned by 'stage_key'.
+    - stage_name (str): The name of the stage, used to make the cache directory readable.
+    - cache_dir (str): The cache directory. Default value is 'default_cache_dir'.
+
+    Returns:
+    - str: The path of the cached stage output.
+    """
+
+    return os.path.join(cache_dir, 'stages', f'{stage_name}_{key}.{stage_format}')
+
+def load_stage(key, stage_name, cache_dir=default_cache_dir):
+
+    """
+    Parameters:
+    - key (str): The stage key returned by 'stage_key'.
+    - stage_name (str): The name of the stage.
+    - cache_dir (str): The cache directory. Default value is 'default_cache_dir'.
+
+    Returns:
+    - pandas.DataFrame: The cached stage output, or None if it is not cached or cannot be read.
+
+    Logic:
+    This function reads the cached stage output and updates its modification time, which 'evict_stages' uses as the last access time.
+    """
+
+    path = stage_path(key, stage_name, cache_dir)
+    try:
+        df = pd.read_parquet(path) if stage_format == 'parquet' else pd.read_pickle(path)
+    except (OSError, ValueError, EOFError, pickle.UnpicklingError):
+        return None
+    os.utime(path)
+    return df
+
+def save_stage(df, key, stage_name, cache_dir=default_cache_dir, max_cache_bytes=default_max_cache_bytes):
+
+    """
+    Parameters:
+    - df (pandas.DataFrame): The stage output to cache.
+    - key (str): The stage key returned by 'stage_key'.
+    - stage_name (str): The name of the stage.
+    - cache_dir (str): The cache directory. Default value is 'default_cache_dir'.
+    - max_cache_bytes (int): The maximum total size of the cached stage outputs. Default value is 2 GiB.
+
+    Returns:
+    - None
+
+    Logic:
+    This function writes the stage output in 'stage_format' (Parquet when pyarrow or fastparquet is installed, pickle otherwise) 
+    to a temporary file and moves it into place, then evicts the least recently used outputs beyond 'max_cache_bytes'.
+    """
+
+    path = stage_path(key, stage_name, cache_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary_path = f'{path}.{os.getpid()}.tmp'
+    if stage_format == 'parquet':
+        df.to_parquet(temporary_path)
+    else:
+        df.to_pickle(temporary_path)
+    os.replace(temporary_path, path)
+    evict_stages(cache_dir, max_cache_bytes)
+
+def evict_stages(cache_dir=default_cache_dir, max_cache_bytes=default_max_cache_bytes):
+
+    """
+    Parameters:
+    - cache_dir (str): The cache directory. Default value is 'default_cache_dir'.
+    - max_cache_bytes (int): The maximum total size of the cached stage outputs. Default value is 2 GiB.
+
+    Returns:
+    - list: The paths of the evicted stage outputs.
+
+    Logic:
+    This function deletes cached stage outputs, least recently used first, until their total size is at most 'max_cache_bytes'.
+    """
+
+    entries = []
+    for path in glob.glob(os.path.join(cache_dir, 'stages', f'*.{stage_format}')):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    total_bytes = sum(size for _, size, _ in entries)
+    evicted = []
+    for _, size, path in sorted(entries):
+        if total_bytes <= max_cache_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total_bytes -= size
+        evicted.append(path)
+    return evicted
@@ -1,6 +1,166 @@
+import os
+import re
+import warnings
+
 import pandas as pd
 import numpy as np
 
+from .caching import default_cache_dir, rules_fingerprint, load_json_table, save_json_table
+from .instrumentation import instrumented
+
+non_digit_pattern = re.compile(r'\D+')
+
+manufacturer_separators_PA = [
+    '/',
+    '-',
+    '&',
+    ' and ',
+    ' and',
+    'and ',
+    ','
+]
+
+manufacturer_suffixes_PA = [
+    'helicopter',
+    'aircraft',
+    'aviacija',
+    'balloon',
+    'balloons',
+    'aviation',
+    'gmbh',
+    'co.',
+    'llc',
+    'leasing',
+    'limited',
+    'ltd',
+    'inc',
+    'corp',
+    'corporation',
+    'company',
+    'sa',
+    'sas',
+    'bv',
+    'plc',
+    'pte',
+    'kg'
+]
+
+manufacturer_replacements_PI = {
+    'boeing': ['boeing'],
+    'mcdonnell douglas': ['mcd', 'md'],
+    'raytheon': ['raetheon'],
+    'airbus': ['airbus', 'industr', 'company'],
+    'gecas': ['gecas'],
+    'alitalia': ['alitalia'],
+    'alc': ['alc'],
+    'learjet': ['lear'],
+    'saab': ['saab aircraft', 'saabaircraft'],
+    'jplease': ['jplease'],
+    'beechcraft': ['beech'],
+    'smbc': ['smbc'],
+    'gulfstreamaerospace': ['gulf'],
+    'unknown': ['kuban oakhill'],
+    'dassault': ['dassult'],
+    'douglas': ['douglas'],
+    'iailtd': ['israelaircraftindustries'],
+    'fokker': ['fokker'],
+    'bombardier': ['bombardier']
+}
+
+def categorical_from_codes(codes, cleaned_values, index):
+
+    """
+
+    Parameters:
+    - codes (numpy.ndarray): The position of each row's raw value among the distinct raw values, as returned by pandas.factorize.
+    - cleaned_values (list-like): The cleaned value of each distinct raw value.
+    - index (pandas.Index): The index of the returned column.
+
+    Returns:
+    - pandas.Series: The cleaned value of each row as a categorical column.
+
+    Logic:
+        Several raw values can clean to the same value, so the cleaned values are factorized again and each row's code is 
+        translated to the code of its cleaned value. Categories are in order of first appearance, which keeps the codes of 
+        partitions cleaned separately compatible with the codes of the whole column. Cleaned values that are missing become NaN.
+    """
+
+    cleaned_codes, categories = pd.factorize(pd.Series(cleaned_values, dtype=object))
+    return pd.Series(pd.Categorical.from_codes(cleaned_codes[codes], categories=categories), index=index)
+
+@instrumented
+def normalize_manufacturers(manufacturers, normalizer, rules, cache_name, functions=(), cache_dir=default_cache_dir):
+
+    """
+
+    Parameters:
+    - manufacturers (pandas.Series): The raw manufacturer names to be cleaned.
+    - normalizer (function): The function that cleans a single manufacturer name.
+    - rules (object): The JSON-serializable rules used by the normalizer, used to invalidate the cache when they change.
+    - cache_name (str): The name of the lookup table on disk.
+    - functions (iterable): Other functions called by the normalizer whose source code is part of the fingerprint. Default value is an empty tuple.
+    - cache_dir (str): The directory of the lookup table. Default value is 'default_cache_dir'. If None, nothing is read from or written to disk.
+
+    Returns:
+    - pandas.Series: The cleaned manufacturer names as a categorical column, with the same index as 'manufacturers'.
+
+    Logic:
+        This function cleans each distinct manufacturer name once and maps the results back onto the column.
+        Cleaned names are kept in a JSON lookup table on disk, whose file name contains a fingerprint of the rules and of the 
+        normalizer's source code, so a change to either starts a new table. Names already in the table are not cleaned again, 
+        and any newly cleaned names are added to the table at the end of the call.
+        The cleaned names are returned as a categorical column built from the codes of the distinct raw names, 
+        so the per-row strings are never materialized.
+    """
+
+    codes, unique_names = pd.factorize(manufacturers, use_na_sentinel=False)
+    cache_path = None
+    lookup_table = {}
+    if cache_dir is not None:
+        fingerprint = rules_fingerprint(rules, functions=[normalizer, *functions])
+        cache_path = os.path.join(cache_dir, f'{cache_name}_{fingerprint}.json')
+        lookup_table = load_json_table(cache_path)
+
+    cleaned_names = []
+    new_entries = 0
+    for name in unique_names:
+        if isinstance(name, str) and name in lookup_table:
+            cleaned_names.append(lookup_table[name])
+            continue
+        cleaned_name = normalizer(name)
+        cleaned_names.append(cleaned_name)
+        if isinstance(name, str):
+            lookup_table[name] = cleaned_name
+            new_entries += 1
+
+    if cache_path is not None and new_entries:
+        save_json_table(lookup_table, cache_path)
+    return categorical_from_codes(codes, cleaned_names, manufacturers.index)
+
+@instrumented
+def clean_model_PAPI(models, digits=3):
+
+    """
+
+    Parameters:
+    - models (pandas.Series): The raw 'model' column of the accidents or inventory data.
+    - digits (int): The number of leading digits to keep. Default value is 3.
+
+    Returns:
+    - pandas.Series: The cleaned model numbers as a categorical column, with the same index as 'models'.
+
+    Logic:
+        This function normalizes model codes such as '737-800' or 'A320/200' to the first 3 digits they contain ('737', '320').
+        Missing models become an empty string. The distinct models are converted to strings, stripped of every non-digit character 
+        with the precompiled 'non_digit_pattern' through the pandas string engine and cut to 'digits' characters, and the results are 
+        turned into a categorical column with categorical_from_codes, so each distinct model is only processed once.
+    """
+
+    codes, unique_models = pd.factorize(models, use_na_sentinel=False)
+    cleaned_models = pd.Series(unique_models, dtype=object).astype(str)
+    cleaned_models = cleaned_models.str.replace(non_digit_pattern, '', regex=True).str[:digits]
+    return categorical_from_codes(codes, cleaned_models, models.index)
+
 def clean_manufacturer_PA(name):
 
     """
@@ -14,8 +174,8 @@ def clean_manufacturer_PA(name):
     Logic:
         This function takes a string as input and returns a cleaned version of the string. 
         It first converts the string to lower case and strips any leading or trailing white spaces. 
-        Then it replaces certain separators (such as '/', '-', '&', 'and', ',') with a space. 
-        It also removes certain vehicle type indicators (such as 'helicopter', 'aircraft', 'aviacija', 'balloon', 
+        Then it replaces the first separator found in 'manufacturer_separators_PA' (such as '/', '-', '&', 'and', ',') with a space. 
+        It also removes the vehicle type indicators in 'manufacturer_suffixes_PA' (such as 'helicopter', 'aircraft', 'aviacija', 'balloon', 
         'balloons', 'aviation', 'gmbh', 'co.', 'llc', 'leasing', 'limited', 'ltd', 'inc', 'corp', 
         'corporation', 'company', 'sa', 'sas', 'bv', 'plc', 'pte', 'kg') from the string.
         Finally, it returns the cleaned string.
@@ -23,73 +183,94 @@ def clean_manufacturer_PA(name):
 
     name = str(name)
 
-    separators = [
-        '/', 
-        '-', 
-        '&', 
-        ' and ', 
-        ' and', 
-        'and ', 
-        ','
-    ]
-
-    vehicle_types = [
-        'helicopter', 
-        'aircraft', 
-        'aviacija', 
-        'balloon', 
-        'balloons', 
-        'aviation', 
-        'gmbh', 
-        'co.', 
-        'llc', 
-        'leasing', 
-        'limited', 
-        'ltd', 
-        'inc', 
-        'corp', 
-        'corporation', 
-        'company', 
-        'sa', 
-        'sas', 
-        'bv', 
-        'plc', 
-        'pte', 
-        'kg'
-    ]
-
     name = name.lower().strip()
 
-    for sep in separators:
+    for sep in manufacturer_separators_PA:
         if sep in name:
             name = name.replace(sep, ' ')
             break
 
-    for vehicle_type in vehicle_types:
+    for vehicle_type in manufacturer_suffixes_PA:
         name = name.replace(' ' + vehicle_type, '')
         name = name.replace(vehicle_type + ' ', '')
         name = name.replace(vehicle_type, '')
 
     return name.strip()
 
-def clean_data_PA(plane_accidents_raw):
+def normalize_manufacturer_PA(name):
+
+    """
+
+    Parameters:
+    - name (str): The raw accident 'make' to be cleaned.
+
+    Returns:
+    - str: The cleaned manufacturer name.
+
+    Logic:
+        This function applies clean_manufacturer_PA to the name and then maps any name containing 'boeing' to 'boeing'.
+        It is the per-name rule used by clean_data_PA through normalize_manufacturers.
+    """
+
+    make = clean_manufacturer_PA(name)
+    return 'boeing' if 'boeing' in make else make
+
+@instrumented
+def parse_dates_PA(dates, date_format='%Y-%m-%d'):
+
+    """
+
+    Parameters:
+    - dates (pandas.Series): The raw 'event_date' values.
+    - date_format (str): The expected format of the dates. Default value is '%Y-%m-%d', the format of 'AviationData.csv'.
+
+    Returns:
+    - pandas.Series: The parsed dates, with NaT for missing or unparseable dates.
+
+    Logic:
+        This function parses the whole column at once with the known format. Only the values that do not match the format 
+        are then parsed one distinct value at a time with format inference, as the previous per-row parsing did.
+        Values that still cannot be parsed become NaT and are reported in a single warning instead of stopping the run.
+    """
+
+    parsed = pd.to_datetime(dates, format=date_format, errors='coerce')
+    failed = parsed.isna() & dates.notna()
+    if failed.any():
+        fallback = {value: pd.to_datetime(value, errors='coerce') for value in dates[failed].unique()}
+        parsed[failed] = dates[failed].map(fallback)
+        bad_dates = dates[parsed.isna() & dates.notna()]
+        if len(bad_dates):
+            warnings.warn(
+                f'{len(bad_dates)} event dates could not be parsed and were set to NaT, '
+                f'e.g. {list(bad_dates.unique()[:5])}'
+            )
+    return parsed
+
+@instrumented
+def clean_data_PA(plane_accidents_raw, cache_dir=default_cache_dir, date_format='%Y-%m-%d', keep_date=False):
 
     """
 
     Parameters:
     - plane_accidents_raw (pandas.DataFrame): The raw dataframe of plane accidents data to be cleaned.
+    - cache_dir (str): The directory of the cleaned manufacturer lookup table. Default value is 'default_cache_dir'. 
+      If None, the lookup table is not persisted between runs.
+    - date_format (str): The expected format of 'event_date', passed to parse_dates_PA. Default value is '%Y-%m-%d'.
+    - keep_date (bool): Whether to keep the full parsed date in a 'date' column next to 'year'. Default value is False.
 
     Returns:
     - pandas.DataFrame: The cleaned dataframe of plane accidents data.
 
     Logic:
         This function takes a dataframe of plane accident data and returns a cleaned version of it.
-        It first creates a copy of the dataframe and then renames the columns to remove any '.' characters and to make them lower case.
-        It also renames the 'event_date' column to 'year' and converts the dates to years.
-        It then selects the relevant columns and removes any rows where 'amateur_built' is 'No'.
-        It applies the clean_manufacturer_PA function to the 'make' column and cleans the 'model' column by removing '-' and '/' characters, 
-        converting the string to lower case, and taking only the first 3 digits.
-        Finally, it resets the index and returns the cleaned dataframe.
+        It first renames the columns to remove any '.' characters and to make them lower case, and renames the 'event_date' column to 'year'.
+        It then copies only the relevant columns of the rows where 'amateur_built' is 'No' out of the raw dataframe in a single step, 
+        so the rest of it is never duplicated, drops 'amateur_built', resets the index and converts the dates to years with parse_dates_PA.
+        Rows whose date cannot be parsed get a NaN year and are reported with a warning.
+        It cleans each distinct value of the 'make' column once with normalize_manufacturer_PA through normalize_manufacturers 
+        and cleans the 'model' column with clean_model_PAPI, which keeps only the first 3 digits of the model.
+        The 'make', 'model' and 'aircraft_damage' columns are categorical, with categories in order of first appearance.
+        Finally, it returns the cleaned dataframe. The make and model are cleaned in place on the copy.
     """
 
     relevant_columns = [
@@ -103,27 +284,32 @@ def clean_data_PA(plane_accidents_raw):
         'total_minor_injuries',
     ]
 
-    plane_accidents = plane_accidents_raw.copy()
-
-    column_map = {col: col.replace('.', '_').lower() for col in plane_accidents.columns}
-    plane_accidents.rename(columns=column_map, inplace=True)
-    plane_accidents.rename(columns={'event_date': 'year'}, inplace=True)
-    plane_accidents = plane_accidents[relevant_columns]
-    plane_accidents = plane_accidents[plane_accidents['amateur_built'] == 'No'].drop(columns='amateur_built')
-    plane_accidents['year'] = plane_accidents['year'].apply(lambda date: pd.to_datetime(date).year)
-    plane_accidents['make'] = plane_accidents['make'].apply(clean_manufacturer_PA).apply(
-        lambda make: 'boeing' if 'boeing' in make else make
+    column_map = {col: col.replace('.', '_').lower() for col in plane_accidents_raw.columns}
+    column_map = {col: 'year' if new_col == 'event_date' else new_col for col, new_col in column_map.items()}
+    raw_names = {new_col: col for col, new_col in column_map.items()}
+    kept_columns = [col for col in relevant_columns if col != 'amateur_built']
+    is_certified = (plane_accidents_raw[raw_names['amateur_built']] == 'No').values
+    plane_accidents = plane_accidents_raw.loc[is_certified, [raw_names[col] for col in kept_columns]]
+    plane_accidents.columns = kept_columns
+    plane_accidents.reset_index(drop=True, inplace=True)
+    dates = parse_dates_PA(plane_accidents['year'], date_format)
+    plane_accidents['year'] = dates.dt.year
+    if keep_date:
+        plane_accidents.insert(1, 'date', dates)
+    plane_accidents['make'] = normalize_manufacturers(
+        plane_accidents['make'],
+        normalize_manufacturer_PA,
+        rules=[manufacturer_separators_PA, manufacturer_suffixes_PA],
+        cache_name='manufacturers_PA',
+        functions=[clean_manufacturer_PA],
+        cache_dir=cache_dir
     )
 
-    plane_accidents['model'] = plane_accidents['model'].astype(str).apply(
-        lambda model: model.strip().replace('-', '').replace('/', '').lower()
-    ).apply(
-        lambda model: ''.join(filter(str.isdigit, str(model)))
-    ).apply(
-        lambda model: model[:3]
-    )
+    plane_accidents['model'] = clean_model_PAPI(plane_accidents['model'])
+    damage_codes, damage_categories = pd.factorize(plane_accidents['aircraft_damage'])
+    plane_accidents['aircraft_damage'] = pd.Categorical.from_codes(damage_codes, categories=damage_categories)
 
-    return plane_accidents.reset_index().drop(columns='index')
+    return plane_accidents
 
 def clean_manufacturer_PI(name):
 
@@ -143,34 +329,12 @@ def clean_manufacturer_PI(name):
         If 'iberia' is present anywhere in the string, it removes it.
         Similarly, if 'vueling' is present anywhere in the string or if the string starts with 'vueling', it removes 'vueling'.
         If the string is 'philippineairlines', it replaces it with NaN.
-        It then checks if the string contains any of the old values specified in the 'replacements' dictionary.
+        It then checks if the string contains any of the old values specified in the 'manufacturer_replacements_PI' dictionary.
         If it does, it replaces the old value with the corresponding new value.
         If 'gulf' is present in the string, it replaces it with 'gulfstream'.
         Finally, it replaces spaces with '/' and returns the cleaned string.
     """
 
-    replacements = {
-    'boeing': ['boeing'],
-    'mcdonnell douglas': ['mcd', 'md'],
-    'raytheon': ['raetheon'],
-    'airbus': ['airbus', 'industr', 'company'],
-    'gecas': ['gecas'],
-    'alitalia': ['alitalia'],
-    'alc': ['alc'],
-    'learjet': ['lear'],
-    'saab': ['saab aircraft', 'saabaircraft'],
-    'jplease': ['jplease'],
-    'beechcraft': ['beech'],
-    'smbc': ['smbc'],
-    'gulfstreamaerospace': ['gulf'],
-    'unknown': ['kuban oakhill'],
-    'dassault': ['dassult'],
-    'douglas': ['douglas'],
-    'iailtd': ['israelaircraftindustries'],
-    'fokker': ['fokker'],
-    'bombardier': ['bombardier']
-    }
-
     name = name.strip().lower().replace('/', ' ').replace('-', ' ')
     if name.startswith('iberia'):
         name = name[7:]
@@ -180,29 +344,55 @@ def clean_manufacturer_PI(name):
         name = name.replace('vueling ', '')
     if name == 'philippineairlines':
         name = str(np.nan)
-    for new_value, old_values in replacements.items():
+    for new_value, old_values in manufacturer_replacements_PI.items():
         if any(old_value in name for old_value in old_values):
             return new_value
         
     return name.replace(' ', '/')
 
-def clean_data_PI(plane_inventory_raw):
+def normalize_manufacturer_PI(name):
+
+    """
+
+    Parameters:
+    - name (str): The raw inventory 'manufacturer' to be cleaned.
+
+    Returns:
+    - str: The cleaned manufacturer name.
+
+    Logic:
+        This function applies clean_manufacturer_PI to the name, maps any name containing 'gulf' to 'gulfstream' 
+        and replaces spaces with '/'. It is the per-name rule used by clean_data_PI through normalize_manufacturers.
+    """
+
+    name = clean_manufacturer_PI(name)
+    name = 'gulfstream' if 'gulf' in name else name
+    return name.replace(' ', '/')
+
+@instrumented
+def clean_data_PI(plane_inventory_raw, cache_dir=default_cache_dir, keep_serial_number=False):
 
     """
 
     Parameters:
     - plane_inventory_raw (pandas.DataFrame): The raw dataframe of plane inventory data to be cleaned.
+    - cache_dir (str): The directory of the cleaned manufacturer lookup table. Default value is 'default_cache_dir'. 
+      If None, the lookup table is not persisted between runs.
+    - keep_serial_number (bool): Whether to also keep the raw 'serial_number' column, which identifies each aircraft across
+      the yearly rows of the inventory, for the distinct aircraft counts. Default value is False.
 
     Returns:
     - pandas.DataFrame: The cleaned dataframe of plane inventory data.
 
     Logic:
         This function takes a dataframe of plane inventory data and returns a cleaned version of it.
-        It first creates a copy of the dataframe and then renames the columns to make them lower case.
-        It resets the index and applies the clean_manufacturer_PI function to the 'manufacturer' column.
-        It also cleans the 'model' column by removing '-' and '/' characters, converting the string to lower case, 
-        and taking only the first 3 digits.
-        Finally, it selects the relevant columns and returns the cleaned dataframe.
+        It first copies only the relevant columns out of the raw dataframe, matching their names case-insensitively, 
+        and names them 'year', 'make' (from 'manufacturer'), 'model' and 'number_of_seats'.
+        It resets the index and cleans each distinct value of the 'make' column once with normalize_manufacturer_PI 
+        through normalize_manufacturers.
+        It also cleans the 'model' column with clean_model_PAPI, which keeps only the first 3 digits of the model.
+        The 'make' and 'model' columns are categorical. With 'keep_serial_number', the serial numbers are kept unchanged in a last
+        'serial_number' column. Finally, it returns the cleaned dataframe.
     """
 
     relevant_columns = [
@@ -212,28 +402,27 @@ def clean_data_PI(plane_inventory_raw):
         'number_of_seats'
 
     ]
+    raw_columns = ['year', 'manufacturer', 'model', 'number_of_seats']
+    if keep_serial_number:
+        relevant_columns.append('serial_number')
+        raw_columns.append('serial_number')
 
-    plane_inventory = plane_inventory_raw.copy()
-    column_map = {col: col.lower() for col in plane_inventory.columns}
-    plane_inventory.rename(columns=column_map, inplace=True)
+    column_map = {col: col.lower() for col in plane_inventory_raw.columns}
+    raw_names = {new_col: col for col, new_col in column_map.items()}
+    plane_inventory = plane_inventory_raw.loc[:, [raw_names[col] for col in raw_columns]]
+    plane_inventory.columns = relevant_columns
 
     # plane_inventory = plane_inventory.drop_duplicates(subset=['serial_number'], keep='last')
-    plane_inventory = plane_inventory.reset_index().drop(columns='index')
-    plane_inventory['manufacturer'] = plane_inventory['manufacturer'].apply(clean_manufacturer_PI)
-    plane_inventory['manufacturer'] = plane_inventory['manufacturer'].apply(
-        lambda name: 'gulfstream' if 'gulf' in name else name
-    ).apply(
-        lambda name: name.replace(' ', '/')
-    )
-    
-    plane_inventory.rename(columns={'manufacturer': 'make'}, inplace=True)
-    
-    plane_inventory['model'] = plane_inventory['model'].astype(str).apply(
-        lambda x: x.strip().replace('-', '').replace('/', '').lower()
-    ).apply(
-        lambda x: ''.join(filter(str.isdigit, str(x)))
-    ).apply(
-        lambda x: x[:3]
+    plane_inventory.reset_index(drop=True, inplace=True)
+    plane_inventory['make'] = normalize_manufacturers(
+        plane_inventory['make'],
+        normalize_manufacturer_PI,
+        rules=manufacturer_replacements_PI,
+        cache_name='manufacturers_PI',
+        functions=[clean_manufacturer_PI],
+        cache_dir=cache_dir
     )
 
-    return plane_inventory[relevant_columns]
\ No newline at end of file
+    plane_inventory['model'] = clean_model_PAPI(plane_inventory['model'])
+
+    return plane_inventory
\ No newline at end of file
@@ -0,0 +1,250 @@
+import numpy as np
+import pandas as pd
+
+from .caching import default_cache_dir
+from .instrumentation import instrumented
+from .cleaning import clean_data_PI
+from .features import add_make_model_feature_PAPI, add_plane_size_feature_PI, plane_size_bins
+
+distinct_modes = ('exact', 'hll')
+default_hll_precision = 12
+
+def check_distinct_mode(mode):
+
+    """
+    Parameters:
+    - mode (str): A distinct aircraft counting mode.
+
+    Returns:
+    - str: The same mode, if it is one of 'distinct_modes'. Raises a ValueError otherwise.
+    """
+
+    if mode not in distinct_modes:
+        raise ValueError(f"unknown distinct aircraft mode {mode!r}, expected one of {distinct_modes}")
+    return mode
+
+def hash_serial_numbers(serial_numbers):
+
+    """
+    Parameters:
+    - serial_numbers (pandas.Series): The serial numbers of some aircraft, without missing values.
+
+    Returns:
+    - numpy.ndarray: A 64-bit hash of each serial number, as uint64.
+
+    Logic:
+    The serial numbers are hashed as strings with pandas' vectorized hash, which does not depend on the process or on the chunk,
+    so '1234' read as a number in one file and as text in another gets the same hash and hashes from different runs can be merged.
+    """
+
+    return pd.util.hash_array(serial_numbers.astype(str).to_numpy(dtype=object))
+
+def bit_lengths(values):
+
+    """
+    Parameters:
+    - values (numpy.ndarray): Unsigned 64-bit integers.
+
+    Returns:
+    - numpy.ndarray: The number of bits needed to write each value, 0 for 0.
+
+    Logic:
+    The values are split into their high and low 32 bits, which float64 holds exactly, and the bit length of each half is read off
+    its base 2 logarithm.
+    """
+
+    high = (values >> np.uint64(32)).astype(np.float64)
+    low = (values & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    with np.errstate(divide='ignore'):
+        high_bits = np.floor(np.log2(high)) + 33
+        low_bits = np.floor(np.log2(low)) + 1
+    return np.where(high > 0, high_bits, np.where(low > 0, low_bits, 0)).astype(np.int64)
+
+def hll_registers(group_codes, hashes, group_count, precision=default_hll_precision):
+
+    """
+    Parameters:
+    - group_codes (numpy.ndarray): The group of each hash, from 0 to 'group_count' - 1.
+    - hashes (numpy.ndarray): The uint64 hash of each serial number.
+    - group_count (int): The number of groups.
+    - precision (int): The number of hash bits that pick a register. Each group has 2**precision registers. Default value is 12.
+
+    Returns:
+    - numpy.ndarray: The HyperLogLog registers of every group, a uint8 array with one row per group and 2**precision columns.
+
+    Logic:
+    The first 'precision' bits of a hash pick one of the group's registers and the register keeps the highest position of the
+    first 1 bit seen in the rest of the hashes it gets. Every hash is folded in with a single vectorized maximum, and the
+    registers of a serial number seen many times do not change, so duplicates are ignored without remembering them.
+    """
+
+    register_count = 1 << precision
+    register_codes = (hashes >> np.uint64(64 - precision)).astype(np.int64)
+    remaining_bits = hashes & np.uint64((1 << (64 - precision)) - 1)
+    ranks = (64 - precision - bit_lengths(remaining_bits) + 1).astype(np.uint8)
+    registers = np.zeros(group_count * register_count, dtype=np.uint8)
+    np.maximum.at(registers, np.asarray(group_codes, dtype=np.int64) * register_count + register_codes, ranks)
+    return registers.reshape(group_count, register_count)
+
+def hll_estimates(registers):
+
+    """
+    Parameters:
+    - registers (numpy.ndarray): HyperLogLog registers, one row per group, as returned by 'hll_registers'.
+
+    Returns:
+    - numpy.ndarray: The estimated number of distinct serial numbers of each group, rounded to integers.
+
+    Logic:
+    This is the HyperLogLog estimate, the bias-corrected harmonic mean of 2**register over the registers, with the linear
+    counting correction for small groups, where some registers are still 0. The hashes have 64 bits, so no correction
+    is needed for large counts. The standard error is about 1.04 / sqrt(2**precision), 1.6% with the default precision.
+    """
+
+    register_count = registers.shape[1]
+    alpha = 0.7213 / (1 + 1.079 / register_count)
+    raw_estimates = alpha * register_count**2 / np.sum(np.exp2(-registers.astype(np.float64)), axis=1)
+    empty_registers = np.sum(registers == 0, axis=1)
+    with np.errstate(divide='ignore'):
+        linear_estimates = register_count * np.log(register_count / empty_registers)
+    is_small = (raw_estimates <= 2.5 * register_count) & (empty_registers > 0)
+    return np.rint(np.where(is_small, linear_estimates, raw_estimates)).astype(np.int64)
+
+def object_index(index):
+
+    """
+    Parameters:
+    - index (pandas.Index): A 'make_model' and 'plane_size' index, possibly with categorical levels.
+
+    Returns:
+    - pandas.MultiIndex: The same index with plain string levels, as in the inventory summaries.
+    """
+
+    return pd.MultiIndex.from_arrays(
+        [index.get_level_values(level).astype(object) for level in index.names], names=index.names
+    )
+
+@instrumented
+def distinct_aircraft_summary(plane_inventory_2F, mode='exact', precision=default_hll_precision):
+
+    """
+    Parameters:
+    - plane_inventory_2F (pandas.DataFrame): The dataframe which contains 'make_model', 'plane_size' and 'serial_number' columns,
+      e.g. from clean_data_PI with 'keep_serial_number'.
+    - mode (str): 'exact' or 'hll'. Default value is 'exact'.
+    - precision (int): The precision of the HyperLogLog registers in 'hll' mode. Default value is 12.
+
+    Returns:
+    - pandas.DataFrame: The distinct aircraft summary. In 'exact' mode, the distinct 'make_model', 'plane_size' and
+      'serial_hash' rows. In 'hll' mode, the HyperLogLog registers of each 'make_model' and 'plane_size' pair,
+      one 'register_*' column per register.
+
+    Logic:
+    The B43 inventory has one row per aircraft and year, so counting its rows counts each aircraft once for every year it was
+    reported. This summary instead keeps what is needed to count each serial number once per 'make_model' and 'plane_size'.
+    The 'exact' summary is a hash set of the serial numbers of each pair: its size grows with the number of distinct aircraft.
+    The 'hll' summary has a fixed size per pair, whatever the number of rows or aircraft. Both can be merged with
+    'merge_distinct_aircraft_summaries', so the inventory can be summarized in chunks or incrementally. Rows without a serial
+    number or 'make_model' are left out, since they cannot be told apart. Pairs are in order of first appearance.
+    """
+
+    check_distinct_mode(mode)
+    is_known = plane_inventory_2F['serial_number'].notna() & plane_inventory_2F['make_model'].notna()
+    plane_inventory = plane_inventory_2F.loc[is_known, ['make_model', 'plane_size', 'serial_number']]
+    hashes = hash_serial_numbers(plane_inventory['serial_number'])
+
+    if mode == 'exact':
+        summary = pd.DataFrame({
+            'make_model': plane_inventory['make_model'].astype(object).to_numpy(),
+            'plane_size': plane_inventory['plane_size'].astype(object).to_numpy(),
+            'serial_hash': hashes,
+        })
+        return summary.drop_duplicates().reset_index(drop=True)
+
+    grouped = plane_inventory.groupby(['make_model', 'plane_size'], sort=False, observed=True)
+    group_codes = grouped.ngroup().to_numpy()
+    index = object_index(grouped.size().index)
+    registers = hll_registers(group_codes, hashes, len(index), precision)
+    return pd.DataFrame(registers, index=index, columns=[f'register_{register}' for register in range(registers.shape[1])])
+
+@instrumented
+def merge_distinct_aircraft_summaries(summaries, mode='exact'):
+
+    """
+    Parameters:
+    - summaries (iterable): Distinct aircraft summaries of the same mode, returned by 'distinct_aircraft_summary'.
+    - mode (str): 'exact' or 'hll'. Default value is 'exact'.
+
+    Returns:
+    - pandas.DataFrame: A single distinct aircraft summary covering every input summary.
+
+    Logic:
+    'exact' summaries are concatenated and deduplicated, so an aircraft seen in several chunks is kept once. 'hll' summaries are
+    merged with the register-wise maximum of each pair, which gives the same registers as summarizing all the rows at once.
+    """
+
+    check_distinct_mode(mode)
+    merged = pd.concat(list(summaries))
+    if mode == 'exact':
+        return merged.drop_duplicates().reset_index(drop=True)
+    return merged.groupby(level=[0, 1], sort=False).max()
+
+@instrumented
+def distinct_aircraft_counts(distinct_summary, mode='exact'):
+
+    """
+    Parameters:
+    - distinct_summary (pandas.DataFrame): A distinct aircraft summary of the given mode.
+    - mode (str): 'exact' or 'hll'. Default value is 'exact'.
+
+    Returns:
+    - pandas.Series: The number of distinct aircraft, named 'number_of_planes' and indexed by 'make_model' and 'plane_size'
+      like an inventory summary, so it can be used in place of one, e.g. with 'big_df_from_summary'.
+    """
+
+    check_distinct_mode(mode)
+    if mode == 'exact':
+        counts = distinct_summary.groupby(['make_model', 'plane_size'], sort=False).size()
+    else:
+        counts = pd.Series(hll_estimates(distinct_summary.to_numpy(dtype=np.uint8)), index=distinct_summary.index)
+    return counts.rename('number_of_planes')
+
+@instrumented
+def count_distinct_aircraft_PI(plane_inventory_2F, mode='exact', precision=default_hll_precision):
+
+    """
+    Parameters:
+    - plane_inventory_2F (pandas.DataFrame): The dataframe which contains 'make_model', 'plane_size' and 'serial_number' columns.
+    - mode (str): 'exact' for hash-based exact counts or 'hll' for fixed-memory HyperLogLog estimates. Default value is 'exact'.
+    - precision (int): The precision of the HyperLogLog registers in 'hll' mode. Default value is 12.
+
+    Returns:
+    - pandas.Series: The number of distinct aircraft of each 'make_model' and 'plane_size' pair.
+    """
+
+    return distinct_aircraft_counts(distinct_aircraft_summary(plane_inventory_2F, mode, precision), mode)
+
+@instrumented
+def summarize_distinct_aircraft_PI(
+        plane_inventory_raw,
+        mode='exact',
+        precision=default_hll_precision,
+        cache_dir=default_cache_dir,
+        size_bins=plane_size_bins
+    ):
+
+    """
+    Parameters:
+    - plane_inventory_raw (pandas.DataFrame): A raw dataframe (or chunk) of plane inventory data with a 'SERIAL_NUMBER' column.
+    - mode (str): 'exact' or 'hll'. Default value is 'exact'.
+    - precision (int): The precision of the HyperLogLog registers in 'hll' mode. Default value is 12.
+    - cache_dir (str): The directory of the cleaned manufacturer lookup table, passed to clean_data_PI. Default value is 'default_cache_dir'.
+    - size_bins (dict): The seat bins of each size, passed to add_plane_size_feature_PI. Default value is 'plane_size_bins'.
+
+    Returns:
+    - pandas.DataFrame: The distinct aircraft summary of the chunk.
+    """
+
+    plane_inventory = clean_data_PI(plane_inventory_raw, cache_dir=cache_dir, keep_serial_number=True)
+    plane_inventory = add_plane_size_feature_PI(add_make_model_feature_PAPI(plane_inventory), size_bins)
+    return distinct_aircraft_summary(plane_inventory, mode, precision)
@@ -1,6 +1,13 @@
 import pandas as pd
 import numpy as np
 
+from .instrumentation import instrumented
+
+injury_scores = {'Unknown': 0, 'Minor': 1, 'Serious': 2, 'Fatal': 3}
+damage_scores = {'Unknown': 0, 'Minor': 1, 'Substantial': 2, 'Destroyed': 3}
+plane_size_bins = {'small': (3, 20), 'medium': (21, 100), 'large': (101, 524)}
+
+@instrumented
 def engineer_make_model_feature_PAPI(df):
 
     """
@@ -15,10 +22,40 @@ def engineer_make_model_feature_PAPI(df):
     The new column is a combination of 'make' and 'model' columns.
     """
 
-    df = df.copy()
-    df['make_model'] = df['make'] + ' ' + df['model']
+    return add_make_model_feature_PAPI(df.copy())
+
+@instrumented
+def add_make_model_feature_PAPI(df):
+
+    """
+    Parameters:
+    - df (pandas.DataFrame): The dataframe which contains columns 'make' and 'model'. It is modified in place.
+
+    Returns:
+    - pandas.DataFrame: The same dataframe, with the new column 'make_model'.
+
+    Logic:
+    This function is the in-place version of engineer_make_model_feature_PAPI, used by the fused pipelines to avoid copying the dataframe.
+    'make_model' is built as a categorical column from the codes of the categorical 'make' and 'model' columns: each row's pair of codes 
+    is combined into a single integer and factorized, and only the distinct pairs are joined into strings. Rows missing either value 
+    get NaN, as with string concatenation. Categories are in order of first appearance.
+    """
+
+    make = df['make'].astype('category')
+    model = df['model'].astype('category')
+    make_codes = make.cat.codes.to_numpy(dtype=np.int64)
+    model_codes = model.cat.codes.to_numpy(dtype=np.int64)
+    is_known = (make_codes >= 0) & (model_codes >= 0)
+    model_count = max(len(model.cat.categories), 1)
+    pair_codes, pairs = pd.factorize(make_codes[is_known] * model_count + model_codes[is_known])
+    names = make.cat.categories[pairs // model_count] + ' ' + model.cat.categories[pairs % model_count]
+    name_codes, categories = pd.factorize(names)
+    codes = np.full(len(df), -1, dtype=np.int64)
+    codes[is_known] = name_codes[pair_codes]
+    df['make_model'] = pd.Categorical.from_codes(codes, categories=categories)
     return df
 
+@instrumented
 def get_injury_feature_PA(plane_accidents):
 
     """
@@ -34,14 +71,19 @@ def get_injury_feature_PA(plane_accidents):
     'Serious' category is for rows where 'total_serious_injuries' is greater than 0.
     'Minor' category is for rows where 'total_minor_injuries' is greater than 0.
     'Unknown' category is for rows where all the above conditions are not met.
+    The categories are checked in that order with a single vectorized selection, so the first matching condition wins.
+    The result is categorical, with the categories of 'injury_scores' in order of severity.
     """
 
-    fatal_category = (plane_accidents['total_fatal_injuries'] > 0).apply(lambda x: 'Fatal' if x else np.nan)
-    serious_category = (plane_accidents['total_serious_injuries'] > 0).apply(lambda x: 'Serious' if x else np.nan)
-    minor_category = (plane_accidents['total_minor_injuries'] > 0).apply(lambda x: 'Minor' if x else np.nan)
-    categorized_injuries = pd.concat([fatal_category, serious_category, minor_category], axis=1)
-    return categorized_injuries.apply(lambda row: next((injury for injury in row if pd.notna(injury)), np.nan), axis=1).fillna('Unknown')
+    conditions = [
+        plane_accidents['total_fatal_injuries'] > 0,
+        plane_accidents['total_serious_injuries'] > 0,
+        plane_accidents['total_minor_injuries'] > 0,
+    ]
+    injury_codes = np.select(conditions, [injury_scores['Fatal'], injury_scores['Serious'], injury_scores['Minor']], default=0)
+    return pd.Series(pd.Categorical.from_codes(injury_codes, categories=list(injury_scores)), index=plane_accidents.index)
 
+@instrumented
 def get_injury_feature_numeric_PA(injury_feature):
 
     """
@@ -49,20 +91,20 @@ def get_injury_feature_numeric_PA(injury_feature):
     - injury_feature (pandas.Series): The series of injury categories.
 
     Returns:
-    - pandas.Series: A series of numeric values corresponding to the injury categories.
+    - pandas.Series: A series of numeric values corresponding to the injury categories, as floats.
 
     Logic:
-    This function assigns numeric values to injury categories. 
+    This function assigns numeric values to injury categories. It accepts plain or categorical injury categories. 
     'Unknown' category is assigned a value of 0.
     'Minor' category is assigned a value of 1.
     'Serious' category is assigned a value of 2.
     'Fatal' category is assigned a value of 3.
+    Any other value is assigned NaN.
     """
 
-    return injury_feature.apply(
-        lambda x: 0 if x=='Unknown' else 1 if x=='Minor' else 2 if x=='Serious' else 3 if x=='Fatal' else np.nan
-    )
+    return injury_feature.map(injury_scores).astype(float)
 
+@instrumented
 def engineer_accident_features_PA(plane_accidents_1F):
 
     """
@@ -78,14 +120,30 @@ def engineer_accident_features_PA(plane_accidents_1F):
     'human_injury_numeric' column contains numeric values corresponding to the injury categories.
     """
 
-    plane_accidents_2F = plane_accidents_1F.copy()
-    plane_accidents_2F['human_injury'] = get_injury_feature_PA(plane_accidents_2F)
-    raw_injury_score = get_injury_feature_numeric_PA(plane_accidents_2F['human_injury']).astype(float)
-    plane_accidents_2F['human_injury_numeric'] = 10*(
+    return add_accident_features_PA(plane_accidents_1F.copy())
+
+@instrumented
+def add_accident_features_PA(plane_accidents):
+
+    """
+    Parameters:
+    - plane_accidents (pandas.DataFrame): The dataframe of plane accidents data. It is modified in place.
+
+    Returns:
+    - pandas.DataFrame: The same dataframe, with the 'human_injury' and 'human_injury_numeric' columns.
+
+    Logic:
+    This function is the in-place version of engineer_accident_features_PA.
+    """
+
+    plane_accidents['human_injury'] = get_injury_feature_PA(plane_accidents)
+    raw_injury_score = get_injury_feature_numeric_PA(plane_accidents['human_injury']).astype(float)
+    plane_accidents['human_injury_numeric'] = 10*(
         (raw_injury_score - raw_injury_score.min()) / (raw_injury_score.max() - raw_injury_score.min())
     )
-    return plane_accidents_2F
+    return plane_accidents
 
+@instrumented
 def engineer_damage_feature_PA(plane_accidents_2F):
 
     """
@@ -102,15 +160,30 @@ def engineer_damage_feature_PA(plane_accidents_2F):
     'Minor' category is assigned a value of 1.
     'Substantial' category is assigned a value of 2.
     'Destroyed' category is assigned a value of 3.
+    Any other value, including missing damage, is assigned NaN.
     """
 
-    plane_accidents_3F = plane_accidents_2F.copy()
-    raw_dmg_score = plane_accidents_3F['aircraft_damage'].apply(
-        lambda x: 0 if x == 'Unknown' else 1 if x == 'Minor' else 2 if x=='Substantial' else 3 if x=='Destroyed' else np.nan
-    )
-    plane_accidents_3F['aircraft_damage_numeric'] = 10*((raw_dmg_score - raw_dmg_score.min()) / (raw_dmg_score.max() - raw_dmg_score.min()))
-    return plane_accidents_3F
+    return add_damage_feature_PA(plane_accidents_2F.copy())
+
+@instrumented
+def add_damage_feature_PA(plane_accidents):
+
+    """
+    Parameters:
+    - plane_accidents (pandas.DataFrame): The dataframe of plane accidents data. It is modified in place.
+
+    Returns:
+    - pandas.DataFrame: The same dataframe, with the 'aircraft_damage_numeric' column.
+
+    Logic:
+    This function is the in-place version of engineer_damage_feature_PA.
+    """
 
+    raw_dmg_score = plane_accidents['aircraft_damage'].map(damage_scores).astype(float)
+    plane_accidents['aircraft_damage_numeric'] = 10*((raw_dmg_score - raw_dmg_score.min()) / (raw_dmg_score.max() - raw_dmg_score.min()))
+    return plane_accidents
+
+@instrumented
 def engineer_danger_score_PA(plane_accidents_3Fs, aircraft_dmg_w=.75, human_injury_w=.25):
 
     """
@@ -127,17 +200,37 @@ def engineer_danger_score_PA(plane_accidents_3Fs, aircraft_dmg_w=.75, human_inju
     'danger_score' is a combination of 'aircraft_damage_numeric' and 'human_injury_numeric', weighted by 'aircraft_dmg_w' and 'human_injury_w' respectively.
     """
 
-    plane_accident_4F = plane_accidents_3Fs.copy()
-    aicraft_damage_values = plane_accident_4F['aircraft_damage_numeric'] * aircraft_dmg_w
-    human_injury_values = plane_accident_4F['human_injury_numeric'] * human_injury_w
-    plane_accident_4F['danger_score'] = aicraft_damage_values + human_injury_values
-    return plane_accident_4F
+    return add_danger_score_PA(plane_accidents_3Fs.copy(), aircraft_dmg_w, human_injury_w)
+
+@instrumented
+def add_danger_score_PA(plane_accidents, aircraft_dmg_w=.75, human_injury_w=.25):
+
+    """
+    Parameters:
+    - plane_accidents (pandas.DataFrame): The dataframe of plane accidents data with engineered accident and damage features. It is modified in place.
+    - aircraft_dmg_w (float): The weight for 'aircraft_damage_numeric' in calculating the danger score. Default value is 0.75.
+    - human_injury_w (float): The weight for 'human_injury_numeric' in calculating the danger score. Default value is 0.25.
+
+    Returns:
+    - pandas.DataFrame: The same dataframe, with the 'danger_score' column.
+
+    Logic:
+    This function is the in-place version of engineer_danger_score_PA.
+    """
+
+    aicraft_damage_values = plane_accidents['aircraft_damage_numeric'] * aircraft_dmg_w
+    human_injury_values = plane_accidents['human_injury_numeric'] * human_injury_w
+    plane_accidents['danger_score'] = aicraft_damage_values + human_injury_values
+    return plane_accidents
 
-def engineer_plane_size_feature_PI(plane_inventory_1F):
+@instrumented
+def engineer_plane_size_feature_PI(plane_inventory_1F, size_bins=plane_size_bins):
     
     """
     Parameters:
     - plane_inventory_1F (pandas.DataFrame): The dataframe which contains 'number_of_seats' column.
+    - size_bins (dict): The sizes, in order, mapped to the inclusive (minimum, maximum) number of seats of each size. 
+      The bins must not overlap, which 'check_size_bins' checks. Default value is 'plane_size_bins'.
 
     Returns:
     - pandas.DataFrame: The dataframe with an engineered 'plane_size' feature.
@@ -148,10 +241,58 @@ def engineer_plane_size_feature_PI(plane_inventory_1F):
     'small' category is for rows where 'number_of_seats' is between 3 and 20 inclusive.
     'medium' category is for rows where 'number_of_seats' is between 21 and 100 inclusive.
     'large' category is for rows where 'number_of_seats' is between 101 and 524 inclusive.
+    Rows outside every size get ''. Other sizes can be given with 'size_bins'.
     """
 
-    plane_inventory_2F = plane_inventory_1F.copy()
-    plane_inventory_2F['plane_size'] = plane_inventory_2F['number_of_seats'].apply(
-        lambda x: 'small' if 3 <= x <= 20 else ('medium' if 21 <= x <= 100 else ('large' if 101 <= x <= 524 else ''))
-    )
-    return plane_inventory_2F
\ No newline at end of file
+    return add_plane_size_feature_PI(plane_inventory_1F.copy(), size_bins)
+
+def check_size_bins(size_bins):
+
+    """
+    Parameters:
+    - size_bins (dict): The sizes mapped to the inclusive (minimum, maximum) number of seats of each size.
+
+    Returns:
+    - dict: The same bins, if there is at least one, each has a minimum no larger than its maximum and no two bins overlap.
+      Raises a ValueError otherwise.
+    """
+
+    if not size_bins:
+        raise ValueError('size_bins needs at least one size')
+    for size, (minimum, maximum) in size_bins.items():
+        if not minimum <= maximum:
+            raise ValueError(f'the size {size!r} has a minimum of {minimum} seats above its maximum of {maximum}')
+    ordered_bins = sorted(size_bins.items(), key=lambda item: item[1][0])
+    for (size, (_, maximum)), (next_size, (next_minimum, _)) in zip(ordered_bins, ordered_bins[1:]):
+        if next_minimum <= maximum:
+            raise ValueError(f'the sizes {size!r} and {next_size!r} overlap, from {next_minimum} to {maximum} seats')
+    return size_bins
+
+@instrumented
+def add_plane_size_feature_PI(plane_inventory, size_bins=plane_size_bins):
+
+    """
+    Parameters:
+    - plane_inventory (pandas.DataFrame): The dataframe which contains 'number_of_seats' column. It is modified in place.
+    - size_bins (dict): The sizes, in order, mapped to the inclusive (minimum, maximum) number of seats of each size. 
+      The bins must not overlap. Default value is 'plane_size_bins'.
+
+    Returns:
+    - pandas.DataFrame: The same dataframe, with the 'plane_size' column.
+
+    Logic:
+    This function is the in-place version of engineer_plane_size_feature_PI. The seats are placed into the bins in one vectorized 
+    pass: a binary search over the sorted bin minimums finds the only bin each number of seats can fall into, and the number 
+    of seats is then checked against that bin's maximum. The sizes are stored as a categorical column whose categories are '' 
+    (planes outside every bin) followed by the sizes in the order of 'size_bins'.
+    """
+
+    minimums, maximums = np.array(list(check_size_bins(size_bins).values()), dtype=float).reshape(-1, 2).T
+    order = np.argsort(minimums)
+    seats = plane_inventory['number_of_seats'].to_numpy(dtype=float)
+    candidates = np.clip(np.searchsorted(minimums[order], seats, side='right') - 1, 0, None)
+    bins = order[candidates]
+    is_binned = (seats >= minimums[bins]) & (seats <= maximums[bins])
+    size_codes = np.where(is_binned, bins + 1, 0)
+    plane_inventory['plane_size'] = pd.Categorical.from_codes(size_codes, categories=['', *size_bins])
+    return plane_inventory
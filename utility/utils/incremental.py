@@ -0,0 +1,249 @@
+import os
+
+import pandas as pd
+
+from .caching import default_cache_dir
+from .instrumentation import instrumented
+from .distinct import default_hll_precision, check_distinct_mode, merge_distinct_aircraft_summaries, distinct_aircraft_counts
+from .streaming import (
+    summarize_file_PA,
+    summarize_file_PI,
+    summarize_distinct_file_PI,
+    merge_accident_summaries,
+    merge_inventory_summaries,
+    ult_df_from_summaries,
+)
+
+summary_format = 'pickle'
+
+def summary_paths(summaries_dir):
+
+    """
+    Parameters:
+    - summaries_dir (str): The directory that holds the running summaries.
+
+    Returns:
+    - tuple: The paths of the accident summary and of the inventory summary.
+
+    Logic:
+    Unlike the stage cache, the summaries cannot be rebuilt from what is already on disk, so they are always saved in
+    'summary_format' rather than in 'stage_format', which depends on whether pyarrow is installed.
+    """
+
+    return (
+        os.path.join(summaries_dir, f'accident_summary.{summary_format}'),
+        os.path.join(summaries_dir, f'inventory_summary.{summary_format}'),
+    )
+
+def distinct_summary_path(summaries_dir, mode):
+
+    """
+    Parameters:
+    - summaries_dir (str): The directory that holds the running summaries.
+    - mode (str): 'exact' or 'hll'.
+
+    Returns:
+    - str: The path of the distinct aircraft summary of that mode.
+    """
+
+    return os.path.join(summaries_dir, f'distinct_{check_distinct_mode(mode)}_summary.{summary_format}')
+
+def read_summary(path):
+
+    """
+    Parameters:
+    - path (str): The path of a saved summary.
+
+    Returns:
+    - pandas.DataFrame: The saved summary, or None if it has not been saved yet.
+    """
+
+    if not os.path.exists(path):
+        return None
+    return pd.read_pickle(path)
+
+def write_summary(summary, path):
+
+    """
+    Parameters:
+    - summary (pandas.DataFrame): The summary to save. A series is saved as a one-column dataframe.
+    - path (str): Where to save it.
+
+    Returns:
+    - None
+
+    Logic:
+    This function writes the summary to a temporary file and moves it into place, so an interrupted update never leaves
+    a partially written summary behind.
+    """
+
+    summary = summary.to_frame() if isinstance(summary, pd.Series) else summary
+    temporary_path = f'{path}.{os.getpid()}.tmp'
+    summary.to_pickle(temporary_path)
+    os.replace(temporary_path, path)
+
+def load_summaries(summaries_dir):
+
+    """
+    Parameters:
+    - summaries_dir (str): The directory that holds the running summaries.
+
+    Returns:
+    - tuple: The accident summary and the inventory summary. Either one is None if it has not been saved yet.
+
+    Logic:
+    This function reads the summaries saved by 'save_summaries'. If neither is saved but 'summaries_dir' already holds other
+    files, e.g. summaries saved in another format, it raises a FileNotFoundError instead of starting over from empty summaries,
+    which would silently drop the history folded in so far.
+    """
+
+    accident_path, inventory_path = summary_paths(summaries_dir)
+    accident_summary = read_summary(accident_path)
+    inventory_summary = read_summary(inventory_path)
+    if accident_summary is None and inventory_summary is None and os.path.isdir(summaries_dir):
+        other_files = [name for name in os.listdir(summaries_dir) if not name.endswith('.tmp')]
+        if other_files:
+            raise FileNotFoundError(
+                f'no running summaries in {summaries_dir!r}, which is not empty ({", ".join(sorted(other_files))}); '
+                'use an empty or new directory to build the summaries from the full history'
+            )
+    return accident_summary, None if inventory_summary is None else inventory_summary['number_of_planes']
+
+def save_summaries(accident_summary, inventory_summary, summaries_dir):
+
+    """
+    Parameters:
+    - accident_summary (pandas.DataFrame): The accident summary to save, or None to leave the saved one unchanged.
+    - inventory_summary (pandas.Series): The inventory summary to save, or None to leave the saved one unchanged.
+    - summaries_dir (str): The directory that holds the running summaries.
+
+    Returns:
+    - None
+
+    Logic:
+    This function saves each summary with 'write_summary'.
+    """
+
+    os.makedirs(summaries_dir, exist_ok=True)
+    for summary, path in zip([accident_summary, inventory_summary], summary_paths(summaries_dir)):
+        if summary is not None:
+            write_summary(summary, path)
+
+@instrumented
+def update_summaries(
+        summaries_dir,
+        new_accidents_path=None,
+        new_inventory_path=None,
+        chunksize=100_000,
+        cache_dir=default_cache_dir,
+        distinct_aircraft=None,
+        precision=default_hll_precision
+    ):
+
+    """
+    Parameters:
+    - summaries_dir (str): The directory that holds the running summaries.
+    - new_accidents_path (str): The path of a file with only the new NTSB accidents. Default value is None (no new accidents).
+    - new_inventory_path (str): The path of a file with only the new B43 inventory rows. Default value is None (no new inventory).
+    - chunksize (int): The number of rows read, cleaned and scored at a time. Default value is 100,000.
+    - cache_dir (str): The directory of the cleaned manufacturer lookup tables. Default value is 'default_cache_dir'.
+    - distinct_aircraft (str): None, or 'exact' or 'hll' to also keep a distinct aircraft summary of that mode up to date.
+      Default value is None.
+    - precision (int): The precision of the HyperLogLog registers when 'distinct_aircraft' is 'hll'. Default value is 12.
+
+    Returns:
+    - tuple: The updated accident summary and inventory summary. With 'distinct_aircraft', the inventory summary is the number
+      of distinct aircraft of each 'make_model' and 'plane_size' pair instead of the number of rows.
+
+    Logic:
+    This function summarizes the new files chunk by chunk, folds them into the saved per-'make_model' summaries
+    (accident counts, raw score sums and ranges, and inventory counts per size) and saves the result.
+    The first call with an empty 'summaries_dir' builds the summaries from the full history files.
+    The new files must not repeat rows that were already folded in, otherwise those rows are counted twice. This does not apply
+    to the distinct aircraft summary, which counts a serial number once however often it is folded in; it only covers the
+    inventory files folded in while 'distinct_aircraft' was given, so it should be given from the first call.
+    A final dataframe needs both summaries, so this function raises a ValueError, before saving anything, when the accident or
+    the inventory summary would still be missing after the update, e.g. when the first call only has a new inventory file.
+    """
+
+    accident_summary, inventory_summary = load_summaries(summaries_dir)
+    if new_accidents_path is not None:
+        new_accident_summary = summarize_file_PA(new_accidents_path, chunksize, cache_dir)
+        accident_summary = merge_accident_summaries(
+            summary for summary in [accident_summary, new_accident_summary] if summary is not None
+        )
+    if new_inventory_path is not None:
+        new_inventory_summary = summarize_file_PI(new_inventory_path, chunksize, cache_dir)
+        inventory_summary = merge_inventory_summaries(
+            summary for summary in [inventory_summary, new_inventory_summary] if summary is not None
+        )
+    missing = [name for name, summary in [('accidents', accident_summary), ('inventory', inventory_summary)] if summary is None]
+    if missing:
+        raise ValueError(
+            f'no {" or ".join(missing)} summary in {summaries_dir!r} yet; the first update needs both a new accidents file '
+            'and a new inventory file'
+        )
+    save_summaries(accident_summary, inventory_summary, summaries_dir)
+    if distinct_aircraft is None:
+        return accident_summary, inventory_summary
+
+    distinct_path = distinct_summary_path(summaries_dir, distinct_aircraft)
+    distinct_summary = read_summary(distinct_path)
+    if new_inventory_path is not None:
+        new_distinct_summary = summarize_distinct_file_PI(new_inventory_path, distinct_aircraft, chunksize, precision, cache_dir)
+        distinct_summary = merge_distinct_aircraft_summaries(
+            [summary for summary in [distinct_summary, new_distinct_summary] if summary is not None], distinct_aircraft
+        )
+        write_summary(distinct_summary, distinct_path)
+    if distinct_summary is None:
+        raise ValueError(
+            f'no {distinct_aircraft} distinct aircraft summary in {summaries_dir!r} yet; it is built from the inventory files '
+            f'folded in with distinct_aircraft={distinct_aircraft!r}'
+        )
+    return accident_summary, distinct_aircraft_counts(distinct_summary, distinct_aircraft)
+
+@instrumented
+def incremental_ult_df(
+        summaries_dir,
+        new_accidents_path=None,
+        new_inventory_path=None,
+        output_path=None,
+        chunksize=100_000,
+        n=10,
+        aircraft_dmg_w=.75,
+        human_injury_w=.25,
+        cache_dir=default_cache_dir,
+        distinct_aircraft=None,
+        precision=default_hll_precision
+    ):
+
+    """
+    Parameters:
+    - summaries_dir (str): The directory that holds the running summaries.
+    - new_accidents_path (str): The path of a file with only the new NTSB accidents. Default value is None (no new accidents).
+    - new_inventory_path (str): The path of a file with only the new B43 inventory rows. Default value is None (no new inventory).
+    - output_path (str): Where to write the final dataframe as CSV, e.g. 'data/final_data_for_tableau.csv'. Default value is None (not written).
+    - chunksize (int): The number of rows read, cleaned and scored at a time. Default value is 100,000.
+    - n (int): The number of top planes by size to include. Default value is 10.
+    - aircraft_dmg_w (float): The weight for the damage score in the danger score. Default value is 0.75.
+    - human_injury_w (float): The weight for the injury score in the danger score. Default value is 0.25.
+    - cache_dir (str): The directory of the cleaned manufacturer lookup tables. Default value is 'default_cache_dir'.
+    - distinct_aircraft (str): None to rank the planes by inventory rows, or 'exact' or 'hll' to rank them by distinct aircraft;
+      see 'update_summaries'. Default value is None.
+    - precision (int): The precision of the HyperLogLog registers when 'distinct_aircraft' is 'hll'. Default value is 12.
+
+    Returns:
+    - pandas.DataFrame: The same final dataframe as 'ult_df' over the full history, including the new rows.
+
+    Logic:
+    This function folds the new files into the running summaries with 'update_summaries' and regenerates the final dataframe
+    from the summaries with 'ult_df_from_summaries', without rescanning the history.
+    """
+
+    accident_summary, inventory_summary = update_summaries(
+        summaries_dir, new_accidents_path, new_inventory_path, chunksize, cache_dir, distinct_aircraft, precision
+    )
+    final_results = ult_df_from_summaries(accident_summary, inventory_summary, n, aircraft_dmg_w, human_injury_w)
+    if output_path is not None:
+        final_results.to_csv(output_path)
+    return final_results
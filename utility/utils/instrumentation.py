@@ -0,0 +1,216 @@
+import atexit
+import functools
+import json
+import os
+import time
+import tracemalloc
+
+import pandas as pd
+
+instrumentation_state = {'enabled': False, 'memory': False, 'started_tracemalloc': False}
+instrumentation_records = []
+instrumentation_sinks = []
+instrumentation_stack = []
+
+def count_rows(value):
+
+    """
+    Parameters:
+    - value: An argument or return value of an instrumented function.
+
+    Returns:
+    - int: The number of rows of a dataframe or series, the summed rows of a list or tuple of them, or None for anything else.
+    """
+
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return len(value)
+    if isinstance(value, (list, tuple)):
+        counts = [count_rows(item) for item in value]
+        counts = [count for count in counts if count is not None]
+        return sum(counts) if counts else None
+    return None
+
+def instrumented(function):
+
+    """
+    Parameters:
+    - function (function): A pipeline function to instrument.
+
+    Returns:
+    - function: The same function, recording a stage record on every call while instrumentation is enabled.
+
+    Logic:
+    When instrumentation is off, the wrapper only checks a flag and calls the function, so the overhead is one extra call.
+    When it is on, the wrapper records the wall time, CPU time, rows of the dataframe arguments and of the result,
+    the nesting depth, and with memory tracking the peak memory allocated during the call.
+    Each record is appended to 'instrumentation_records' and passed to every registered sink.
+    Calls made inside worker processes of 'map_partitions' are not recorded.
+    """
+
+    stage = f"{function.__module__.rsplit('.', 1)[-1]}.{function.__name__}"
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if not instrumentation_state['enabled']:
+            return function(*args, **kwargs)
+
+        rows_in = count_rows([*args, *kwargs.values()])
+        memory = instrumentation_state['memory'] and tracemalloc.is_tracing()
+        if memory:
+            memory_start, outer_peak = tracemalloc.get_traced_memory()
+            if instrumentation_stack:
+                instrumentation_stack[-1] = max(instrumentation_stack[-1], outer_peak)
+            tracemalloc.reset_peak()
+        instrumentation_stack.append(0)
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            result = function(*args, **kwargs)
+        finally:
+            wall_seconds = time.perf_counter() - wall_start
+            cpu_seconds = time.process_time() - cpu_start
+            inner_peak = instrumentation_stack.pop()
+            peak = max(inner_peak, tracemalloc.get_traced_memory()[1]) if memory else None
+            if memory and instrumentation_stack:
+                instrumentation_stack[-1] = max(instrumentation_stack[-1], peak)
+
+        record = {
+            'stage': stage,
+            'depth': len(instrumentation_stack),
+            'wall_seconds': wall_seconds,
+            'cpu_seconds': cpu_seconds,
+            'rows_in': rows_in,
+            'rows_out': count_rows(result),
+            'peak_mib': (peak - memory_start) / 1024**2 if memory else None,
+        }
+        instrumentation_records.append(record)
+        for sink in instrumentation_sinks:
+            sink(record)
+        return result
+
+    return wrapper
+
+def enable_instrumentation(memory=True):
+
+    """
+    Parameters:
+    - memory (bool): Whether to track peak memory with tracemalloc, which slows the instrumented code down. Default value is True.
+
+    Returns:
+    - None
+    """
+
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        instrumentation_state['started_tracemalloc'] = True
+    instrumentation_state['memory'] = memory
+    instrumentation_state['enabled'] = True
+
+def disable_instrumentation():
+
+    """
+    Returns:
+    - None
+
+    Logic:
+    This function stops recording and stops tracemalloc if 'enable_instrumentation' started it. The records are kept.
+    """
+
+    instrumentation_state['enabled'] = False
+    if instrumentation_state['started_tracemalloc']:
+        tracemalloc.stop()
+        instrumentation_state['started_tracemalloc'] = False
+
+def add_instrumentation_sink(sink):
+
+    """
+    Parameters:
+    - sink (function): A function called with each stage record, a dict, e.g. to log it or send it to a metrics system.
+
+    Returns:
+    - function: The sink, so this function can be used as a decorator.
+    """
+
+    instrumentation_sinks.append(sink)
+    return sink
+
+def remove_instrumentation_sink(sink):
+
+    """
+    Parameters:
+    - sink (function): A sink registered with 'add_instrumentation_sink'.
+
+    Returns:
+    - None
+    """
+
+    instrumentation_sinks.remove(sink)
+
+def print_sink(record):
+
+    """
+    Parameters:
+    - record (dict): A stage record.
+
+    Returns:
+    - None
+
+    Logic:
+    This sink prints one indented line per stage as it finishes, so nested stages appear under their caller.
+    """
+
+    peak = '' if record['peak_mib'] is None else f" {record['peak_mib']:8.1f} MiB"
+    print(f"{'  ' * record['depth']}{record['stage']}: {record['wall_seconds']:.4f}s "
+          f"rows {record['rows_in']} -> {record['rows_out']}{peak}")
+
+def instrumentation_report(output_path=None, clear=False):
+
+    """
+    Parameters:
+    - output_path (str): Where to write the report as JSON. Default value is None (not written).
+    - clear (bool): Whether to clear the records after building the report. Default value is False.
+
+    Returns:
+    - dict: Every stage record in call order, and per stage the number of calls, the total wall and CPU time,
+    the total rows in and out and the highest peak memory.
+    """
+
+    stages = {}
+    for record in instrumentation_records:
+        totals = stages.setdefault(record['stage'], {
+            'calls': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'rows_in': 0, 'rows_out': 0, 'peak_mib': None
+        })
+        totals['calls'] += 1
+        totals['wall_seconds'] += record['wall_seconds']
+        totals['cpu_seconds'] += record['cpu_seconds']
+        totals['rows_in'] += record['rows_in'] or 0
+        totals['rows_out'] += record['rows_out'] or 0
+        if record['peak_mib'] is not None:
+            totals['peak_mib'] = max(totals['peak_mib'] or 0.0, record['peak_mib'])
+
+    report = {'stages': stages, 'records': list(instrumentation_records)}
+    if output_path is not None:
+        with open(output_path, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+    if clear:
+        instrumentation_records.clear()
+    return report
+
+def instrument_from_environment():
+
+    """
+    Returns:
+    - None
+
+    Logic:
+    Setting the environment variable 'AVIATION_INSTRUMENT' to a file path turns instrumentation on at import time
+    and writes the JSON report to that path when the process exits, so a scheduled run can be profiled without code changes.
+    'AVIATION_INSTRUMENT_MEMORY=0' turns off the memory tracking.
+    """
+
+    output_path = os.environ.get('AVIATION_INSTRUMENT')
+    if not output_path:
+        return
+    enable_instrumentation(memory=os.environ.get('AVIATION_INSTRUMENT_MEMORY', '1') != '0')
+    atexit.register(instrumentation_report, output_path)
+
+instrument_from_environment()
@@ -0,0 +1,192 @@
+import os
+import re
+import sys
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+from .caching import default_cache_dir, rules_fingerprint, load_json_table, save_json_table
+from .features import add_make_model_feature_PAPI
+from .instrumentation import instrumented
+
+non_alphanumeric_pattern = re.compile(r'[^a-z0-9]+')
+
+def matching_key(name):
+
+    """
+    Parameters:
+    - name (str): A cleaned manufacturer name, e.g. 'mcdonnell/douglas' or 'bellanca .'.
+
+    Returns:
+    - str: The name in lower case with every run of punctuation, '/' or spaces replaced by a single space.
+      Anything that is not a string gives ''.
+    """
+
+    if not isinstance(name, str):
+        return ''
+    return non_alphanumeric_pattern.sub(' ', name.lower()).strip()
+
+def name_ngrams(name, n=3):
+
+    """
+    Parameters:
+    - name (str): A manufacturer name.
+    - n (int): The length of the character n-grams. Default value is 3.
+
+    Returns:
+    - set: The distinct character n-grams of the matching key of the name, padded with a space on each side
+      so that the first and last letters count as much as the others. Empty for an empty key.
+    """
+
+    key = matching_key(name)
+    if not key:
+        return set()
+    padded = f' {key} '
+    return {padded[start:start + n] for start in range(max(len(padded) - n + 1, 1))}
+
+def build_ngram_index(names, n=3):
+
+    """
+    Parameters:
+    - names (list): The candidate names, e.g. the distinct cleaned inventory makes.
+    - n (int): The length of the character n-grams. Default value is 3.
+
+    Returns:
+    - tuple: The inverted index, a dictionary from each n-gram to an array of the positions of the names that contain it,
+      and an array of the number of distinct n-grams of each name.
+    """
+
+    index = defaultdict(list)
+    ngram_counts = []
+    for position, name in enumerate(names):
+        ngrams = name_ngrams(name, n)
+        for ngram in ngrams:
+            index[ngram].append(position)
+        ngram_counts.append(len(ngrams))
+    return {ngram: np.array(positions) for ngram, positions in index.items()}, np.array(ngram_counts, dtype=np.int64)
+
+@instrumented
+def best_matches(queries, candidates, threshold=.7, n=3):
+
+    """
+    Parameters:
+    - queries (iterable): The names to match, e.g. the distinct cleaned accident makes.
+    - candidates (iterable): The names to match them to, e.g. the distinct cleaned inventory makes.
+    - threshold (float): The lowest similarity accepted as a match, from 0 to 1. Default value is 0.7.
+    - n (int): The length of the character n-grams. Default value is 3.
+
+    Returns:
+    - dict: Each query mapped to a list of its best candidate and their similarity, or [None, 0.0] when no candidate
+      reaches 'threshold'.
+
+    Logic:
+    The similarity of two names is the Dice coefficient of their sets of character n-grams: twice the number of shared n-grams
+    divided by the total number of n-grams of both. Instead of comparing every query with every candidate, this function builds
+    an inverted index of the candidates' n-grams once. For each query, it concatenates the posting lists of the query's n-grams
+    and counts the distinct positions with np.unique, which gives the number of shared n-grams with each candidate that shares
+    at least one. Only those candidates are scored, since the others have a similarity of 0, so the work per query grows with
+    the length of its posting lists rather than with the number of candidates. The best candidate is the one with the
+    highest similarity, the candidate listed first on ties. A query whose matching key equals a candidate's is matched to it
+    with similarity 1.
+    """
+
+    candidates = list(dict.fromkeys(candidates))
+    index, ngram_counts = build_ngram_index(candidates, n)
+    exact = {}
+    for position, candidate in enumerate(candidates):
+        exact.setdefault(matching_key(candidate), position)
+
+    matches = {}
+    for query in dict.fromkeys(queries):
+        key = matching_key(query)
+        if key and key in exact:
+            matches[query] = [candidates[exact[key]], 1.0]
+            continue
+        ngrams = name_ngrams(query, n)
+        postings = [index[ngram] for ngram in ngrams if ngram in index]
+        if not postings:
+            matches[query] = [None, 0.0]
+            continue
+        positions, shared = np.unique(np.concatenate(postings), return_counts=True)
+        similarities = 2 * shared / (len(ngrams) + ngram_counts[positions])
+        best = int(np.argmax(similarities))
+        if similarities[best] >= threshold:
+            matches[query] = [candidates[positions[best]], float(similarities[best])]
+        else:
+            matches[query] = [None, 0.0]
+    return matches
+
+@instrumented
+def match_manufacturers(accident_makes, inventory_makes, threshold=.7, n=3, cache_dir=default_cache_dir):
+
+    """
+    Parameters:
+    - accident_makes (iterable): The cleaned accident makes to match.
+    - inventory_makes (iterable): The cleaned inventory makes to match them to.
+    - threshold (float): The lowest similarity accepted as a match, from 0 to 1. Default value is 0.7.
+    - n (int): The length of the character n-grams. Default value is 3.
+    - cache_dir (str): The directory of the match table. Default value is 'default_cache_dir'. If None, nothing is read from
+      or written to disk.
+
+    Returns:
+    - dict: Each distinct accident make mapped to a list of its matched inventory make (or None) and their similarity.
+
+    Logic:
+    This function keeps the matches in a JSON match table on disk, like the manufacturer lookup tables of the cleaning step.
+    The file name contains a fingerprint of the inventory makes, the threshold, n and this module's source code, so a new inventory
+    or a change to the matching starts a new table. Only the accident makes that are not in the table yet are matched with
+    'best_matches', and they are added to the table at the end of the call.
+    """
+
+    accident_makes = [make for make in pd.unique(pd.Series(list(accident_makes), dtype=object)) if isinstance(make, str)]
+    inventory_makes = [make for make in pd.unique(pd.Series(list(inventory_makes), dtype=object)) if isinstance(make, str)]
+    cache_path = None
+    match_table = {}
+    if cache_dir is not None:
+        fingerprint = rules_fingerprint(
+            [sorted(inventory_makes), threshold, n], functions=[sys.modules[__name__]]
+        )
+        cache_path = os.path.join(cache_dir, f'manufacturer_matches_{fingerprint}.json')
+        match_table = load_json_table(cache_path)
+
+    new_makes = [make for make in accident_makes if make not in match_table]
+    if new_makes:
+        match_table.update(best_matches(new_makes, inventory_makes, threshold, n))
+        if cache_path is not None:
+            save_json_table(match_table, cache_path)
+    return {make: match_table[make] for make in accident_makes}
+
+@instrumented
+def match_makes_PA(plane_accidents, plane_inventory, threshold=.7, n=3, cache_dir=default_cache_dir):
+
+    """
+    Parameters:
+    - plane_accidents (pandas.DataFrame): The cleaned plane accidents data, with or without the 'make_model' feature.
+    - plane_inventory (pandas.DataFrame): The cleaned plane inventory data.
+    - threshold (float): The lowest similarity accepted as a match, from 0 to 1. Default value is 0.7.
+    - n (int): The length of the character n-grams. Default value is 3.
+    - cache_dir (str): The directory of the match table. Default value is 'default_cache_dir'.
+
+    Returns:
+    - pandas.DataFrame: A copy of the accidents whose 'make' is replaced by the inventory make it matches,
+      with 'make_model' rebuilt if it was there. Makes without a match are kept as they are.
+
+    Logic:
+    The NTSB and B43 makes are cleaned by separate hand-written rules, so many accident makes are spelled differently from
+    the inventory makes of the same manufacturer (e.g. 'mcdonnell douglas' and 'mcdonnell/douglas') and never join to them
+    in 'ult_df'. This function matches every distinct accident make to the inventory makes with 'match_manufacturers'
+    and relabels the categorical 'make' column, so each distinct make is only matched once. Run it on the cleaned
+    accidents before 'ult_df'.
+    """
+
+    matches = match_manufacturers(plane_accidents['make'], plane_inventory['make'], threshold, n, cache_dir)
+    plane_accidents = plane_accidents.copy()
+    makes = plane_accidents['make'].astype('category')
+    matched_categories = [(matches.get(make, [None])[0] or make) for make in makes.cat.categories]
+    category_codes, categories = pd.factorize(pd.Series(matched_categories, dtype=object))
+    codes = np.append(category_codes, -1)[makes.cat.codes.to_numpy()]
+    plane_accidents['make'] = pd.Categorical.from_codes(codes, categories=categories)
+    if 'make_model' in plane_accidents.columns:
+        add_make_model_feature_PAPI(plane_accidents)
+    return plane_accidents
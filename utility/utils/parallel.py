@@ -0,0 +1,114 @@
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from .caching import default_cache_dir
+from .cleaning import clean_data_PA, clean_data_PI
+from .features import add_make_model_feature_PAPI, add_plane_size_feature_PI, plane_size_bins
+
+parallel_min_rows = 100_000
+
+def split_rows(df, partitions):
+
+    """
+    Parameters:
+    - df (pandas.DataFrame): The dataframe to split.
+    - partitions (int): The number of row partitions.
+
+    Returns:
+    - list: The row partitions, in order, as consecutive slices of the dataframe.
+    """
+
+    bounds = np.linspace(0, len(df), partitions + 1).astype(int)
+    return [df.iloc[start:stop] for start, stop in zip(bounds[:-1], bounds[1:])]
+
+def map_partitions(function, df, workers=None, min_rows=parallel_min_rows, **kwargs):
+
+    """
+    Parameters:
+    - function (function): A module-level function that takes a dataframe as first argument.
+    - df (pandas.DataFrame): The dataframe to process.
+    - workers (int): The number of worker processes. Default value is None, which runs serially.
+    - min_rows (int): The smallest number of rows worth starting a process pool for. Default value is 100,000.
+    - kwargs: Keyword arguments passed to the function.
+
+    Returns:
+    - list: The results of the function for each row partition, in the order of the partitions.
+
+    Logic:
+    This function splits the dataframe into one consecutive row partition per worker and runs the function on every partition 
+    in a process pool. Results are returned in partition order, so combining them gives the same row order on every run.
+    With fewer than two workers, or fewer than 'min_rows' rows, starting the pool costs more than it saves and the function is 
+    called once on the whole dataframe in this process instead.
+    """
+
+    if workers is None or workers < 2 or len(df) < min_rows:
+        return [function(df, **kwargs)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(partial(function, **kwargs), split_rows(df, workers)))
+
+def combine_partitions(partitions):
+
+    """
+    Parameters:
+    - partitions (list): The processed row partitions returned by 'map_partitions'.
+
+    Returns:
+    - pandas.DataFrame: The partitions concatenated in order with a fresh 0 to n-1 index, as the cleaners produce serially.
+      A single partition is returned as is, without copying it.
+
+    Logic:
+    Concatenating categorical columns whose categories differ would turn them into object columns, so every column that is 
+    categorical in all the partitions is combined with 'union_categoricals' instead. The categories of the later partitions are 
+    appended in order of first appearance, which gives the same categories as processing the whole dataframe at once.
+    """
+
+    if len(partitions) == 1:
+        return partitions[0]
+    columns = list(partitions[0].columns)
+    categorical_columns = [
+        column for column in columns
+        if all(isinstance(partition[column].dtype, pd.CategoricalDtype) for partition in partitions)
+    ]
+    combined = pd.concat([partition.drop(columns=categorical_columns) for partition in partitions], ignore_index=True)
+    for column in categorical_columns:
+        combined.insert(columns.index(column), column, union_categoricals([partition[column] for partition in partitions]))
+    return combined
+
+def clean_partition_PA(plane_accidents_raw, cache_dir=default_cache_dir):
+
+    """
+    Parameters:
+    - plane_accidents_raw (pandas.DataFrame): A row partition of the raw plane accidents data.
+    - cache_dir (str): The directory of the cleaned manufacturer lookup table. Default value is 'default_cache_dir'.
+
+    Returns:
+    - pandas.DataFrame: The cleaned partition with the 'make_model' feature.
+
+    Logic:
+    This function runs the row-local, string-heavy steps of the accident pipeline. The injury and damage scores are rescaled 
+    with the minimum and maximum over all accidents, so they are computed after the partitions are combined.
+    """
+
+    return add_make_model_feature_PAPI(clean_data_PA(plane_accidents_raw, cache_dir=cache_dir))
+
+def clean_partition_PI(plane_inventory_raw, cache_dir=default_cache_dir, size_bins=plane_size_bins, keep_serial_number=False):
+
+    """
+    Parameters:
+    - plane_inventory_raw (pandas.DataFrame): A row partition of the raw plane inventory data.
+    - cache_dir (str): The directory of the cleaned manufacturer lookup table. Default value is 'default_cache_dir'.
+    - size_bins (dict): The seat bins of each size, passed to add_plane_size_feature_PI. Default value is 'plane_size_bins'.
+    - keep_serial_number (bool): Whether to keep the 'serial_number' column, passed to clean_data_PI. Default value is False.
+
+    Returns:
+    - pandas.DataFrame: The cleaned partition with the 'make_model' and 'plane_size' features.
+    """
+
+    plane_inventory = add_make_model_feature_PAPI(clean_data_PI(
+        plane_inventory_raw, cache_dir=cache_dir, keep_serial_number=keep_serial_number
+    ))
+    return add_plane_size_feature_PI(plane_inventory, size_bins)
@@ -0,0 +1,231 @@
+import pandas as pd
+
+from .caching import default_cache_dir, default_max_cache_bytes, file_fingerprint, stage_key, load_stage, save_stage
+from .instrumentation import instrumented
+from .cleaning import clean_data_PA, clean_data_PI
+from .features import (
+    engineer_make_model_feature_PAPI,
+    engineer_accident_features_PA,
+    engineer_damage_feature_PA,
+    engineer_danger_score_PA,
+    engineer_plane_size_feature_PI,
+    plane_size_bins,
+    add_accident_features_PA,
+    add_damage_feature_PA,
+    add_danger_score_PA,
+)
+from .parallel import map_partitions, combine_partitions, clean_partition_PA, clean_partition_PI, parallel_min_rows
+from .streaming import accident_dtypes_PA, inventory_dtypes_PI
+
+@instrumented
+def build_accident_features_PA(
+        plane_accidents_raw,
+        aircraft_dmg_w=.75,
+        human_injury_w=.25,
+        cache_dir=default_cache_dir,
+        workers=None,
+        min_parallel_rows=parallel_min_rows
+    ):
+
+    """
+    Parameters:
+    - plane_accidents_raw (pandas.DataFrame): The raw dataframe of plane accidents data. It is not modified.
+    - aircraft_dmg_w (float): The weight for 'aircraft_damage_numeric' in calculating the danger score. Default value is 0.75.
+    - human_injury_w (float): The weight for 'human_injury_numeric' in calculating the danger score. Default value is 0.25.
+    - cache_dir (str): The directory of the cleaned manufacturer lookup table. Default value is 'default_cache_dir'.
+    - workers (int): The number of processes that clean the raw data in parallel. Default value is None, which runs serially.
+    - min_parallel_rows (int): Inputs with fewer rows are always processed serially. Default value is 100,000.
+
+    Returns:
+    - pandas.DataFrame: The same dataframe as running clean_data_PA, engineer_make_model_feature_PAPI, engineer_accident_features_PA, 
+      engineer_damage_feature_PA and engineer_danger_score_PA in turn ('plane_accidents_4F').
+
+    Logic:
+    This function cleans the raw data with clean_data_PA, which copies only the relevant columns and rows once, and then adds every 
+    feature column to that single dataframe in place, instead of copying the whole dataframe at every stage.
+    With 'workers', the cleaning and the 'make_model' feature run on row partitions in a process pool through 'map_partitions', 
+    and the partitions are combined in order; the result, including its index, is the same as the serial one.
+    """
+
+    plane_accidents = combine_partitions(map_partitions(
+        clean_partition_PA, plane_accidents_raw, workers, min_parallel_rows, cache_dir=cache_dir
+    ))
+    add_accident_features_PA(plane_accidents)
+    add_damage_feature_PA(plane_accidents)
+    return add_danger_score_PA(plane_accidents, aircraft_dmg_w, human_injury_w)
+
+@instrumented
+def build_inventory_features_PI(
+        plane_inventory_raw,
+        cache_dir=default_cache_dir,
+        workers=None,
+        min_parallel_rows=parallel_min_rows,
+        size_bins=plane_size_bins,
+        keep_serial_number=False
+    ):
+
+    """
+    Parameters:
+    - plane_inventory_raw (pandas.DataFrame): The raw dataframe of plane inventory data. It is not modified.
+    - cache_dir (str): The directory of the cleaned manufacturer lookup table. Default value is 'default_cache_dir'.
+    - workers (int): The number of processes that process the raw data in parallel. Default value is None, which runs serially.
+    - min_parallel_rows (int): Inputs with fewer rows are always processed serially. Default value is 100,000.
+    - size_bins (dict): The seat bins of each size, passed to add_plane_size_feature_PI. Default value is 'plane_size_bins'.
+    - keep_serial_number (bool): Whether to keep the 'serial_number' column, passed to clean_data_PI. Default value is False.
+
+    Returns:
+    - pandas.DataFrame: The same dataframe as running clean_data_PI, engineer_make_model_feature_PAPI and 
+      engineer_plane_size_feature_PI in turn ('plane_inventory_2F').
+
+    Logic:
+    This function cleans the raw data with clean_data_PI and adds the feature columns to the cleaned dataframe in place.
+    Every step is row-local, so with 'workers' the whole chain runs on row partitions in a process pool.
+    """
+
+    return combine_partitions(map_partitions(
+        clean_partition_PI, plane_inventory_raw, workers, min_parallel_rows,
+        cache_dir=cache_dir, size_bins=size_bins, keep_serial_number=keep_serial_number
+    ))
+
+def read_raw_PA(path, dtypes=accident_dtypes_PA):
+
+    """
+    Parameters:
+    - path (str): The path of the NTSB 'AviationData.csv' file.
+    - dtypes (dict): The columns to read and their dtypes. Default value is 'accident_dtypes_PA'.
+
+    Returns:
+    - pandas.DataFrame: The raw plane accidents data, with only the columns listed in 'dtypes'.
+    """
+
+    return pd.read_csv(path, encoding='latin-1', usecols=list(dtypes), dtype=dtypes)
+
+def read_raw_PI(path, dtypes=inventory_dtypes_PI):
+
+    """
+    Parameters:
+    - path (str): The path of the BTS 'T_F41SCHEDULE_B43.csv' file.
+    - dtypes (dict): The columns to read and their dtypes. Default value is 'inventory_dtypes_PI'; 
+      'inventory_serial_dtypes_PI' also reads the serial numbers.
+
+    Returns:
+    - pandas.DataFrame: The raw plane inventory data, with only the columns listed in 'dtypes'.
+    """
+
+    return pd.read_csv(path, usecols=list(dtypes), dtype=dtypes)
+
+@instrumented
+def run_cached_stages(
+        raw_path,
+        read_raw,
+        stages,
+        cache_dir=default_cache_dir,
+        max_cache_bytes=default_max_cache_bytes,
+        read_params=None
+    ):
+
+    """
+    Parameters:
+    - raw_path (str): The path of the raw input file.
+    - read_raw (function): The function that reads the raw input file into a dataframe.
+    - stages (list): The (stage function, parameters) pairs to run in order. Each stage takes the previous output as first argument.
+    - cache_dir (str): The cache directory. Default value is 'default_cache_dir'.
+    - max_cache_bytes (int): The maximum total size of the cached stage outputs. Default value is 2 GiB.
+    - read_params (dict): The JSON-serializable parameters 'read_raw' is called with, e.g. its dtypes. Default value is None (none).
+
+    Returns:
+    - pandas.DataFrame: The output of the last stage.
+
+    Logic:
+    This function first computes the key of every stage from the fingerprint of the raw file, the code and parameters of 'read_raw', 
+    and the code and parameters of that stage and all stages before it, without reading any data. Reading the raw file is keyed 
+    like a stage, so changing the columns, dtypes or encoding it is read with does not serve outputs cleaned from the old read. 
+    It then loads the output of the last stage that is already cached, reading the raw file only if no stage is cached, runs the 
+    remaining stages and caches each of their outputs.
+    Changing a parameter of a late stage, such as the danger score weights, therefore only reruns that stage.
+    """
+
+    read_params = {} if read_params is None else read_params
+    keys = []
+    key = stage_key(file_fingerprint(raw_path), read_raw, read_params)
+    for stage, params in stages:
+        key = stage_key(key, stage, params)
+        keys.append(key)
+
+    df, first_stage = None, 0
+    for index in reversed(range(len(stages))):
+        df = load_stage(keys[index], stages[index][0].__name__, cache_dir)
+        if df is not None:
+            first_stage = index + 1
+            break
+    if df is None:
+        df = read_raw(raw_path, **read_params)
+
+    for index in range(first_stage, len(stages)):
+        stage, params = stages[index]
+        df = stage(df, **params)
+        save_stage(df, keys[index], stage.__name__, cache_dir, max_cache_bytes)
+    return df
+
+@instrumented
+def cached_features_PA(
+        accidents_path,
+        aircraft_dmg_w=.75,
+        human_injury_w=.25,
+        cache_dir=default_cache_dir,
+        max_cache_bytes=default_max_cache_bytes
+    ):
+
+    """
+    Parameters:
+    - accidents_path (str): The path of the NTSB 'AviationData.csv' file.
+    - aircraft_dmg_w (float): The weight for 'aircraft_damage_numeric' in calculating the danger score. Default value is 0.75.
+    - human_injury_w (float): The weight for 'human_injury_numeric' in calculating the danger score. Default value is 0.25.
+    - cache_dir (str): The cache directory of the stage outputs and of the cleaned manufacturer lookup table used by clean_data_PA. 
+      Default value is 'default_cache_dir'.
+    - max_cache_bytes (int): The maximum total size of the cached stage outputs. Default value is 2 GiB.
+
+    Returns:
+    - pandas.DataFrame: The plane accidents data with engineered accident, damage, and danger features ('plane_accidents_4F').
+
+    Logic:
+    This function runs clean_data_PA, engineer_make_model_feature_PAPI, engineer_accident_features_PA, engineer_damage_feature_PA 
+    and engineer_danger_score_PA through 'run_cached_stages', so only the stages whose input, code or parameters changed are recomputed.
+    """
+
+    stages = [
+        (clean_data_PA, {'cache_dir': cache_dir}),
+        (engineer_make_model_feature_PAPI, {}),
+        (engineer_accident_features_PA, {}),
+        (engineer_damage_feature_PA, {}),
+        (engineer_danger_score_PA, {'aircraft_dmg_w': aircraft_dmg_w, 'human_injury_w': human_injury_w}),
+    ]
+    return run_cached_stages(
+        accidents_path, read_raw_PA, stages, cache_dir, max_cache_bytes, read_params={'dtypes': accident_dtypes_PA}
+    )
+
+@instrumented
+def cached_features_PI(inventory_path, cache_dir=default_cache_dir, max_cache_bytes=default_max_cache_bytes):
+
+    """
+    Parameters:
+    - inventory_path (str): The path of the BTS 'T_F41SCHEDULE_B43.csv' file.
+    - cache_dir (str): The cache directory of the stage outputs and of the cleaned manufacturer lookup table used by clean_data_PI. 
+      Default value is 'default_cache_dir'.
+    - max_cache_bytes (int): The maximum total size of the cached stage outputs. Default value is 2 GiB.
+
+    Returns:
+    - pandas.DataFrame: The plane inventory data with the 'make_model' and 'plane_size' features ('plane_inventory_2F').
+
+    Logic:
+    This function runs clean_data_PI, engineer_make_model_feature_PAPI and engineer_plane_size_feature_PI through 'run_cached_stages'.
+    """
+
+    stages = [
+        (clean_data_PI, {'cache_dir': cache_dir}),
+        (engineer_make_model_feature_PAPI, {}),
+        (engineer_plane_size_feature_PI, {}),
+    ]
+    return run_cached_stages(
+        inventory_path, read_raw_PI, stages, cache_dir, max_cache_bytes, read_params={'dtypes': inventory_dtypes_PI}
+    )
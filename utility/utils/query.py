@@ -0,0 +1,269 @@
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+
+repository_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+default_query_index_path = os.path.join(repository_dir, 'data', 'final_data_for_tableau.sqlite')
+
+query_columns = {
+    'make_model': 'TEXT',
+    'size': 'TEXT',
+    'number_of_planes': 'INTEGER',
+    'recorded_accidents_for_plane_model': 'REAL',
+    'mean_human_injury_score': 'REAL',
+    'mean_aircraft_damage_score': 'REAL',
+    'mean_danger_score': 'REAL',
+    'recorded_accidents_per_plane_in_inventory': 'REAL',
+}
+
+def final_rows(final_results):
+
+    """
+    Parameters:
+    - final_results (pandas.DataFrame or str): The final dataframe returned by 'ult_df', or the path of a CSV file it was saved to,
+      e.g. 'data/final_data_for_tableau.csv'.
+
+    Returns:
+    - tuple: The names of the columns to index and a list of rows, one tuple of values per plane, with None for missing values.
+
+    Logic:
+    A CSV file is read with the csv module, so building the index from a saved final table does not need pandas.
+    The columns of 'query_columns' come first; any other column of the final table, e.g. the recent accident rates of
+    'ult_rates_df', is kept after them.
+    """
+
+    if isinstance(final_results, str):
+        with open(final_results, newline='', encoding='utf-8') as file:
+            records = list(csv.DictReader(file))
+        columns = [column for column in (records[0] if records else query_columns) if column]
+    else:
+        records = final_results.astype(object).where(final_results.notna(), None).to_dict('records')
+        columns = [str(column) for column in final_results.columns]
+    columns = list(query_columns) + [column for column in columns if column not in query_columns]
+
+    def value(record, column):
+        item = record.get(column)
+        if item is None or item == '':
+            return None
+        if query_columns.get(column, 'REAL') == 'TEXT':
+            return str(item)
+        number = float(item)
+        return int(number) if query_columns.get(column) == 'INTEGER' else number
+
+    return columns, [tuple(value(record, column) for column in columns) for record in records]
+
+def build_query_index(final_results, index_path=default_query_index_path):
+
+    """
+    Parameters:
+    - final_results (pandas.DataFrame or str): The final dataframe returned by 'ult_df', or the path of its CSV file.
+    - index_path (str): Where to write the query index. Default value is 'data/final_data_for_tableau.sqlite' in the repository,
+      wherever the command is run from.
+
+    Returns:
+    - str: The path of the query index.
+
+    Logic:
+    The final table is written to a SQLite file with an index on 'make_model', one on 'size' and 'mean_danger_score' and one on
+    'mean_danger_score', so each query of 'query_main' is an index lookup or range scan instead of a read of the whole table.
+    The file is written next to its final path and moved into place, so a query never sees a partially built index.
+    """
+
+    columns, rows = final_rows(final_results)
+    temporary_path = f'{index_path}.{os.getpid()}.tmp'
+    if os.path.dirname(index_path):
+        os.makedirs(os.path.dirname(index_path), exist_ok=True)
+    if os.path.exists(temporary_path):
+        os.remove(temporary_path)
+    connection = sqlite3.connect(temporary_path)
+    try:
+        column_definitions = ', '.join(f'"{column}" {query_columns.get(column, "REAL")}' for column in columns)
+        connection.execute(f'CREATE TABLE planes ({column_definitions})')
+        connection.executemany(f'INSERT INTO planes VALUES ({", ".join("?" * len(columns))})', rows)
+        connection.execute('CREATE INDEX planes_make_model ON planes (make_model)')
+        connection.execute('CREATE INDEX planes_size_danger ON planes (size, mean_danger_score)')
+        connection.execute('CREATE INDEX planes_danger ON planes (mean_danger_score)')
+        connection.commit()
+    finally:
+        connection.close()
+    os.replace(temporary_path, index_path)
+    return index_path
+
+def open_query_index(index_path=default_query_index_path):
+
+    """
+    Parameters:
+    - index_path (str): The path of a query index written by 'build_query_index'. Default value is 'data/final_data_for_tableau.sqlite'
+      in the repository.
+
+    Returns:
+    - sqlite3.Connection: A read-only connection whose rows can be read like dictionaries.
+    """
+
+    if not os.path.exists(index_path):
+        raise FileNotFoundError(f'no query index at {index_path!r}, build it first with the build command')
+    connection = sqlite3.connect(f'file:{index_path}?mode=ro', uri=True)
+    connection.row_factory = sqlite3.Row
+    return connection
+
+def lookup_make_model(connection, make_model):
+
+    """
+    Parameters:
+    - connection (sqlite3.Connection): A connection returned by 'open_query_index'.
+    - make_model (str): The 'make_model' to look up, e.g. 'boeing 737'. Case and surrounding spaces are ignored.
+
+    Returns:
+    - list: The rows of that 'make_model', one per size it is in, as dictionaries.
+    """
+
+    rows = connection.execute(
+        'SELECT * FROM planes WHERE make_model = ? OR make_model = ? ORDER BY rowid',
+        (make_model, make_model.strip().lower())
+    )
+    return [dict(row) for row in rows]
+
+def top_safest(connection, n=10, size=None):
+
+    """
+    Parameters:
+    - connection (sqlite3.Connection): A connection returned by 'open_query_index'.
+    - n (int): The number of planes per size. Default value is 10.
+    - size (str): Only return this size. Default value is None, which returns every size.
+
+    Returns:
+    - list: The n planes with the lowest 'mean_danger_score' of each size, sizes in order of the final table, as dictionaries.
+      Planes without a danger score are left out.
+    """
+
+    sizes = [size] if size is not None else [
+        row['size'] for row in connection.execute('SELECT size FROM planes GROUP BY size ORDER BY MIN(rowid)')
+    ]
+    rows = []
+    for plane_size in sizes:
+        rows.extend(connection.execute(
+            'SELECT * FROM planes WHERE size = ? AND mean_danger_score IS NOT NULL ORDER BY mean_danger_score, rowid LIMIT ?',
+            (plane_size, n)
+        ))
+    return [dict(row) for row in rows]
+
+def above_danger_threshold(connection, threshold, size=None):
+
+    """
+    Parameters:
+    - connection (sqlite3.Connection): A connection returned by 'open_query_index'.
+    - threshold (float): The 'mean_danger_score' to exceed.
+    - size (str): Only return this size. Default value is None, which returns every size.
+
+    Returns:
+    - list: The planes whose 'mean_danger_score' is above the threshold, most dangerous first, as dictionaries.
+    """
+
+    if size is None:
+        rows = connection.execute(
+            'SELECT * FROM planes WHERE mean_danger_score > ? ORDER BY mean_danger_score DESC, rowid', (threshold,)
+        )
+    else:
+        rows = connection.execute(
+            'SELECT * FROM planes WHERE size = ? AND mean_danger_score > ? ORDER BY mean_danger_score DESC, rowid',
+            (size, threshold)
+        )
+    return [dict(row) for row in rows]
+
+def format_rows(rows, output_format='table'):
+
+    """
+    Parameters:
+    - rows (list): Rows returned by a query, as dictionaries.
+    - output_format (str): 'table' for aligned text columns or 'json' for a JSON list. Default value is 'table'.
+
+    Returns:
+    - str: The formatted rows.
+    """
+
+    if output_format == 'json':
+        return json.dumps(rows, indent=2)
+    if not rows:
+        return 'no matching planes'
+    columns = list(rows[0])
+    cells = [[f'{value:.3f}' if isinstance(value, float) else '' if value is None else str(value) for value in row.values()]
+             for row in rows]
+    widths = [max(len(column), *(len(row[position]) for row in cells)) for position, column in enumerate(columns)]
+    lines = ['  '.join(column.ljust(width) for column, width in zip(columns, widths)).rstrip()]
+    lines += ['  '.join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip() for row in cells]
+    return '\n'.join(lines)
+
+def query_main(argv=None):
+
+    """
+    Parameters:
+    - argv (list): The command-line arguments. Default value is None, which reads them from sys.argv.
+
+    Returns:
+    - int: The exit status.
+
+    Logic:
+    This is the command-line entry point, run with 'python -m utility'. The 'build' command writes the query index from a saved
+    final table, or from the raw NTSB and B43 files with 'stream_ult_df'; only that path imports pandas. The 'score', 'top' and
+    'above' commands only open the SQLite index, so they answer in the time it takes to start Python.
+    """
+
+    options = argparse.ArgumentParser(add_help=False)
+    options.add_argument('--index', default=argparse.SUPPRESS, help=f'path of the query index, {default_query_index_path} by default')
+    options.add_argument('--format', dest='output_format', choices=['table', 'json'], default=argparse.SUPPRESS)
+    parser = argparse.ArgumentParser(
+        prog='python -m utility', description='Query the precomputed aircraft recommendations.', parents=[options]
+    )
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser('build', help='build the query index', parents=[options])
+    build.add_argument('--from-csv', help="a saved final table, e.g. 'data/final_data_for_tableau.csv'")
+    build.add_argument('--accidents', help="the NTSB 'AviationData.csv' file")
+    build.add_argument('--inventory', help="the BTS 'T_F41SCHEDULE_B43.csv' file")
+    build.add_argument('-n', type=int, default=10, help='the number of top planes by size')
+
+    score = commands.add_parser('score', help='show the scores of a make_model', parents=[options])
+    score.add_argument('make_model')
+
+    top = commands.add_parser('top', help='show the safest planes of each size', parents=[options])
+    top.add_argument('-n', type=int, default=10)
+    top.add_argument('--size')
+
+    above = commands.add_parser('above', help='show the planes above a mean danger score', parents=[options])
+    above.add_argument('threshold', type=float)
+    above.add_argument('--size')
+
+    args = parser.parse_args(argv)
+    index_path = getattr(args, 'index', default_query_index_path)
+    output_format = getattr(args, 'output_format', 'table')
+
+    if args.command == 'build':
+        if args.from_csv is not None:
+            final_results = args.from_csv
+        elif args.accidents is not None and args.inventory is not None:
+            from .streaming import stream_ult_df
+            final_results = stream_ult_df(args.accidents, args.inventory, n=args.n)
+        else:
+            parser.error('build needs --from-csv, or both --accidents and --inventory')
+        print(build_query_index(final_results, index_path))
+        return 0
+
+    try:
+        connection = open_query_index(index_path)
+    except FileNotFoundError as error:
+        print(error, file=sys.stderr)
+        return 1
+    try:
+        if args.command == 'score':
+            rows = lookup_make_model(connection, args.make_model)
+        elif args.command == 'top':
+            rows = top_safest(connection, args.n, args.size)
+        else:
+            rows = above_danger_threshold(connection, args.threshold, args.size)
+    finally:
+        connection.close()
+    print(format_rows(rows, output_format))
+    return 0 if rows or args.command != 'score' else 1
@@ -0,0 +1,157 @@
+import numpy as np
+import pandas as pd
+
+from .instrumentation import instrumented
+from .scores_and_metrics import ult_df, rank_within_groups
+
+def codes_in(values, categories):
+
+    """
+    Parameters:
+    - values (pandas.Series): The values to look up, e.g. the 'make_model' of each accident.
+    - categories (pandas.Index): The distinct values to look them up in.
+
+    Returns:
+    - numpy.ndarray: The position of each value in 'categories', or -1 for values that are not in it or missing.
+
+    Logic:
+    Only the distinct values are looked up, through the categories of 'values', and the codes are then spread to the rows.
+    """
+
+    values = values.astype('category')
+    category_codes = np.append(categories.get_indexer(values.cat.categories.astype(object)), -1)
+    return category_codes[values.cat.codes.to_numpy()]
+
+@instrumented
+def yearly_accident_rates(plane_accidents_4F, plane_inventory_2F, window=5):
+
+    """
+    Parameters:
+    - plane_accidents_4F (pandas.DataFrame): The dataframe of plane accidents data with 'make_model' and 'year' columns.
+    - plane_inventory_2F (pandas.DataFrame): The dataframe of plane inventory data with 'make_model' and 'year' columns.
+    - window (int): The number of years, up to and including each year, of the rolling rates. Default value is 5.
+
+    Returns:
+    - pandas.DataFrame: A dataframe indexed by 'make_model' and 'year', sorted by 'make_model' in order of first appearance
+      in the inventory and then by year, with the columns 'aircraft_years', 'recorded_accidents', 'accident_rate',
+      'rolling_aircraft_years', 'rolling_accidents' and 'rolling_accident_rate'.
+
+    Logic:
+    The B43 inventory has one row per aircraft and year, so the number of inventory rows of a 'make_model' in a year is its
+    exposure in aircraft-years. This function counts the exposure and the accidents of every 'make_model' and year at once
+    into two dense model-by-year arrays with one bincount each, and the accident rate is the number of accidents per aircraft-year.
+    The rolling sums over the last 'window' years of every model are differences of cumulative sums along the years,
+    so the rolling rates of all models come from a few array operations instead of one filter per model.
+    Only the models and years of the inventory are kept, since accidents outside them have no exposure to divide by, and only
+    the years with some exposure in the window. Years without exposure get a NaN rate.
+    """
+
+    inventory = plane_inventory_2F[['make_model', 'year']].dropna()
+    make_models = pd.Index(pd.unique(inventory['make_model'].astype(object)))
+    first_year, last_year = int(inventory['year'].min()), int(inventory['year'].max())
+    year_count = last_year - first_year + 1
+
+    def counts(df):
+        model_codes = codes_in(df['make_model'], make_models)
+        years = df['year'].to_numpy(dtype=float, na_value=np.nan)
+        is_known = (model_codes >= 0) & (years >= first_year) & (years <= last_year)
+        cells = model_codes[is_known] * year_count + (years[is_known] - first_year).astype(np.int64)
+        return np.bincount(cells, minlength=len(make_models) * year_count).reshape(len(make_models), year_count)
+
+    exposure = counts(inventory)
+    accidents = counts(plane_accidents_4F[['make_model', 'year']])
+
+    def rolling_sums(values):
+        cumulative = np.concatenate([np.zeros((len(values), 1), dtype=np.int64), np.cumsum(values, axis=1)], axis=1)
+        ends = np.arange(1, year_count + 1)
+        return cumulative[:, ends] - cumulative[:, np.maximum(ends - window, 0)]
+
+    rolling_exposure = rolling_sums(exposure)
+    rolling_accidents = rolling_sums(accidents)
+    is_kept = (rolling_exposure > 0).ravel()
+    model_codes, year_codes = np.divmod(np.flatnonzero(is_kept), year_count)
+
+    rates = pd.DataFrame({
+        'aircraft_years': exposure.ravel()[is_kept],
+        'recorded_accidents': accidents.ravel()[is_kept],
+        'rolling_aircraft_years': rolling_exposure.ravel()[is_kept],
+        'rolling_accidents': rolling_accidents.ravel()[is_kept],
+    }, index=pd.MultiIndex.from_arrays(
+        [make_models.take(model_codes), year_codes + first_year], names=['make_model', 'year']
+    ))
+    rates.insert(2, 'accident_rate', rates['recorded_accidents'] / rates['aircraft_years'].where(rates['aircraft_years'] > 0))
+    rates['rolling_accident_rate'] = rates['rolling_accidents'] / rates['rolling_aircraft_years']
+    return rates
+
+@instrumented
+def recent_accident_rates(rates, year=None):
+
+    """
+    Parameters:
+    - rates (pandas.DataFrame): The yearly rates returned by 'yearly_accident_rates'.
+    - year (int): The last year of the rolling window. Default value is None, which takes the last year of the rates.
+
+    Returns:
+    - pandas.DataFrame: A dataframe indexed by 'make_model' with the 'rolling_aircraft_years', 'rolling_accidents' and
+      'rolling_accident_rate' of that year. Models without exposure in the window are left out. Raises a ValueError if the
+      year is outside the years of the rates.
+    """
+
+    years = rates.index.get_level_values('year')
+    if year is None:
+        year = years.max()
+    if not years.min() <= year <= years.max():
+        raise ValueError(f'no accident rates for {year}, the rates cover {years.min()} to {years.max()}')
+    return rates.loc[years == year, ['rolling_aircraft_years', 'rolling_accidents', 'rolling_accident_rate']].droplevel('year')
+
+@instrumented
+def add_recent_accident_rates(final_df, recent_rates):
+
+    """
+    Parameters:
+    - final_df (pandas.DataFrame): The final dataframe returned by 'ult_df'.
+    - recent_rates (pandas.DataFrame): The rolling rates of one year, returned by 'recent_accident_rates'.
+
+    Returns:
+    - pandas.DataFrame: A copy of the final dataframe with the columns 'recent_aircraft_years', 'recent_accidents',
+      'recent_accident_rate' and 'recent_rate_rank'.
+
+    Logic:
+    'recent_rate_rank' ranks each plane among the planes of its size by its recent accident rate, 1 being the lowest rate,
+    with tied planes sharing the best rank. Planes without exposure in the window get NaN.
+    """
+
+    final_df = final_df.copy()
+    for column, rate_column in [
+        ('recent_aircraft_years', 'rolling_aircraft_years'),
+        ('recent_accidents', 'rolling_accidents'),
+        ('recent_accident_rate', 'rolling_accident_rate'),
+    ]:
+        final_df[column] = final_df['make_model'].map(recent_rates[rate_column])
+    final_df['recent_rate_rank'] = rank_within_groups(
+        final_df[['recent_accident_rate']].to_numpy(dtype=float), final_df['size'].to_numpy()
+    )[:, 0]
+    return final_df
+
+@instrumented
+def ult_rates_df(plane_accidents_4F, plane_inventory_2F, n=10, window=5, year=None):
+
+    """
+    Parameters:
+    - plane_accidents_4F (pandas.DataFrame): The dataframe of plane accidents data with engineered accident, damage, and danger features.
+    - plane_inventory_2F (pandas.DataFrame): The dataframe which contains 'make_model', 'plane_size' and 'year' columns.
+    - n (int): The number of top planes by size to include. Default value is 10.
+    - window (int): The number of years of the recent accident rates. Default value is 5.
+    - year (int): The last year of the window. Default value is None, which takes the last year of the inventory.
+
+    Returns:
+    - pandas.DataFrame: The final dataframe of 'ult_df' with the recent accident rates of 'add_recent_accident_rates'.
+
+    Logic:
+    'recorded_accidents_per_plane_in_inventory' divides the accidents of every year by the aircraft-years of the inventory's years.
+    The recent accident rate only counts the accidents and the aircraft-years of the same last 'window' years, so the planes
+    can be ranked on their recent safety.
+    """
+
+    rates = yearly_accident_rates(plane_accidents_4F, plane_inventory_2F, window)
+    return add_recent_accident_rates(ult_df(plane_accidents_4F, plane_inventory_2F, n), recent_accident_rates(rates, year))
@@ -1,27 +1,99 @@
+import numpy as np
 import pandas as pd
 
-def get_top_n_planes_by_sizes(plane_inventory_2F, n=10):
+from .distinct import default_hll_precision, count_distinct_aircraft_PI
+from .features import plane_size_bins
+from .instrumentation import instrumented
+
+def size_order(plane_sizes, sizes=None):
+
+    """
+    Parameters:
+    - plane_sizes (pandas.Series): The 'plane_size' of each row.
+    - sizes (list): The sizes asked for. Default value is None.
+
+    Returns:
+    - list: 'sizes' if given. Otherwise the categories of a categorical 'plane_sizes', or the sizes of 'plane_size_bins' 
+      for plain strings, such as the index of an inventory summary. The '' size of planes outside every size is left out.
+    """
+
+    if sizes is None:
+        is_categorical = isinstance(plane_sizes.dtype, pd.CategoricalDtype)
+        sizes = plane_sizes.cat.categories if is_categorical else plane_size_bins
+    return [size for size in sizes if size != '']
+
+@instrumented
+def top_n_planes_by_size(make_models, plane_sizes, n=10, sizes=None, counts=None):
+
+    """
+    Parameters:
+    - make_models (pandas.Series): The 'make_model' of each row.
+    - plane_sizes (pandas.Series): The 'plane_size' of each row.
+    - n (int): The number of top planes by size to return. Default value is 10.
+    - sizes (list): The sizes to return, in order. Default value is None, which takes the sizes of a categorical 'plane_sizes' 
+      in category order, or the sizes of 'plane_size_bins' otherwise. The '' size of planes outside every size is never returned.
+    - counts (array-like): The number of planes each row stands for, e.g. the counts of an inventory summary. 
+      Default value is None, which counts every row once.
+
+    Returns:
+    - pandas.DataFrame: The 'size', 'make_model' and 'number_of_planes' of the top n planes of each size, the sizes one after 
+      the other, each with an index from 0 to n-1.
+
+    Logic:
+    This function is the binned-count engine behind 'make_big_df'. The codes of each row's size and 'make_model' are combined 
+    into a single integer key, and one factorize and one bincount over the keys count the planes of every size and 'make_model' 
+    in a single pass, in order of first appearance. The counts of each size are then sorted like 'value_counts' sorts them, 
+    so ties are broken the same way, and only the names of the top n planes are looked up.
+    """
+
+    make_models = make_models.astype('category')
+    sizes = size_order(plane_sizes, sizes)
+    model_codes = make_models.cat.codes.to_numpy(dtype=np.int64)
+    size_codes = pd.Categorical(plane_sizes, categories=sizes).codes.astype(np.int64)
+    is_known = (model_codes >= 0) & (size_codes >= 0)
+    model_count = max(len(make_models.cat.categories), 1)
+    pair_codes, pairs = pd.factorize(size_codes[is_known] * model_count + model_codes[is_known])
+    weights = None if counts is None else np.asarray(counts)[is_known]
+    pair_counts = np.bincount(pair_codes, weights=weights, minlength=len(pairs)).astype(np.int64)
+
+    dfs = []
+    for size_code, size in enumerate(sizes):
+        is_size = pairs // model_count == size_code
+        top_n = pd.Series(pair_counts[is_size], index=pairs[is_size] % model_count).sort_values(ascending=False)[:n]
+        dfs.append(pd.DataFrame({
+            'size': [size]*len(top_n),
+            'make_model': make_models.cat.categories.take(top_n.index).astype(str),
+            'number_of_planes': top_n.to_numpy(),
+        }))
+    return pd.concat(dfs)
+
+@instrumented
+def get_top_n_planes_by_sizes(plane_inventory_2F, n=10, sizes=None):
 
     """
     Parameters:
     - plane_inventory_2F (pandas.DataFrame): The dataframe which contains 'make_model' and 'plane_size' columns.
     - n (int): The number of top planes by size to return. Default value is 10.
+    - sizes (list): The sizes to return, in order. Default value is None, which takes every size of 'plane_size'; 
+      see 'top_n_planes_by_size'.
 
     Returns:
     - tuple: A tuple of tuples, each containing a series of top n planes for a specific size and the size.
 
     Logic:
-    This function gets the top n planes by size. It counts the occurrences of each 'make_model' for each size 
-    and returns the top n 'make_model' for each size.
+    This function gets the top n planes by size with 'top_n_planes_by_size'. Each series is indexed by '<make_model> <size>' 
+    and holds the number of planes, as 'value_counts' of those strings would.
     """
 
-    small, medium, large = 'small', 'medium', 'large'
-    make_model_size = plane_inventory_2F['make_model'] + ' ' + plane_inventory_2F['plane_size']
-    small_top_10 = make_model_size[make_model_size.str.contains(small)].value_counts()[:n]
-    medium_top_10 = make_model_size[make_model_size.str.contains(medium)].value_counts()[:n]
-    large_top_10 = make_model_size[make_model_size.str.contains(large)].value_counts()[:n]
-    return (small_top_10, small), (medium_top_10, medium), (large_top_10, large)
+    sizes = size_order(plane_inventory_2F['plane_size'], sizes)
+    big_df = top_n_planes_by_size(plane_inventory_2F['make_model'], plane_inventory_2F['plane_size'], n=n, sizes=sizes)
+    top_planes = []
+    for size in sizes:
+        df = big_df[big_df['size'] == size]
+        top_planes.append((pd.Series(df['number_of_planes'].to_numpy(), index=df['make_model'] + f' {size}'), size))
+    return tuple(top_planes)
 
+@instrumented
 def make_df(top_planes_and_sizes):
 
     """
@@ -32,79 +104,271 @@ def make_df(top_planes_and_sizes):
     - pandas.DataFrame: A dataframe containing the size, 'make_model', and 'number_of_planes'.
 
     Logic:
-    This function creates a dataframe from the series of top n planes. It adds a new column 'size' with the given size.
+    This function creates a dataframe from the series of top n planes returned by 'get_top_n_planes_by_sizes'. 
+    It removes the size from the names and adds a new column 'size' with the given size.
     """
 
     series, size = top_planes_and_sizes
-    df = series.reset_index()
-    df = df.rename(columns={0: 'number_of_planes', 'index': 'make_model'})
-    df['make_model'] = df['make_model'].apply(lambda mm: mm.replace(f' {size}', ''))
-    df['size'] = [size]*len(df)
-    df['make_model'] = df['make_model'].apply(lambda x: str(x))
-    df['number_of_planes'] = df['number_of_planes'].apply(lambda x: int(x))
-    df['size'] = df['size'].apply(lambda x: str(x))
-    df = df[['size', 'make_model', 'number_of_planes']]
-    return df
+    return pd.DataFrame({
+        'size': [str(size)]*len(series),
+        'make_model': series.index.astype(str).str.replace(f' {size}', '', regex=False),
+        'number_of_planes': series.to_numpy().astype(np.int64),
+    })
 
-def make_big_df(plane_inventory_2F):
+@instrumented
+def make_big_df(plane_inventory_2F, n=10, sizes=None):
 
     """
     Parameters:
     - plane_inventory_2F (pandas.DataFrame): The dataframe which contains 'make_model' and 'plane_size' columns.
+    - n (int): The number of top planes by size to return. Default value is 10.
+    - sizes (list): The sizes to return, in order. Default value is None, which takes every size of 'plane_size'; 
+      see 'top_n_planes_by_size'.
 
     Returns:
     - pandas.DataFrame: A dataframe containing the top n planes for each size.
 
     Logic:
-    This function gets the top n planes by size using the 'get_top_n_planes_by_sizes' function and creates a dataframe for each size 
-    using the 'make_df' function. It then concatenates all the dataframes into a single dataframe.
+    This function counts the planes of every size and 'make_model' in a single grouped pass with 'top_n_planes_by_size' 
+    and returns the top n planes of each size, one size after the other.
     """
 
-    sizes = get_top_n_planes_by_sizes(plane_inventory_2F)
-    dfs = []
-    for size_data in sizes:
-        df = make_df(size_data)
-        dfs.append(df)
-    return pd.concat(dfs)
+    return top_n_planes_by_size(plane_inventory_2F['make_model'], plane_inventory_2F['plane_size'], n=n, sizes=sizes)
+
+score_column_names = {
+    'danger_score': 'danger_score',
+    'human_injury_numeric': 'human_injury_score',
+    'aircraft_damage_numeric': 'aircraft_damage_score',
+}
+
+@instrumented
+def aggregate_accidents_by_make_model(
+        plane_accidents_4F,
+        metrics=('danger_score', 'human_injury_numeric', 'aircraft_damage_numeric'),
+        aggregations=('mean',),
+        make_models=None
+    ):
+
+    """
+    Parameters:
+    - plane_accidents_4F (pandas.DataFrame): The dataframe of plane accidents data with engineered accident, damage, and danger features.
+    - metrics (iterable): The score columns to aggregate. Default value is the danger, injury and damage scores.
+    - aggregations (iterable): The pandas aggregations to apply to each metric, e.g. 'mean', 'median', 'max', 'count'. 
+      Default value is ('mean',).
+    - make_models (iterable): The 'make_model' values to keep. Default value is None, which keeps every 'make_model'.
+
+    Returns:
+    - pandas.DataFrame: A dataframe indexed by 'make_model' with the number of recorded accidents and one column per metric and aggregation.
+
+    Logic:
+    This function groups the accidents by 'make_model' once and computes every aggregation in that single grouped pass.
+    The 'recorded_accidents_for_plane_model' column holds the number of accidents recorded for each 'make_model'.
+    The other columns are named '<aggregation>_<metric>', where the metric name is taken from 'score_column_names' 
+    so that e.g. the mean of 'human_injury_numeric' becomes 'mean_human_injury_score'.
+    """
+
+    metrics = list(metrics)
+    aggregations = list(aggregations)
+    accidents = plane_accidents_4F[['make_model'] + metrics]
+    if make_models is not None:
+        accidents = accidents[accidents['make_model'].isin(make_models)]
+
+    grouped = accidents.groupby('make_model', sort=False, observed=True)
+    aggregated = pd.DataFrame({'recorded_accidents_for_plane_model': grouped.size()})
+    if metrics and aggregations:
+        metric_aggregates = grouped[metrics].agg(aggregations)
+        metric_aggregates.columns = [
+            f'{aggregation}_{score_column_names.get(metric, metric)}' for metric, aggregation in metric_aggregates.columns
+        ]
+        aggregated = aggregated.join(metric_aggregates)
+    return aggregated
+
+@instrumented
+def add_accident_aggregates(big_df, aggregated):
+
+    """
+    Parameters:
+    - big_df (pandas.DataFrame): The dataframe of top n planes for each size returned by 'make_big_df'.
+    - aggregated (pandas.DataFrame): The accident aggregates indexed by 'make_model', as returned by 'aggregate_accidents_by_make_model'.
+
+    Returns:
+    - pandas.DataFrame: The final dataframe with the accident counts, mean scores and accidents per plane in inventory.
+
+    Logic:
+    This function looks up the number of recorded accidents and the mean injury, damage and danger scores of each 'make_model' 
+    in the big dataframe. It then divides the number of recorded accidents by the number of planes in the inventory.
+    Models without any recorded accident get NaN in every accident column.
+    """
+
+    big_df = big_df[['make_model', 'size', 'number_of_planes']].reset_index(drop=True)
+    for column in [
+        'recorded_accidents_for_plane_model',
+        'mean_human_injury_score',
+        'mean_aircraft_damage_score',
+        'mean_danger_score',
+    ]:
+        big_df[column] = big_df['make_model'].map(aggregated[column])
+    big_df['recorded_accidents_per_plane_in_inventory'] = big_df['recorded_accidents_for_plane_model'] / big_df['number_of_planes']
+    
+    return big_df
 
-def ult_df(plane_accidents_4F, plane_inventory_2F):
+@instrumented
+def ult_df(plane_accidents_4F, plane_inventory_2F, n=10, distinct_aircraft=None, precision=default_hll_precision):
     
     """
     Parameters:
     - plane_accidents_4F (pandas.DataFrame): The dataframe of plane accidents data with engineered accident, damage, and danger features.
     - plane_inventory_2F (pandas.DataFrame): The dataframe which contains 'make_model' and 'plane_size' columns.
+    - n (int): The number of top planes by size to include. Default value is 10.
+    - distinct_aircraft (str): None to count inventory rows, or 'exact' or 'hll' to count the distinct aircraft of each 
+      'make_model' and size by serial number with 'count_distinct_aircraft_PI', which needs a 'serial_number' column. 
+      Default value is None.
+    - precision (int): The precision of the HyperLogLog registers when 'distinct_aircraft' is 'hll'. Default value is 12.
 
     Returns:
     - pandas.DataFrame: The final dataframe with all the engineered features.
 
     Logic:
     This function creates a final dataframe with all the engineered features. It first creates a big dataframe of top n planes for each size 
-    using the 'make_big_df' function. It then counts the number of recorded accidents for each 'make_model' in the big dataframe and adds 
-    this data to the big dataframe. It calculates the mean 'danger_score', 'human_injury_numeric', and 'aircraft_damage_numeric' for each 
-    'make_model' in the big dataframe and adds these data to the big dataframe. It also calculates the number of recorded accidents per plane 
-    in the inventory for each 'make_model' and adds this data to the big dataframe.
-    """
-
-    big_df = make_big_df(plane_inventory_2F)
-    make_model = plane_accidents_4F['make_model']
-    num_accidents = make_model[make_model.isin(big_df['make_model'].values)]
-    num_accidents = num_accidents.value_counts()
-    big_df = big_df.set_index('make_model')
-    big_df['recorded_accidents_for_plane_model'] = num_accidents
-    big_df = big_df.reset_index()
-    
-    danger_scores_make_model = plane_accidents_4F[['make_model', 'danger_score', 'human_injury_numeric', 'aircraft_damage_numeric']]
-    select_makes_models = big_df['make_model'].to_list()
-    mean_danger = []
-    mean_human_injury = []
-    mean_aircraft_damage = []
-    for make_and_model in select_makes_models:
-        mean_danger.append(danger_scores_make_model[danger_scores_make_model['make_model'] == make_and_model]['danger_score'].mean())
-        mean_human_injury.append(danger_scores_make_model[danger_scores_make_model['make_model'] == make_and_model]['human_injury_numeric'].mean())
-        mean_aircraft_damage.append(danger_scores_make_model[danger_scores_make_model['make_model'] == make_and_model]['aircraft_damage_numeric'].mean())
-    big_df['mean_human_injury_score'] = mean_human_injury
-    big_df['mean_aircraft_damage_score'] = mean_aircraft_damage
-    big_df['mean_danger_score'] = mean_danger
-    big_df['recorded_accidents_per_plane_in_inventory'] = big_df['recorded_accidents_for_plane_model'] / big_df['number_of_planes']
-    
-    return big_df
\ No newline at end of file
+    using the 'make_big_df' function. It then uses 'aggregate_accidents_by_make_model' to count the number of recorded accidents and 
+    calculate the mean 'danger_score', 'human_injury_numeric', and 'aircraft_damage_numeric' for every 'make_model' in the big dataframe 
+    in a single grouped pass. Finally, 'add_accident_aggregates' adds these data, and the number of recorded accidents per plane 
+    in the inventory for each 'make_model', to the big dataframe. With 'distinct_aircraft', the top n planes are ranked by their 
+    number of distinct aircraft instead of their number of inventory rows, which counts an aircraft once for every year it is listed.
+    """
+
+    if distinct_aircraft is None:
+        big_df = make_big_df(plane_inventory_2F, n=n)
+    else:
+        counts = count_distinct_aircraft_PI(plane_inventory_2F, distinct_aircraft, precision)
+        levels = counts.index.to_frame(index=False)
+        big_df = top_n_planes_by_size(
+            levels['make_model'], levels['plane_size'], n=n,
+            sizes=size_order(plane_inventory_2F['plane_size']), counts=counts.to_numpy()
+        )
+    aggregated = aggregate_accidents_by_make_model(plane_accidents_4F, make_models=big_df['make_model'].unique())
+    return add_accident_aggregates(big_df, aggregated)
+
+@instrumented
+def danger_score_components(plane_accidents_3F, make_models=None):
+
+    """
+    Parameters:
+    - plane_accidents_3F (pandas.DataFrame): The dataframe of plane accidents data with engineered accident and damage features.
+    - make_models (iterable): The 'make_model' values to keep. Default value is None, which keeps every 'make_model'.
+
+    Returns:
+    - pandas.DataFrame: A dataframe indexed by 'make_model' with the mean 'aircraft_damage_numeric' and 'human_injury_numeric' 
+      over the accidents that have both scores.
+
+    Logic:
+    The danger score of an accident is 'aircraft_dmg_w' * 'aircraft_damage_numeric' + 'human_injury_w' * 'human_injury_numeric', 
+    and it is missing when either score is missing. Its mean per 'make_model' is therefore the same weighted sum of the two means 
+    returned here, for any pair of weights.
+    """
+
+    components = ['aircraft_damage_numeric', 'human_injury_numeric']
+    accidents = plane_accidents_3F[['make_model'] + components]
+    accidents = accidents[accidents[components].notna().all(axis=1)]
+    if make_models is not None:
+        accidents = accidents[accidents['make_model'].isin(make_models)]
+    means = accidents.groupby('make_model', sort=False, observed=True)[components].mean()
+    means.index = means.index.astype(object)
+    return means
+
+def rank_within_groups(values, groups):
+
+    """
+    Parameters:
+    - values (numpy.ndarray): A 2D array of scores, one row per plane and one column per weight pair.
+    - groups (numpy.ndarray): The group of each row, e.g. the plane size.
+
+    Returns:
+    - numpy.ndarray: The rank of each value among the values of its group in the same column, 1 being the lowest.
+      Tied values share the lowest of their ranks, like pandas' rank(method='min'), and NaN values get a NaN rank.
+
+    Logic:
+    This function sorts every column of a group at once and gives each sorted value the position of the first value equal to it.
+    """
+
+    ranks = np.full(values.shape, np.nan)
+    for group in pd.unique(groups):
+        rows = np.flatnonzero(groups == group)
+        group_values = values[rows]
+        order = np.argsort(group_values, axis=0, kind='stable')
+        sorted_values = np.take_along_axis(group_values, order, axis=0)
+        is_new_value = np.ones(sorted_values.shape, dtype=bool)
+        is_new_value[1:] = sorted_values[1:] != sorted_values[:-1]
+        positions = np.arange(len(rows))[:, None]
+        first_positions = np.maximum.accumulate(np.where(is_new_value, positions, 0), axis=0) + 1.0
+        group_ranks = np.empty(sorted_values.shape)
+        np.put_along_axis(group_ranks, order, first_positions, axis=0)
+        group_ranks[np.isnan(group_values)] = np.nan
+        ranks[rows] = group_ranks
+    return ranks
+
+@instrumented
+def sweep_danger_weights(components, big_df, weights, reference_weights=(.75, .25)):
+
+    """
+    Parameters:
+    - components (pandas.DataFrame): The mean score components per 'make_model', as returned by 'danger_score_components'.
+    - big_df (pandas.DataFrame): The dataframe of top n planes for each size returned by 'make_big_df'.
+    - weights (array-like): The weight pairs to score, one ('aircraft_dmg_w', 'human_injury_w') pair per row.
+    - reference_weights (tuple): The weight pair the rank changes are measured against. Default value is (0.75, 0.25).
+
+    Returns:
+    - pandas.DataFrame: One row per weight pair and plane of 'big_df', with the columns 'aircraft_dmg_w', 'human_injury_w', 
+      'size', 'make_model', 'mean_danger_score', 'rank', 'reference_rank' and 'rank_change'.
+
+    Logic:
+    This function scores every plane for every weight pair with a single matrix product of the planes' mean components and 
+    the weight pairs. Planes are then ranked within their size for every weight pair at once, rank 1 being the lowest mean danger 
+    score, with tied planes sharing the best rank. 'rank_change' is the rank minus the rank under 'reference_weights', 
+    so a positive change means the plane looks more dangerous relative to the others of its size. 
+    Planes without any scored accident get NaN scores and ranks.
+    """
+
+    weights = np.asarray(weights, dtype=float).reshape(-1, 2)
+    all_weights = np.vstack([weights, np.asarray(reference_weights, dtype=float).reshape(1, 2)])
+    plane_components = components.reindex(big_df['make_model'].to_numpy())[
+        ['aircraft_damage_numeric', 'human_injury_numeric']
+    ].to_numpy()
+    scores = plane_components @ all_weights.T
+    ranks = rank_within_groups(scores, big_df['size'].to_numpy())
+    scores, reference_ranks, ranks = scores[:, :-1], ranks[:, -1], ranks[:, :-1]
+
+    planes, pairs = len(big_df), len(weights)
+    return pd.DataFrame({
+        'aircraft_dmg_w': np.repeat(weights[:, 0], planes),
+        'human_injury_w': np.repeat(weights[:, 1], planes),
+        'size': np.tile(big_df['size'].to_numpy(), pairs),
+        'make_model': np.tile(big_df['make_model'].to_numpy(), pairs),
+        'mean_danger_score': scores.T.ravel(),
+        'rank': ranks.T.ravel(),
+        'reference_rank': np.tile(reference_ranks, pairs),
+        'rank_change': (ranks - reference_ranks[:, None]).T.ravel(),
+    })
+
+@instrumented
+def ult_weight_sweep(plane_accidents_3F, plane_inventory_2F, weights, n=10, reference_weights=(.75, .25)):
+
+    """
+    Parameters:
+    - plane_accidents_3F (pandas.DataFrame): The dataframe of plane accidents data with engineered accident and damage features.
+    - plane_inventory_2F (pandas.DataFrame): The dataframe which contains 'make_model' and 'plane_size' columns.
+    - weights (array-like): The weight pairs to score, one ('aircraft_dmg_w', 'human_injury_w') pair per row.
+    - n (int): The number of top planes by size to include. Default value is 10.
+    - reference_weights (tuple): The weight pair the rank changes are measured against. Default value is (0.75, 0.25).
+
+    Returns:
+    - pandas.DataFrame: The tidy table of 'sweep_danger_weights'.
+
+    Logic:
+    This function gives, for every weight pair, the 'mean_danger_score' that 'ult_df' would report after 
+    'engineer_danger_score_PA' with those weights, without recomputing the danger score of every accident for each pair.
+    """
+
+    big_df = make_big_df(plane_inventory_2F, n=n)
+    components = danger_score_components(plane_accidents_3F, make_models=big_df['make_model'].unique())
+    return sweep_danger_weights(components, big_df, weights, reference_weights)
@@ -0,0 +1,437 @@
+import pandas as pd
+
+from .caching import default_cache_dir
+from .instrumentation import instrumented
+from .cleaning import clean_data_PA, clean_data_PI
+from .features import (
+    engineer_make_model_feature_PAPI,
+    engineer_plane_size_feature_PI,
+    get_injury_feature_PA,
+    get_injury_feature_numeric_PA,
+    damage_scores,
+)
+from .distinct import (
+    default_hll_precision,
+    summarize_distinct_aircraft_PI,
+    merge_distinct_aircraft_summaries,
+    distinct_aircraft_counts,
+)
+from .scores_and_metrics import top_n_planes_by_size, add_accident_aggregates
+
+accident_dtypes_PA = {
+    'Event.Date': 'object',
+    'Aircraft.damage': 'object',
+    'Make': 'object',
+    'Model': 'object',
+    'Amateur.Built': 'object',
+    'Total.Fatal.Injuries': 'float64',
+    'Total.Serious.Injuries': 'float64',
+    'Total.Minor.Injuries': 'float64',
+}
+
+inventory_dtypes_PI = {
+    'YEAR': 'Int64',
+    'MANUFACTURER': 'object',
+    'MODEL': 'object',
+    'NUMBER_OF_SEATS': 'float64',
+}
+
+inventory_serial_dtypes_PI = {**inventory_dtypes_PI, 'SERIAL_NUMBER': 'object'}
+
+accident_summary_aggregations = {
+    'recorded_accidents': 'sum',
+    'injury_count': 'sum',
+    'injury_sum': 'sum',
+    'injury_min': 'min',
+    'injury_max': 'max',
+    'damage_count': 'sum',
+    'damage_sum': 'sum',
+    'damage_min': 'min',
+    'damage_max': 'max',
+    'scored_count': 'sum',
+    'scored_injury_sum': 'sum',
+    'scored_damage_sum': 'sum',
+}
+
+def read_chunks_PA(path, chunksize=100_000):
+
+    """
+    Parameters:
+    - path (str): The path of the NTSB 'AviationData.csv' file.
+    - chunksize (int): The number of rows per chunk. Default value is 100,000.
+
+    Returns:
+    - iterator: An iterator of raw plane accidents dataframes of at most 'chunksize' rows.
+
+    Logic:
+    This function reads the accidents file in fixed-size chunks, keeping only the columns listed in 'accident_dtypes_PA'
+    and parsing them with those explicit dtypes, so that only one chunk of the few needed columns is in memory at a time.
+    """
+
+    return pd.read_csv(
+        path,
+        encoding='latin-1',
+        usecols=list(accident_dtypes_PA),
+        dtype=accident_dtypes_PA,
+        chunksize=chunksize
+    )
+
+def read_chunks_PI(path, chunksize=100_000, dtypes=inventory_dtypes_PI):
+
+    """
+    Parameters:
+    - path (str): The path of the BTS 'T_F41SCHEDULE_B43.csv' file.
+    - chunksize (int): The number of rows per chunk. Default value is 100,000.
+    - dtypes (dict): The columns to read and their dtypes. Default value is 'inventory_dtypes_PI'; 
+      'inventory_serial_dtypes_PI' also reads the serial numbers.
+
+    Returns:
+    - iterator: An iterator of raw plane inventory dataframes of at most 'chunksize' rows.
+
+    Logic:
+    This function reads the inventory file in fixed-size chunks, keeping only the columns listed in 'dtypes'
+    and parsing them with those explicit dtypes.
+    """
+
+    return pd.read_csv(
+        path,
+        usecols=list(dtypes),
+        dtype=dtypes,
+        chunksize=chunksize
+    )
+
+@instrumented
+def summarize_accidents_PA(plane_accidents_raw, cache_dir=default_cache_dir):
+
+    """
+    Parameters:
+    - plane_accidents_raw (pandas.DataFrame): A raw dataframe (or chunk) of plane accidents data.
+    - cache_dir (str): The directory of the cleaned manufacturer lookup table, passed to clean_data_PA. Default value is 'default_cache_dir'.
+
+    Returns:
+    - pandas.DataFrame: The accident summary, indexed by 'make_model', with the columns of 'accident_summary_aggregations'.
+
+    Logic:
+    This function cleans the raw accidents and computes the raw injury score (0 to 3) and raw damage score (0 to 3) of each accident.
+    It then sums, per 'make_model', the number of accidents and the count, sum, minimum and maximum of each raw score.
+    The 'scored_*' columns only cover accidents where both scores are known, which are the accidents that get a 'danger_score'.
+    The scores are not rescaled here because the rescaling uses the minimum and maximum over all accidents, which are only known
+    once every chunk has been summarized; see 'accident_aggregates_from_summary'.
+    The categorical 'make_model' index is turned back into plain strings, since the categories differ from chunk to chunk 
+    and the summary only has one row per 'make_model'.
+    """
+
+    plane_accidents = engineer_make_model_feature_PAPI(clean_data_PA(plane_accidents_raw, cache_dir=cache_dir))
+    injury = get_injury_feature_numeric_PA(get_injury_feature_PA(plane_accidents)).astype(float)
+    damage = plane_accidents['aircraft_damage'].map(damage_scores).astype(float)
+    scored = injury.notna() & damage.notna()
+
+    scores = pd.DataFrame({
+        'make_model': plane_accidents['make_model'],
+        'injury': injury,
+        'damage': damage,
+        'scored_count': scored,
+        'scored_injury': injury.where(scored),
+        'scored_damage': damage.where(scored),
+    })
+    grouped = scores.groupby('make_model', sort=False, observed=True)
+    summary = pd.DataFrame({
+        'recorded_accidents': grouped.size(),
+        'injury_count': grouped['injury'].count(),
+        'injury_sum': grouped['injury'].sum(),
+        'injury_min': grouped['injury'].min(),
+        'injury_max': grouped['injury'].max(),
+        'damage_count': grouped['damage'].count(),
+        'damage_sum': grouped['damage'].sum(),
+        'damage_min': grouped['damage'].min(),
+        'damage_max': grouped['damage'].max(),
+        'scored_count': grouped['scored_count'].sum(),
+        'scored_injury_sum': grouped['scored_injury'].sum(),
+        'scored_damage_sum': grouped['scored_damage'].sum(),
+    })
+    summary.index = summary.index.astype(object)
+    return summary[list(accident_summary_aggregations)]
+
+@instrumented
+def merge_accident_summaries(summaries):
+
+    """
+    Parameters:
+    - summaries (iterable): Accident summaries returned by 'summarize_accidents_PA'.
+
+    Returns:
+    - pandas.DataFrame: A single accident summary covering every input summary.
+
+    Logic:
+    This function folds the summaries one at a time into a running summary, combining the rows of each 'make_model' with 
+    'accident_summary_aggregations': counts and sums are added, minimums and maximums are combined with min and max. 
+    The order of first appearance is kept. Since only the running summary is kept, merging the summaries of a generator of 
+    chunks needs memory for one chunk and one row per 'make_model', however many chunks there are.
+    """
+
+    merged = None
+    for summary in summaries:
+        merged = pd.concat([summary] if merged is None else [merged, summary]).groupby(level=0, sort=False).agg(
+            accident_summary_aggregations
+        )
+    if merged is None:
+        raise ValueError('no accident summaries to merge')
+    return merged
+
+@instrumented
+def summarize_inventory_PI(plane_inventory_raw, cache_dir=default_cache_dir):
+
+    """
+    Parameters:
+    - plane_inventory_raw (pandas.DataFrame): A raw dataframe (or chunk) of plane inventory data.
+    - cache_dir (str): The directory of the cleaned manufacturer lookup table, passed to clean_data_PI. Default value is 'default_cache_dir'.
+
+    Returns:
+    - pandas.Series: The number of inventory planes, indexed by 'make_model' and 'plane_size'.
+
+    Logic:
+    This function cleans the raw inventory, engineers the 'make_model' and 'plane_size' features and counts the rows of each
+    'make_model' and 'plane_size' pair, in order of first appearance. As in 'summarize_accidents_PA', the categorical 
+    index levels are turned back into plain strings.
+    """
+
+    plane_inventory = clean_data_PI(plane_inventory_raw, cache_dir=cache_dir)
+    plane_inventory = engineer_plane_size_feature_PI(engineer_make_model_feature_PAPI(plane_inventory))
+    summary = plane_inventory.groupby(['make_model', 'plane_size'], sort=False, observed=True).size()
+    summary.index = pd.MultiIndex.from_arrays(
+        [summary.index.get_level_values(level).astype(object) for level in summary.index.names], names=summary.index.names
+    )
+    return summary.rename('number_of_planes')
+
+@instrumented
+def merge_inventory_summaries(summaries):
+
+    """
+    Parameters:
+    - summaries (iterable): Inventory summaries returned by 'summarize_inventory_PI'.
+
+    Returns:
+    - pandas.Series: A single inventory summary covering every input summary.
+
+    Logic:
+    This function folds the summaries one at a time into a running summary, adding up the number of planes of each 
+    'make_model' and 'plane_size' pair, so as for 'merge_accident_summaries' memory does not grow with the number of chunks.
+    """
+
+    merged = None
+    for summary in summaries:
+        merged = pd.concat([summary] if merged is None else [merged, summary]).groupby(level=[0, 1], sort=False).sum()
+    if merged is None:
+        raise ValueError('no inventory summaries to merge')
+    return merged
+
+@instrumented
+def accident_aggregates_from_summary(accident_summary, aircraft_dmg_w=.75, human_injury_w=.25):
+
+    """
+    Parameters:
+    - accident_summary (pandas.DataFrame): An accident summary returned by 'summarize_accidents_PA' or 'merge_accident_summaries'.
+    - aircraft_dmg_w (float): The weight for the damage score in the danger score. Default value is 0.75.
+    - human_injury_w (float): The weight for the injury score in the danger score. Default value is 0.25.
+
+    Returns:
+    - pandas.DataFrame: A dataframe indexed by 'make_model' with the same columns as 'aggregate_accidents_by_make_model'.
+
+    Logic:
+    engineer_accident_features_PA and engineer_damage_feature_PA rescale each raw score to 0 to 10 with the minimum and maximum
+    over all accidents. Since that rescaling is linear, the mean of the rescaled scores of a 'make_model' is the rescaled mean of its
+    raw scores, and the mean danger score is the weighted sum of the mean rescaled scores over the accidents that have both scores.
+    This function computes these means from the sums and counts of the summary.
+    """
+
+    injury_min, injury_max = accident_summary['injury_min'].min(), accident_summary['injury_max'].max()
+    damage_min, damage_max = accident_summary['damage_min'].min(), accident_summary['damage_max'].max()
+
+    def rescaled_mean(raw_sum, count, raw_min, raw_max):
+        return 10*((raw_sum / count - raw_min) / (raw_max - raw_min))
+
+    scored_count = accident_summary['scored_count']
+    return pd.DataFrame({
+        'recorded_accidents_for_plane_model': accident_summary['recorded_accidents'],
+        'mean_danger_score': (
+            aircraft_dmg_w * rescaled_mean(accident_summary['scored_damage_sum'], scored_count, damage_min, damage_max)
+            + human_injury_w * rescaled_mean(accident_summary['scored_injury_sum'], scored_count, injury_min, injury_max)
+        ),
+        'mean_human_injury_score': rescaled_mean(
+            accident_summary['injury_sum'], accident_summary['injury_count'], injury_min, injury_max
+        ),
+        'mean_aircraft_damage_score': rescaled_mean(
+            accident_summary['damage_sum'], accident_summary['damage_count'], damage_min, damage_max
+        ),
+    })
+
+@instrumented
+def danger_score_components_from_summary(accident_summary):
+
+    """
+    Parameters:
+    - accident_summary (pandas.DataFrame): An accident summary returned by 'summarize_accidents_PA' or 'merge_accident_summaries'.
+
+    Returns:
+    - pandas.DataFrame: The same mean score components per 'make_model' as 'danger_score_components', for 'sweep_danger_weights'.
+
+    Logic:
+    The mean danger score with weights (1, 0) is the mean damage score over the scored accidents and with weights (0, 1) 
+    the mean injury score, so both components are read off 'accident_aggregates_from_summary'.
+    """
+
+    return pd.DataFrame({
+        'aircraft_damage_numeric': accident_aggregates_from_summary(accident_summary, 1, 0)['mean_danger_score'],
+        'human_injury_numeric': accident_aggregates_from_summary(accident_summary, 0, 1)['mean_danger_score'],
+    })
+
+@instrumented
+def big_df_from_summary(inventory_summary, n=10):
+
+    """
+    Parameters:
+    - inventory_summary (pandas.Series): An inventory summary returned by 'summarize_inventory_PI' or 'merge_inventory_summaries'.
+    - n (int): The number of top planes by size to return. Default value is 10.
+
+    Returns:
+    - pandas.DataFrame: The same dataframe as 'make_big_df' would return for the full inventory.
+
+    Logic:
+    This function runs 'top_n_planes_by_size' over the rows of the summary, each row counting for its number of planes.
+    The rows are in order of first appearance, so ties are broken the same way as for the full inventory.
+    """
+
+    levels = inventory_summary.index.to_frame(index=False)
+    return top_n_planes_by_size(levels['make_model'], levels['plane_size'], n=n, counts=inventory_summary.to_numpy())
+
+@instrumented
+def summarize_file_PA(accidents_path, chunksize=100_000, cache_dir=default_cache_dir):
+
+    """
+    Parameters:
+    - accidents_path (str): The path of an NTSB accidents file with the 'AviationData.csv' columns.
+    - chunksize (int): The number of rows read, cleaned and scored at a time. Default value is 100,000.
+    - cache_dir (str): The directory of the cleaned manufacturer lookup table. Default value is 'default_cache_dir'.
+
+    Returns:
+    - pandas.DataFrame: The accident summary of the whole file.
+    """
+
+    return merge_accident_summaries(
+        summarize_accidents_PA(chunk, cache_dir=cache_dir) for chunk in read_chunks_PA(accidents_path, chunksize)
+    )
+
+@instrumented
+def summarize_file_PI(inventory_path, chunksize=100_000, cache_dir=default_cache_dir):
+
+    """
+    Parameters:
+    - inventory_path (str): The path of a BTS inventory file with the 'T_F41SCHEDULE_B43.csv' columns.
+    - chunksize (int): The number of rows read and cleaned at a time. Default value is 100,000.
+    - cache_dir (str): The directory of the cleaned manufacturer lookup table. Default value is 'default_cache_dir'.
+
+    Returns:
+    - pandas.Series: The inventory summary of the whole file.
+    """
+
+    return merge_inventory_summaries(
+        summarize_inventory_PI(chunk, cache_dir=cache_dir) for chunk in read_chunks_PI(inventory_path, chunksize)
+    )
+
+@instrumented
+def summarize_distinct_file_PI(
+        inventory_path,
+        mode='exact',
+        chunksize=100_000,
+        precision=default_hll_precision,
+        cache_dir=default_cache_dir
+    ):
+
+    """
+    Parameters:
+    - inventory_path (str): The path of a BTS inventory file with the 'T_F41SCHEDULE_B43.csv' columns, including 'SERIAL_NUMBER'.
+    - mode (str): 'exact' or 'hll'; see 'distinct_aircraft_summary'. Default value is 'exact'.
+    - chunksize (int): The number of rows read and cleaned at a time. Default value is 100,000.
+    - precision (int): The precision of the HyperLogLog registers in 'hll' mode. Default value is 12.
+    - cache_dir (str): The directory of the cleaned manufacturer lookup table. Default value is 'default_cache_dir'.
+
+    Returns:
+    - pandas.DataFrame: The distinct aircraft summary of the whole file.
+
+    Logic:
+    Each chunk is summarized and merged into the running summary before the next chunk is read, so in 'hll' mode memory use 
+    is bounded by the chunk size and the number of 'make_model' and 'plane_size' pairs, however many aircraft there are.
+    """
+
+    summary = None
+    for chunk in read_chunks_PI(inventory_path, chunksize, inventory_serial_dtypes_PI):
+        chunk_summary = summarize_distinct_aircraft_PI(chunk, mode, precision, cache_dir)
+        summary = chunk_summary if summary is None else merge_distinct_aircraft_summaries([summary, chunk_summary], mode)
+    return summary
+
+@instrumented
+def ult_df_from_summaries(accident_summary, inventory_summary, n=10, aircraft_dmg_w=.75, human_injury_w=.25):
+
+    """
+    Parameters:
+    - accident_summary (pandas.DataFrame): The accident summary of every accident.
+    - inventory_summary (pandas.Series): The inventory summary of every inventory row.
+    - n (int): The number of top planes by size to include. Default value is 10.
+    - aircraft_dmg_w (float): The weight for the damage score in the danger score. Default value is 0.75.
+    - human_injury_w (float): The weight for the injury score in the danger score. Default value is 0.25.
+
+    Returns:
+    - pandas.DataFrame: The same final dataframe as 'ult_df'.
+
+    Logic:
+    This function builds the top n planes for each size from the inventory summary and adds the accident aggregates
+    computed from the accident summary exactly like 'ult_df'.
+    """
+
+    big_df = big_df_from_summary(inventory_summary, n=n)
+    aggregated = accident_aggregates_from_summary(accident_summary, aircraft_dmg_w, human_injury_w)
+    return add_accident_aggregates(big_df, aggregated)
+
+@instrumented
+def stream_ult_df(
+        accidents_path,
+        inventory_path,
+        chunksize=100_000,
+        n=10,
+        aircraft_dmg_w=.75,
+        human_injury_w=.25,
+        cache_dir=default_cache_dir,
+        distinct_aircraft=None,
+        precision=default_hll_precision
+    ):
+
+    """
+    Parameters:
+    - accidents_path (str): The path of the NTSB 'AviationData.csv' file.
+    - inventory_path (str): The path of the BTS 'T_F41SCHEDULE_B43.csv' file.
+    - chunksize (int): The number of rows read, cleaned and scored at a time. Default value is 100,000.
+    - n (int): The number of top planes by size to include. Default value is 10.
+    - aircraft_dmg_w (float): The weight for the damage score in the danger score. Default value is 0.75.
+    - human_injury_w (float): The weight for the injury score in the danger score. Default value is 0.25.
+    - cache_dir (str): The directory of the cleaned manufacturer lookup tables. Default value is 'default_cache_dir'.
+    - distinct_aircraft (str): None to count inventory rows, or 'exact' or 'hll' to count distinct serial numbers instead;
+      see 'distinct_aircraft_summary'. Default value is None.
+    - precision (int): The precision of the HyperLogLog registers when 'distinct_aircraft' is 'hll'. Default value is 12.
+
+    Returns:
+    - pandas.DataFrame: The same final dataframe as 'ult_df'.
+
+    Logic:
+    This function reads both files chunk by chunk, summarizes every chunk into per-'make_model' counts and sums and merges the
+    summaries, so memory use is bounded by the chunk size and the number of distinct models rather than the size of the files.
+    It then builds the final dataframe from the merged summaries with 'ult_df_from_summaries'.
+    """
+
+    accident_summary = summarize_file_PA(accidents_path, chunksize, cache_dir)
+    if distinct_aircraft is None:
+        inventory_summary = summarize_file_PI(inventory_path, chunksize, cache_dir)
+    else:
+        inventory_summary = distinct_aircraft_counts(
+            summarize_distinct_file_PI(inventory_path, distinct_aircraft, chunksize, precision, cache_dir), distinct_aircraft
+        )
+    return ult_df_from_summaries(accident_summary, inventory_summary, n, aircraft_dmg_w, human_injury_w)